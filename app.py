@@ -1,11 +1,14 @@
-from cloud_platform.GCP_Pricing import GCP_Pricing
-from cloud_platform.AWS_Pricing import AWS_Pricing
-from cloud_platform.NodeManage import GCP_Manager
+from cloud_platform.Providers import PROVIDERS, build_provider
+from cloud_platform.Warm_Pool import Warm_Pool
+from cloud_platform.Pricing_Store import Pricing_Store
 from cluster.Monitor import K8s_Monitor
 from cluster.Scheduler import Scheduler
-import logging, os, threading, warnings,time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from kubernetes import watch
+from cluster.Consolidator import Consolidator
+from cluster.Admission import Admission
+from telemetry.Metrics import METRICS, PHASE_DURATION
+from telemetry.Profiler import Startup_Profile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, functools, logging, os, signal, threading, warnings
 
 warnings.filterwarnings("ignore")
 logger = logging.getLogger(__name__)
@@ -17,130 +20,298 @@ logging.basicConfig(
         )
 
 class System:
-    def __init__(self, falvor_pool, pricing_json):
-        self.gcp_pricing = GCP_Pricing(credential="./configurations/single-cloud-ylxq-ed1608c43bb4.json")
-        self.aws_pricing = AWS_Pricing()
+    def __init__(self, falvor_pool, pricing_json, metrics_port=9100, max_io_workers=8, consolidate_interval=300,
+                 warm_pool_size=0, warm_pool_interval=60, aws_offer_file=None, pricing_binary=None,
+                 metrics_host="127.0.0.1"):
+        """
+        构造过程不导入云平台SDK、不连接任何API：各平台的实现由build_provider按需加载，
+        SDK客户端和kubeconfig在第一次使用时才创建
+        :param metrics_host: 指标服务的监听地址，缺省只监听本机
+        """
+        self.profile = Startup_Profile()
+        with self.profile.phase("init"):
+            self._build(falvor_pool, pricing_json, metrics_port, max_io_workers, consolidate_interval,
+                        warm_pool_size, warm_pool_interval, aws_offer_file, pricing_binary, metrics_host)
+
+    def _build(self, falvor_pool, pricing_json, metrics_port, max_io_workers, consolidate_interval,
+               warm_pool_size, warm_pool_interval, aws_offer_file, pricing_binary, metrics_host):
+        self.gcp_pricing = build_provider("gcp", "pricing",
+                                          credential="./configurations/single-cloud-ylxq-ed1608c43bb4.json")
+        self.aws_pricing = build_provider("aws", "pricing", offer_file=aws_offer_file)
         self.flavor_pool = falvor_pool
         self.gcp_pricing.setup(self.flavor_pool)
+        self.aws_pricing.setup(self.flavor_pool)
 
-        self.gcp_manager = GCP_Manager()
+        self.gcp_manager = build_provider("gcp", "manager")
 
         self.k8s_monitor = K8s_Monitor(gcp_manager=self.gcp_manager,
                                        credential="./configurations/.kube/config")
         self.gcp_manager.add_k8s_monitor(self.k8s_monitor)
 
+        # warm_pool_size为预热池的最大节点数，0表示不启用
+        self.warm_pool = Warm_Pool(gcp_manager=self.gcp_manager,
+                                   k8s_monitor=self.k8s_monitor,
+                                   gcp_pricing=self.gcp_pricing,
+                                   flavor_pool=self.flavor_pool,
+                                   max_size=warm_pool_size) if warm_pool_size else None
+
+        # 只有在PROVIDERS中登记了节点管理器的平台进入候选池，AWS目前只有定价
+        schedulable = []
+        for model in (self.aws_pricing,):
+            if "manager" in PROVIDERS[model.provider]:
+                schedulable.append(model)
+            else:
+                logger.info(f"{model.provider}平台没有节点管理器，只刷新定价，其机型不参与调度")
         self.scheduler = Scheduler(k8s_monitor=self.k8s_monitor,
                                    gcp_manager=self.gcp_manager,
-                                   gcp_pricing=self.gcp_pricing)
+                                   gcp_pricing=self.gcp_pricing,
+                                   warm_pool=self.warm_pool,
+                                   pricing_models=schedulable,
+                                   node_managers={x.provider: build_provider(x.provider, "manager")
+                                                  for x in schedulable})
 
 
-        self.pricing_json = pricing_json
-        self._running = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.consolidator = Consolidator(k8s_monitor=self.k8s_monitor,
+                                         gcp_manager=self.gcp_manager,
+                                         scheduler=self.scheduler,
+                                         gcp_pricing=self.gcp_pricing)
 
+        self.admission = Admission()
+        self.scheduler.add_provision_listener(self.admission.observe_provision)
+
+        self.pricing_json = pricing_json
+        self.pricing_binary = pricing_binary
+        # 各平台的定价原子地写入pricing_json，配置pricing_binary时同时写一份可内存映射的二进制表
+        Pricing_Store.at(pricing_json, binary_fp=pricing_binary)
+        # 两个平台导出到同一个文件，在多次刷新之间共用同一把锁
+        self.pricing_lock = threading.Lock()
+        self.consolidate_interval = consolidate_interval
+        self.warm_pool_interval = warm_pool_interval
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        # 阻塞的SDK调用（GCE、Kubernetes、定价API）都在这个有界线程池中执行
+        self.executor = ThreadPoolExecutor(max_workers=max_io_workers, thread_name_prefix="io")
+        # 建节点（实例创建、SSH初始化、等待加入集群）单独使用一个线程池，慢的GCE调用不会阻塞调度和绑定
+        self.provision_executor = ThreadPoolExecutor(max_workers=self.scheduler.max_provision_workers,
+                                                     thread_name_prefix="provision")
+        self._tasks = set()
+        self._pending = None
+        self._stopping = None
 
-    def run(self):
-        self._running.set()
-        self.refresh_pricing()
-        self.executor.submit(self._periodic_task_wrapper,
-                             self.refresh_pricing,
-                             600)
 
-        self.executor.submit(self._monitor_pending_pods)
+    async def run(self):
+        """启动所有服务并运行到收到SIGINT/SIGTERM或调用stop()"""
+        loop = asyncio.get_running_loop()
+        self._pending = asyncio.Event()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass  # Windows的事件循环不支持信号回调
+        # informer在watch线程中发现待调度pod，转发到事件循环
+        self.k8s_monitor.add_pending_listener(lambda: loop.call_soon_threadsafe(self._pending.set))
+        try:
+            await self._start()
+            await self._stopping.wait()
+        finally:
+            await self.shutdown()
 
+    async def _start(self):
+        """
+        冷启动：用上一次持久化的定价快照，informer一就绪就开始调度
+        GCE实例列表和第一次定价刷新（导入GCP SDK、加载凭据、列出SKU）在后台并发进行；
+        没有快照时才等待第一次定价刷新
+        """
+        if self.metrics_port:
+            METRICS.serve(self.metrics_port, host=self.metrics_host)
+        with self.profile.phase("pricing_snapshot"):
+            loaded = await self._blocking(self.load_pricing_snapshot)
+        instances = self._spawn(self._timed("gcp_instances", self._blocking(self.gcp_manager.refresh)),
+                                "gcp-instances")
+        background = [instances]
+        first_refresh = self._timed("pricing_refresh", self.refresh_pricing())
+        if loaded:
+            background.append(self._spawn(first_refresh, "pricing-refresh"))
+            await self._timed("k8s_informer", self._blocking(self.k8s_monitor.start))
+        else:
+            await asyncio.gather(self._timed("k8s_informer", self._blocking(self.k8s_monitor.start)), first_refresh)
+        self._spawn(self._periodic_task_wrapper(self.refresh_pricing, 600), "pricing-periodic")
+        self._spawn(self._monitor_pending_pods(), "pending-pods")
+        self.profile.ready()
+        if self.consolidate_interval:
+            self._spawn(self._periodic_task_wrapper(self.consolidate, self.consolidate_interval), "consolidate")
+        if self.warm_pool is not None:
+            background.append(self._spawn(self._recover_warm_pool(instances), "warm-pool-recover"))
+        self._spawn(self._report_startup(background), "startup-report")
         logger.info("所有服务已启动")
 
-    def _periodic_task_wrapper(self, func: callable, interval: int):
+    def load_pricing_snapshot(self):
+        """优先内存映射二进制定价表，不存在时读取pricing.json"""
+        fp = self.pricing_binary if self.pricing_binary and os.path.isfile(self.pricing_binary) else self.pricing_json
+        loaded = self.gcp_pricing.load_snapshot(fp, "gcp")
+        self.aws_pricing.load_snapshot(fp, "aws")
+        return loaded
+
+    async def _timed(self, name, aw):
+        with self.profile.phase(name):
+            return await aw
+
+    async def _recover_warm_pool(self, instances):
+        # 找回预热节点需要GCE实例列表
+        await asyncio.gather(instances, return_exceptions=True)
+        try:
+            await self._timed("warm_pool_recover", self._blocking(self.warm_pool.recover))
+        finally:
+            self._spawn(self._periodic_task_wrapper(self.reconcile_warm_pool, self.warm_pool_interval), "warm-pool")
+
+    async def _report_startup(self, background):
+        await asyncio.wait(background, timeout=600)
+        self.profile.report()
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _blocking(self, func, *args, **kwargs):
+        """在有界线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _spawn(self, coro, name):
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"后台任务{task.get_name()}异常退出: {task.exception()}")
+
+    async def _periodic_task_wrapper(self, func: callable, interval: int):
         """定时任务包装器"""
-        while self._running.is_set():
-            time.sleep(interval)
+        while True:
+            await asyncio.sleep(interval)
             try:
-                func()
+                await func()
             except Exception as e:
                 logger.error(f"定时任务执行失败: {str(e)}")
 
-    def refresh_pricing(self):
+    async def refresh_pricing(self):
         logger.info("开始刷新定价模型")
-        lock = threading.Lock()
-        try:
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                futures = {executor.submit(self.gcp_pricing.refresh(self.pricing_json, lock), name="gcp"): "gcp",
-                           executor.submit(self.aws_pricing.refresh(self.pricing_json, lock), name="aws"): "aws"}
+        lock = self.pricing_lock
+        with PHASE_DURATION.time(phase="pricing_refresh"):
+            results = await asyncio.gather(self._blocking(self.gcp_pricing.refresh, self.pricing_json, lock),
+                                           self._blocking(self.aws_pricing.refresh, self.pricing_json, lock),
+                                           return_exceptions=True)
+        for name, result in zip(("gcp", "aws"), results):
+            if isinstance(result, Exception):
+                logger.error(f"{name}定价刷新出现故障: {str(result)}")
+            else:
+                logger.info(f"{name}定价刷新已完成！")
+
+    async def consolidate(self):
+        """缩容耗时与建节点相当（排空、删除实例），使用建节点的线程池"""
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(self.provision_executor, self.consolidator.run_once)
+        if removed:
+            logger.info(f"缩容完成，删除了节点{removed}")
 
-                for future in as_completed(futures):
-                    logger.info(f"{futures[future]}定价刷新线程已完成！")
-        except Exception as e:
-            logger.error(f"主程序定价刷新出现故障")
+    async def reconcile_warm_pool(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.provision_executor, self.warm_pool.reconcile)
 
     def refresh_cluster(self):
         logger.info("开始刷新节点状态")
         self.gcp_manager.refresh()
         logger.info("GCP节点状态刷新完成！")
-        self.k8s_monitor.refresh()
+        if not self.k8s_monitor.running:
+            # informer未运行时退化为全量list
+            self.k8s_monitor.refresh()
         logger.info("Kubernetes集群状态更新完成！")
 
-    def _monitor_pending_pods(self):
-        """基于K8s Watch API的事件驱动监控"""
+    async def _monitor_pending_pods(self, resync=30):
+        """基于K8s Watch API的事件驱动监控，informer发现待调度pod后立即触发"""
         logger.info("开始监听集群pods")
-        while self._running.is_set():
+        while True:
             try:
-                # 获取所有Pod并过滤Pending状态且使用自定义调度器的
-                pods = self.k8s_monitor.core_v1.list_pod_for_all_namespaces().items
-                pending_count = 0
-                for pod in pods:
-                    if pod.status.phase == "Pending" and pod.spec.scheduler_name == "custom-scheduling" and pod.metadata.namespace == "default":
-                        pending_count += 1
-                if pending_count > 0:
-                    logger.warning(f"检测到{pending_count}个Pending Pod，触发调度")
-                    self._trigger_emergency_scheduler()
-                    time.sleep(10)
+                try:
+                    await asyncio.wait_for(self._pending.wait(), timeout=resync)
+                    notified = True
+                except asyncio.TimeoutError:
+                    notified = False
+                self._pending.clear()
+                if notified:
+                    pending_count = len(self.scheduler._get_pending_pod())
                 else:
-                    logger.info("当前没有Pending Pod")
-                time.sleep(10)
+                    # 定期与API Server核对，防止遗漏watch事件；只拉取过滤后的pending pod
+                    pending_count = await self._blocking(lambda: sum(1 for _ in self.k8s_monitor.iter_pending_pods()))
+                    if pending_count > len(self.k8s_monitor.pending_pods):
+                        logger.warning("informer缓存与API Server不一致，重新list")
+                        await self._blocking(self.k8s_monitor.refresh)
+                    pending_count = len(self.scheduler._get_pending_pod())
+                if pending_count > 0:
+                    logger.warning(f"检测到{pending_count}个Pending Pod，开始收集本批pod")
+                    batch = await self.admission.collect(
+                        self._pending,
+                        self.scheduler._get_pending_pod,
+                        lambda pods: self.admission.fits_free(pods, self.scheduler._get_available_node()))
+                    if batch:
+                        await self._trigger_emergency_scheduler()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"检查Pending Pod时出现错误: {str(e)}")
-                time.sleep(5)  # 错误后等待5秒再重试
-                raise
+                await asyncio.sleep(5)  # 错误后等待5秒再重试
 
 
-    def _trigger_emergency_scheduler(self):
+    async def _trigger_emergency_scheduler(self):
         """紧急调度流程"""
         logger.info("触发调度...")
-        self.refresh_cluster()
-        self.refresh_cluster()
+        with PHASE_DURATION.time(phase="cluster_refresh"):
+            await self._blocking(self.refresh_cluster)
          # 执行调度
-        self._trigger_scheduling()
+        await self._trigger_scheduling()
 
-    def _trigger_scheduling(self):
-        """触发调度流程"""
-        try:
-            logger.info("开始调度流程...")
-            result = self.scheduler.schedule()
-            if result:
-                self.scheduler.execute(result)
-                logger.info("调度执行完成")
-                self.refresh_cluster()
-            else:
-                logger.info("无需要调度的任务")
-        except Exception as e:
-            logger.error(f"调度执行失败: {str(e)}")
-            raise
-
-    def shutdown(self):
-        """停止所有后台服务"""
-        self._running.clear()
-        self.executor.shutdown(wait=False)
+    async def _trigger_scheduling(self):
+        """
+        触发调度流程
+        方案的执行（建节点、绑定）作为后台任务运行，不阻塞对新pending pod的检测
+        """
+        logger.info("开始调度流程...")
+        result = await self._blocking(self.scheduler.schedule)
+        if result:
+            self._spawn(self._execute(result), "execute")
+        else:
+            logger.info("无需要调度的任务")
+
+    async def _execute(self, plan):
+        with PHASE_DURATION.time(phase="execute"):
+            bind_results = await self.scheduler.execute_async(plan, self.executor, self.provision_executor)
+        failed = [x for x in bind_results if not x.success]
+        if failed:
+            # 绑定失败的pod仍处于Pending，唤醒调度循环在下一轮重新调度
+            logger.warning(f"{len(failed)}个Pod绑定失败，将在下一轮重新调度: {[x.pod.name for x in failed]}")
+            self._pending.set()
+        logger.info("调度执行完成")
+
+    async def shutdown(self):
+        """取消所有后台任务并停止服务"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.k8s_monitor.stop()
+        METRICS.shutdown()
+        # 已在执行的SDK调用无法中断，不再等待；排队中的调用直接取消
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.provision_executor.shutdown(wait=False, cancel_futures=True)
         logger.info("系统服务已关闭")
 
 
 if __name__=="__main__":
     system = System(falvor_pool="data/pre-defined-flavors.json",
-                    pricing_json="data/pricing.json")
-    try:
-        system.run()
-        while True:  # 保持主线程运行
-            time.sleep(1)
-    except KeyboardInterrupt:
-        system.shutdown()
-    finally:
-        os._exit(1)  # 强制退出
\ No newline at end of file
+                    pricing_json="data/pricing.json",
+                    pricing_binary="data/pricing.bin")
+    asyncio.run(system.run())
@@ -1,36 +1,171 @@
 from collections import defaultdict
-import logging, json
+from cloud_platform.Pricing_Model import Pricing_Model
+from cloud_platform.Json_Stream import Json_Stream, Truncated_Json
+import logging
 
 logger = logging.getLogger(__name__)
 
-class AWS_Pricing():
-    def __init__(self):
-        pass
+class AWS_Pricing(Pricing_Model):
+    """
+    从本地的EC2价目文件（AmazonEC2 offer file，即index.json）流式解析定价
+    - 只保留指定region、预定义机型池内的按需（OnDemand）、Linux、共享租户的SKU
+    - 价目文件可达数GB，逐个解码products和terms.OnDemand下的条目，内存占用与文件大小无关
+    - 文件被截断、或解析出的机型为空或明显少于当前定价时，本次刷新失败，继续使用上一次成功的定价
+    """
+    provider = "aws"
+    # 新定价表的机型数少于当前定价的这个比例时，视为价目文件不完整
+    MIN_RETAINED = 0.5
+    # 与控制台上Linux按需实例报价对应的SKU属性
+    SKU_FILTER = {"operatingSystem": "Linux",
+                  "tenancy": "Shared",
+                  "preInstalledSw": "NA",
+                  "capacitystatus": "Used"}
 
-    def export(self, fp):
+    def __init__(self, offer_file=None, region="ap-southeast-2", chunk_size=1 << 20):
         """
-        导出对应的定价数据
-        :return:
+        :param offer_file: 本地价目文件，为None时跳过AWS定价刷新
+        :param region: regionCode，与GCP的australia-southeast1同在悉尼
+        :param chunk_size: 流式解析价目文件时每次读入的字符数
         """
-        pass
+        super().__init__()
+        self.offer_file = offer_file
+        self.region = region
+        self.chunk_size = chunk_size
+        self.pre_defined_vm = []
+
+    def setup(self, fp):
+        self.pre_defined_vm = self._read_flavor_pool(fp, "aws")
+        logger.info(f"AWS 定价模型配置完成")
+
+    def export(self, fp):
+        self._export(fp)
 
     def refresh(self, fp, lock):
         """
-        刷新GCP/AWS当前时刻的定价模型和可用机型，及对应的定价数据
-        开机时执行一次refresh可以初始化
-        :return:
+        与GCP相同：在新的表中构建定价，全部成功后再原子地替换当前视图
         """
-        pass
+        if self.offer_file is None:
+            logger.warning("未配置AWS价目文件，跳过AWS定价刷新")
+            return
+        try:
+            machine_cache, pricing_cache = self.fetch_pricing_model()
+            machine2price = self.calculate_pricing(machine_cache, pricing_cache)
+            self._check(machine2price)
+        except Exception:
+            logger.error(f"AWS定价刷新失败，继续使用版本{self.version}的定价"
+                         f"{'（已超过TTL）' if self.stale else ''}")
+            raise
+        version = self._stamp(machine2price)
+        self._publish(machine_cache, pricing_cache, machine2price, version)
+        logger.info(f"AWS定价已更新到版本{version}，共{len(machine2price)}个机型")
+        with lock:
+            self.export(fp)
+
+    def _check(self, machine2price):
+        """新的定价表为空或比当前的小得多时抛出ValueError"""
+        if not machine2price:
+            raise ValueError(f"AWS价目文件{self.offer_file}中没有解析出任何机型的定价")
+        current = len(self.machine2price_cache)
+        if len(machine2price) < self.MIN_RETAINED * current:
+            raise ValueError(f"AWS价目文件{self.offer_file}只解析出{len(machine2price)}个机型的定价，"
+                             f"当前定价有{current}个，价目文件可能不完整")
 
     def fetch_pricing_model(self):
         """
-        获取GCP/AWS对于Compute Engine的定价模块数据
-        :return:
+        流式读取价目文件
+        :return: (machine_cache, pricing_cache)
+                 machine_cache为{sku: {"type", "CPU", "RAM"}}，pricing_cache为{sku: 每小时价格}
         """
-        pass
+        logger.info(f"开始解析AWS价目文件{self.offer_file}（region={self.region}）")
+        machine_cache, pricing_cache = {}, {}
+        with open(self.offer_file, 'r', encoding='utf-8') as f:
+            stream = Json_Stream(f, chunk_size=self.chunk_size)
+            try:
+                for key in stream.iter_keys():
+                    if key == "products":
+                        self._read_products(stream, machine_cache)
+                    elif key == "terms":
+                        self._read_terms(stream, machine_cache, pricing_cache)
+                    else:
+                        stream.skip_value()
+            except Truncated_Json:
+                # 没有读到最外层对象的结尾，已解析的部分不能代替完整的定价
+                logger.error(f"AWS价目文件{self.offer_file}不完整（已解析{len(machine_cache)}个SKU和"
+                             f"{len(pricing_cache)}个报价），放弃本次解析")
+                raise
+        logger.info(f"价目文件中共有{len(machine_cache)}个相关SKU，{len(pricing_cache)}个按需报价")
+        return machine_cache, pricing_cache
+
+    def _read_products(self, stream, machine_cache):
+        wanted = set(self.pre_defined_vm)
+        for sku in stream.iter_keys():
+            entry = self._parse_product(stream.read_value(), wanted)
+            if entry is not None:
+                machine_cache[sku] = entry
+
+    def _parse_product(self, product, wanted):
+        """解析单个product，不符合条件时返回None"""
+        attributes = product.get("attributes", {})
+        if product.get("productFamily") != "Compute Instance" or \
+                attributes.get("regionCode") != self.region or \
+                attributes.get("instanceType") not in wanted:
+            return None
+        if any(attributes.get(k) != v for k, v in self.SKU_FILTER.items()):
+            return None
+        try:
+            return {"type": attributes["instanceType"],
+                    "CPU": int(attributes["vcpu"]),
+                    # 形如"16 GiB"或"1,024 GiB"
+                    "RAM": float(attributes["memory"].split()[0].replace(",", ""))}
+        except (KeyError, ValueError):
+            logger.warning(f"无法解析SKU {product.get('sku')}的规格: {attributes}")
+            return None
+
+    def _read_terms(self, stream, machine_cache, pricing_cache):
+        for term_type in stream.iter_keys():
+            if term_type != "OnDemand":
+                stream.skip_value()
+                continue
+            for sku in stream.iter_keys():
+                # 只解码已选中的SKU，其余SKU按括号跳过
+                if sku not in machine_cache:
+                    stream.skip_value()
+                    continue
+                price = self._parse_terms(stream.read_value())
+                if price is not None:
+                    pricing_cache[sku] = price
+
+    @staticmethod
+    def _parse_terms(terms):
+        """从一个SKU的OnDemand条款中取按小时计费的美元价格"""
+        for offer in terms.values():
+            for dimension in offer.get("priceDimensions", {}).values():
+                if dimension.get("unit") == "Hrs" and "USD" in dimension.get("pricePerUnit", {}):
+                    return float(dimension["pricePerUnit"]["USD"])
+        return None
 
     def fetch_machine_types(self):
-        pass
+        """机型规格随价目文件一起解析，返回上一次解析得到的结果"""
+        return self.machine_cache
 
-    def calculate_pricing(self):
-        pass
\ No newline at end of file
+    def calculate_pricing(self, machine_cache=None, pricing_cache=None):
+        logger.info("开始计算AWS平台当前可用机型的定价")
+        machine_cache = self.machine_cache if machine_cache is None else machine_cache
+        pricing_cache = self.pricing_cache if pricing_cache is None else pricing_cache
+        machine2price = defaultdict(dict)
+        for sku, vm in machine_cache.items():
+            price = pricing_cache.get(sku)
+            if price is None:
+                continue
+            # 同一机型可能有多个符合条件的SKU，取最便宜的
+            old = machine2price.get(vm['type'])
+            if old is None or price < old['price']:
+                machine2price[vm['type']] = {
+                    "CPU": vm['CPU'],
+                    "RAM": vm['RAM'],
+                    "price": price
+                }
+        missing = set(self.pre_defined_vm) - set(machine2price)
+        if missing:
+            logger.warning(f"价目文件中没有找到以下AWS机型的报价: {sorted(missing)}")
+        return machine2price
@@ -0,0 +1,122 @@
+import io, logging, shlex
+
+logger = logging.getLogger(__name__)
+
+JOIN_COMMAND = ("kubeadm join 10.152.0.4:6443 --token nfzjac.ip3yptkayzmspjs3 "
+                "--discovery-token-ca-cert-hash sha256:5204c31dc557d21a76881656acda54c5b9f199e1696ab8776c187d8dbd56029f")
+
+STEP_MARKER = "##STEP"
+FAIL_MARKER = "##FAILED"
+
+# worker节点初始化步骤，每一步都可以重复执行
+WORKER_STEPS = [
+    ("hostname", '''
+hostnamectl set-hostname "$NODE_NAME"
+'''),
+    ("kernel-modules", '''
+modprobe overlay
+modprobe br_netfilter
+printf 'overlay\\nbr_netfilter\\n' > /etc/modules-load.d/kubernetes.conf
+'''),
+    ("sysctl", '''
+cat > /etc/sysctl.d/kubernetes.conf <<EOF
+net.bridge.bridge-nf-call-iptables = 1
+net.bridge.bridge-nf-call-ip6tables = 1
+net.ipv4.ip_forward = 1
+EOF
+sysctl --system > /dev/null
+'''),
+    ("timezone", '''
+timedatectl set-timezone Australia/Melbourne
+'''),
+    ("apt-repositories", '''
+mkdir -p /etc/apt/keyrings
+[ -f /etc/apt/keyrings/docker.gpg ] || \\
+  curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /etc/apt/keyrings/docker.gpg
+[ -f /etc/apt/keyrings/kubernetes-apt-keyring.gpg ] || \\
+  curl -fsSL https://pkgs.k8s.io/core:/stable:/v1.32/deb/Release.key | gpg --dearmor -o /etc/apt/keyrings/kubernetes-apt-keyring.gpg
+echo "deb [arch=$(dpkg --print-architecture) signed-by=/etc/apt/keyrings/docker.gpg] https://download.docker.com/linux/ubuntu $(lsb_release -cs) stable" \\
+  > /etc/apt/sources.list.d/docker.list
+echo 'deb [signed-by=/etc/apt/keyrings/kubernetes-apt-keyring.gpg] https://pkgs.k8s.io/core:/stable:/v1.32/deb/ /' \\
+  > /etc/apt/sources.list.d/kubernetes.list
+apt-get update -q
+if [ "$UPGRADE" = "1" ]; then apt-get upgrade -y -q; fi
+'''),
+    ("packages", '''
+apt-get install -y -q nfs-common rpcbind containerd.io kubelet kubeadm kubectl
+apt-mark hold kubelet kubeadm kubectl
+'''),
+    ("containerd", '''
+mkdir -p /etc/containerd
+[ -s /etc/containerd/config.toml ] && grep -q SystemdCgroup /etc/containerd/config.toml || \\
+  containerd config default > /etc/containerd/config.toml
+sed -i 's/SystemdCgroup = false/SystemdCgroup = true/' /etc/containerd/config.toml
+systemctl restart containerd
+systemctl enable containerd
+'''),
+    ("kubeadm-join", '''
+if [ -f /etc/kubernetes/kubelet.conf ]; then
+  echo "节点已加入集群，跳过kubeadm join"
+else
+  $JOIN_COMMAND
+fi
+'''),
+]
+
+
+def build_worker_script(join_command=JOIN_COMMAND, upgrade=False):
+    """
+    生成worker节点的一次性初始化脚本
+    节点名优先取环境变量NODE_NAME，否则从GCE元数据服务器读取（startup-script模式）
+    每一步开始时输出"##STEP <序号> <名称>"，失败时输出"##FAILED <序号> <名称>"
+    """
+    lines = [
+        "#!/bin/bash",
+        "set -euo pipefail",
+        "export DEBIAN_FRONTEND=noninteractive",
+        'NODE_NAME="${NODE_NAME:-$(curl -fs -H "Metadata-Flavor: Google" '
+        'http://metadata.google.internal/computeMetadata/v1/instance/name)}"',
+        f"UPGRADE={'1' if upgrade else '0'}",
+        f"JOIN_COMMAND={shlex.quote(join_command)}",
+        'CURRENT_STEP="init"',
+        f'trap \'echo "{FAIL_MARKER} $CURRENT_STEP"\' ERR',
+    ]
+    for no, (name, body) in enumerate(WORKER_STEPS, start=1):
+        lines.append(f'CURRENT_STEP="{no} {name}"')
+        lines.append(f'echo "{STEP_MARKER} $CURRENT_STEP"')
+        lines.append(body.strip("\n"))
+    lines.append(f'echo "{STEP_MARKER} done"')
+    return "\n".join(lines) + "\n"
+
+
+def run_script_over_ssh(ssh_client, script, node_name, remote_path="/tmp/k8s-worker-bootstrap.sh"):
+    """
+    通过SFTP上传脚本并在同一个SSH会话里执行，实时把输出写入日志
+    失败时抛出的异常会指明具体失败的步骤
+    """
+    sftp = ssh_client.open_sftp()
+    try:
+        sftp.putfo(io.BytesIO(script.encode()), remote_path)
+        sftp.chmod(remote_path, 0o755)
+    finally:
+        sftp.close()
+
+    command = f"sudo env NODE_NAME={shlex.quote(node_name)} bash {remote_path} 2>&1"
+    stdin, stdout, stderr = ssh_client.exec_command(command)
+    step, tail = "init", []
+    for line in iter(stdout.readline, ""):
+        line = line.rstrip()
+        if line.startswith(STEP_MARKER):
+            step = line[len(STEP_MARKER):].strip()
+            logger.info(f"[{node_name}] 初始化步骤: {step}")
+        elif line.startswith(FAIL_MARKER):
+            step = line[len(FAIL_MARKER):].strip()
+        else:
+            logger.debug(f"[{node_name}] {line}")
+            tail = (tail + [line])[-20:]
+    exit_status = stdout.channel.recv_exit_status()
+    if exit_status != 0:
+        output = "\n".join(tail)
+        logger.error(f"[{node_name}] 初始化脚本在步骤'{step}'失败 (Exit code {exit_status}):\n{output}")
+        raise RuntimeError(f"节点{node_name}初始化失败于步骤'{step}' (Exit code {exit_status}): {output}")
+    logger.info(f"[{node_name}] 初始化脚本执行完毕")
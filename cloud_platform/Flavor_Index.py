@@ -0,0 +1,98 @@
+from collections import namedtuple
+import numpy as np
+import bisect, logging
+
+logger = logging.getLogger(__name__)
+
+
+class Flavor(namedtuple("Flavor", ["type", "cpu", "ram", "price", "provider"], defaults=(None,))):
+    __slots__ = ()
+
+    def as_config(self):
+        """转换成Node构造所需的配置字典"""
+        return {"type": self.type, "CPU": self.cpu, "RAM": self.ram, "price": self.price,
+                "provider": self.provider}
+
+
+class Flavor_Index:
+    """
+    不可变的机型索引，每次计算完定价后构建一次
+    - 按(CPU, RAM)排序，查询"能容纳(cpu, ram)的机型"只需二分查找加一次小范围扫描
+    - 剔除被其它机型在价格、CPU、RAM上同时支配的机型（更贵且不更大）
+    - 只读取定价数据，不会修改定价缓存
+    - 每个机型带有所属的云平台（provider），merge()可以把多个平台的索引合成一个候选池
+    """
+    def __init__(self, machine2price=None, prune=True, provider=None):
+        flavors = [Flavor(name, x["CPU"], x["RAM"], x["price"], provider)
+                   for name, x in (machine2price or {}).items()]
+        self._build(flavors, prune)
+
+    @classmethod
+    def merge(cls, indexes, prune=True):
+        """
+        合并多个平台的机型索引
+        跨平台剔除被支配的机型，同规格下只保留最便宜的平台
+        """
+        index = cls.__new__(cls)
+        index._build([f for x in indexes for f in x], prune)
+        return index
+
+    def _build(self, flavors, prune):
+        total = len(flavors)
+        if prune:
+            flavors = self._pareto(flavors)
+        flavors.sort(key=lambda f: (f.cpu, f.ram, f.price, f.type, f.provider or ""))
+        if total != len(flavors):
+            logger.info(f"机型索引剔除了{total - len(flavors)}个被支配机型，剩余{len(flavors)}个")
+
+        self._flavors = tuple(flavors)
+        self._cpu_keys = [f.cpu for f in flavors]
+        self.cpu = self._frozen([f.cpu for f in flavors])
+        self.ram = self._frozen([f.ram for f in flavors])
+        self.price = self._frozen([f.price for f in flavors])
+
+    @staticmethod
+    def _frozen(values):
+        arr = np.array(values, dtype=float)
+        arr.setflags(write=False)
+        return arr
+
+    @staticmethod
+    def _pareto(flavors):
+        """保留帕累托前沿：不存在另一个机型价格不高于它且CPU、RAM都不小于它"""
+        by_price = sorted(flavors, key=lambda f: (f.price, -f.cpu, -f.ram, f.type, f.provider or ""))
+        kept = []
+        for f in by_price:
+            if any(g.cpu >= f.cpu and g.ram >= f.ram for g in kept):
+                continue
+            kept.append(f)
+        return kept
+
+    def __len__(self):
+        return len(self._flavors)
+
+    def __iter__(self):
+        return iter(self._flavors)
+
+    def __getitem__(self, idx):
+        return self._flavors[idx]
+
+    def fits(self, cpu, ram):
+        """返回所有能容纳(cpu, ram)的机型，顺序与索引一致"""
+        start = bisect.bisect_left(self._cpu_keys, cpu)
+        return tuple(f for f in self._flavors[start:] if f.ram >= ram)
+
+    def fit_indices(self, cpu, ram):
+        """fits的向量化版本，返回满足条件的机型下标数组"""
+        start = int(np.searchsorted(self.cpu, cpu, side="left"))
+        return start + np.flatnonzero(self.ram[start:] >= ram)
+
+    def get(self, type, provider=None):
+        for f in self._flavors:
+            if f.type == type and (provider is None or f.provider == provider):
+                return f
+        return None
+
+    @property
+    def providers(self):
+        return sorted({f.provider for f in self._flavors if f.provider is not None})
@@ -1,68 +1,84 @@
 import json
+from collections import defaultdict
 
 from cloud_platform.Pricing_Model import Pricing_Model
-from google.cloud import compute_v1, billing_v1
-import os, logging,time
+from cloud_platform.Providers import lazy_import
+import os, logging
 
+compute_v1 = lazy_import("google.cloud.compute_v1")
+billing_v1 = lazy_import("google.cloud.billing_v1")
 logger = logging.getLogger(__name__)
 
 class GCP_Pricing(Pricing_Model):
+    provider = "gcp"
+
     def __init__(self, project_id="single-cloud-ylxq",
                  region="australia-southeast1",
                  zone="b",
                  credential=None):
         super().__init__()
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credential
+        if credential is not None:
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credential
         self.project_id = project_id
         self.region = region
         self.zone = f"{self.region}-{zone}"
         self.pre_defined_vm = []
-        self.compute_client = compute_v1.MachineTypesClient()
-        self.billing_client = billing_v1.CloudCatalogClient()
+        # SDK客户端在第一次刷新时才创建，从快照热启动时不需要导入SDK和加载凭据
+        self._compute_client = None
+        self._billing_client = None
+        self.compute_service_id = None
+        # sku_id -> (指纹, 解析结果)，指纹不变的SKU在后续刷新中直接复用
+        self._sku_cache = {}
+
+    @property
+    def compute_client(self):
+        if self._compute_client is None:
+            self._compute_client = compute_v1.MachineTypesClient()
+        return self._compute_client
+
+    @property
+    def billing_client(self):
+        if self._billing_client is None:
+            self._billing_client = billing_v1.CloudCatalogClient()
+        return self._billing_client
 
     def setup(self, fp):
         self.pre_defined_vm = self._read_flavor_pool(fp, "gcp")
         logger.info(f"GCP 定价模型配置完成")
 
     def refresh(self, fp, lock):
-        self.machine_cache.clear()
-        self.pricing_cache.clear()
-        self.machine2price_cache.clear()
-
-        self.fetch_machine_types()
-        self.fetch_pricing_model()
-        lock.acquire()
-        self.calculate_pricing()
-        self.export(fp)
-        lock.release()
+        """
+        在新的表中构建定价，全部成功后再原子地替换当前视图
+        任何一步失败都会保留上一次成功的定价（last-known-good）
+        """
+        try:
+            machine_cache = self.fetch_machine_types()
+            pricing_cache = self.fetch_pricing_model(machine_cache)
+            machine2price = self.calculate_pricing(machine_cache, pricing_cache)
+        except Exception:
+            logger.error(f"GCP定价刷新失败，继续使用版本{self.version}的定价"
+                         f"{'（已超过TTL）' if self.stale else ''}")
+            raise
+        version = self._stamp(machine2price)
+        self._publish(machine_cache, pricing_cache, machine2price, version)
+        logger.info(f"GCP定价已更新到版本{version}，共{len(machine2price)}个机型")
+        with lock:
+            self.export(fp)
 
     def export(self, fp):
-        temp = [{k:v} for k,v in self.machine2price_cache.items()]
-        if os.path.isfile(fp):
-            logger.info(f"刷新系统内GCP相关机器定价数据，文件目录{fp}")
-            with open(fp, 'r') as f:
-                data = json.load(f)
-                aws = data.get('aws', {})
-                res = {'gcp': temp,
-                       'aws': aws}
-            with open(fp, 'w') as f:
-                json.dump(res, f)
-
-        else:
-            logger.info(f"初始化系统内的GCP相关机器定价数据，文件目录{fp}")
-            with open(fp, 'w') as f:
-                res = {'gcp': temp,
-                       "aws":{}}
-                json.dump(res, f)
-
-    def fetch_pricing_model(self):
+        self._export(fp)
+
+    def fetch_pricing_model(self, machine_cache=None):
         logger.info("开始获取当前机型范围内所有定价模型")
-        time.sleep(5)
-        services = list(self.billing_client.list_services())
-        self.compute_service_id = next(
-            s.name for s in services
-            if s.display_name == "Compute Engine"
-        )
+        machine_cache = self.machine_cache if machine_cache is None else machine_cache
+        if machine_cache == {}:
+            raise Exception("请先获取项目可用VM类型")
+        if self.compute_service_id is None:
+            services = list(self.billing_client.list_services())
+            self.compute_service_id = next(
+                s.name for s in services
+                if s.display_name == "Compute Engine"
+            )
         skus = self.billing_client.list_skus(parent=self.compute_service_id)
         skus = [sku
                 for sku in skus
@@ -70,24 +86,35 @@ class GCP_Pricing(Pricing_Model):
                 self.region in sku.service_regions and
                 ("Instance Core" in sku.description or "Instance Ram" in sku.description) and
                 len(sku.description.split(" ")) <= 7]
+        pricing_cache = defaultdict(dict)
+        sku_cache, reused = {}, 0
         for sku in skus:
-            entry = self._parse_sku(sku)
-            if entry:
-                self.pricing_cache[entry['id']][entry['resource']] = entry['price']
-                print(f"\t{entry['id']}型号的{entry['resource']}报价={entry['price']:6f}每小时")
+            fingerprint = self._sku_fingerprint(sku)
+            cached = self._sku_cache.get(sku.sku_id)
+            if cached is not None and cached[0] == fingerprint:
+                entry = cached[1]
+                reused += 1
+            else:
+                entry = self._parse_sku(sku)
+            sku_cache[sku.sku_id] = (fingerprint, entry)
+            if entry and entry['id'] in machine_cache:
+                pricing_cache[entry['id']][entry['resource']] = entry['price']
+                logger.debug(f"\t{entry['id']}型号的{entry['resource']}报价={entry['price']:6f}每小时")
+        self._sku_cache = sku_cache
+        logger.info(f"共{len(skus)}个相关SKU，其中{reused}个未变化直接复用")
 
-        return self.pricing_cache
+        return pricing_cache
+
+    def _sku_fingerprint(self, sku):
+        """SKU的定价生效时间和描述不变，则其报价不变"""
+        return (sku.description,
+                tuple(str(info.effective_time) for info in sku.pricing_info))
 
     def _parse_sku(self, sku):
         """解析单个SKU的数据结构"""
         try:
             # 切分后第一个是类似“n4”, "c3"类似
             mt_id = sku.description.lower().split()[0]
-            if self.machine_cache == {}:
-                raise Exception("请先获取项目可用VM类型")
-            else:
-                if mt_id not in self.machine_cache.keys():
-                    return None
             # 解析定价信息
             for tier in sku.pricing_info:
                 pricing_expression = tier.pricing_expression
@@ -109,6 +136,7 @@ class GCP_Pricing(Pricing_Model):
     def fetch_machine_types(self):
         logger.info(f"开始Fetch GCP的{self.zone}下的所有可用机器类型")
         # 构建“列出所有可用机型“的请求body
+        machine_cache = defaultdict(list)
         try:
             request = compute_v1.ListMachineTypesRequest(
                 project=self.project_id,
@@ -122,24 +150,26 @@ class GCP_Pricing(Pricing_Model):
                         "CPU": mt.guest_cpus,
                         "RAM": mt.memory_mb
                     }
-                    self.machine_cache[mt.name.split('-')[0]].append(info)
+                    machine_cache[mt.name.split('-')[0]].append(info)
                     #print(f"\t{info}")
         except Exception as e:
             logger.error(f"错误发生在获取GCP可用VM时")
             print(e)
             raise
 
-        return self.machine_cache
+        return machine_cache
 
-    def calculate_pricing(self):
+    def calculate_pricing(self, machine_cache=None, pricing_cache=None):
         logger.info("开始计算GCP平台当前可用机型的定价")
-        #time.sleep(5)
+        machine_cache = self.machine_cache if machine_cache is None else machine_cache
+        pricing_cache = self.pricing_cache if pricing_cache is None else pricing_cache
+        machine2price = defaultdict(dict)
         try:
-            for type, vms in self.machine_cache.items():
-                cpu_p, ram_p = self.pricing_cache[type]['CPU'], self.pricing_cache[type]['RAM']
+            for type, vms in machine_cache.items():
+                cpu_p, ram_p = pricing_cache[type]['CPU'], pricing_cache[type]['RAM']
                 for vm in vms:
                     vcpu, ram = vm['CPU'], vm['RAM'] / 1024
-                    self.machine2price_cache[vm['type']] = {
+                    machine2price[vm['type']] = {
                         "CPU": vcpu,
                         "RAM": ram,
                         "price": vcpu * cpu_p + ram_p * ram
@@ -150,7 +180,7 @@ class GCP_Pricing(Pricing_Model):
             print(e)
             raise
 
-        return self.machine2price_cache
+        return machine2price
 
 
 if __name__=="__main__":
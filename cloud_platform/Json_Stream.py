@@ -0,0 +1,147 @@
+import json, re
+
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_STRUCT = re.compile(r'["{}\[\]]')
+_SCALAR = re.compile(r'[^,}\]\s]+')
+_WS = re.compile(r'\s*')
+
+
+class Truncated_Json(ValueError):
+    """文件在一个JSON值的中间结束"""
+    pass
+
+
+class Json_Stream:
+    """
+    按块读取大JSON文件的增量解析器，内存占用只与缓冲区和单个被解码的值有关
+    - iter_keys()逐个产出对象的键，调用方随后必须用read_value()或skip_value()消费对应的值
+    - read_value()只完整解码一个对象值；skip_value()跳过任意值，跨越多个块的大对象会逐层展开，不会整体读入内存
+    - 文件被截断时抛出Truncated_Json，此前产出的结果仍然有效
+    """
+    def __init__(self, f, chunk_size=1 << 20, max_value_size=16 << 20):
+        """
+        :param f: 以文本模式打开的文件
+        :param max_value_size: read_value()允许的单个值的最大长度，防止格式错误时把整个文件读入内存
+        """
+        self.f = f
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """读入下一块，文件结束时返回False"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 丢弃已经消费的部分，缓冲区大小保持在一两个块之内
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        self._skip_ws()
+        if self.pos >= len(self.buf):
+            raise Truncated_Json("JSON在此处被截断")
+        return self.buf[self.pos]
+
+    def _skip_ws(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"期望'{char}'，实际为'{self.buf[self.pos]}'（位置{self.pos}）")
+        self.pos += 1
+
+    def _match(self, pattern):
+        """匹配到缓冲区末尾时先补充数据再重试，保证匹配不被块边界截断"""
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if m is not None and m.end() < len(self.buf):
+                return m
+            if not self._fill():
+                if m is None:
+                    raise Truncated_Json("JSON在此处被截断")
+                return m
+
+    def read_string(self):
+        self._peek()
+        m = self._match(_STRING)
+        self.pos = m.end()
+        return json.loads(m.group())
+
+    def iter_keys(self):
+        """逐个产出当前对象的键"""
+        self._expect("{")
+        first = True
+        while True:
+            if self._peek() == "}":
+                self.pos += 1
+                return
+            if not first:
+                self._expect(",")
+            first = False
+            key = self.read_string()
+            self._expect(":")
+            yield key
+
+    def read_value(self):
+        """解码一个对象或数组值"""
+        if self._peek() not in "{[":
+            raise ValueError("read_value只解码对象或数组")
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return value
+            except json.JSONDecodeError:
+                # 值跨越了块边界，补充数据后重试
+                if len(self.buf) - self.pos > self.max_value_size:
+                    raise ValueError(f"位置{self.pos}处的值超过{self.max_value_size}字节或JSON格式错误")
+                if not self._fill():
+                    raise Truncated_Json("JSON在此处被截断")
+
+    def skip_value(self):
+        """跳过一个值，不构建Python对象"""
+        c = self._peek()
+        if c == '"':
+            self.pos = self._match(_STRING).end()
+            return
+        if c not in "{[":
+            self.pos = self._match(_SCALAR).end()
+            return
+        # 值完整地在缓冲区内时直接用C实现的解码器越过它，比逐个字符串匹配快得多
+        try:
+            self.pos = self._decoder.raw_decode(self.buf, self.pos)[1]
+            return
+        except json.JSONDecodeError:
+            pass
+        if c == "{":
+            # 跨越块边界的大对象（如整个terms.Reserved）逐个跳过其中的值
+            for _ in self.iter_keys():
+                self.skip_value()
+            return
+        depth = 0
+        while True:
+            m = _STRUCT.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    raise Truncated_Json("JSON在此处被截断")
+                continue
+            if m.group() == '"':
+                self.pos = m.start()
+                self.pos = self._match(_STRING).end()
+                continue
+            self.pos = m.end()
+            depth += 1 if m.group() in "{[" else -1
+            if depth == 0:
+                return
@@ -1,15 +1,17 @@
 import time,socket
 from abc import ABC, abstractmethod
-from google.cloud import compute_v1
 from collections import defaultdict
-from kubernetes import client, config
-
-from googleapiclient.errors import HttpError
-from kubernetes.client import ApiException
 
 from cluster.resources import Node
-import logging, re, paramiko
-
+from cloud_platform.Bootstrap import build_worker_script, run_script_over_ssh, JOIN_COMMAND
+from cloud_platform.Providers import lazy_import
+from telemetry.Metrics import PHASE_DURATION, API_ERRORS
+import logging, re, threading
+
+# SDK在第一次调用GCE或SSH时才导入
+compute_v1 = lazy_import("google.cloud.compute_v1")
+api_exceptions = lazy_import("google.api_core.exceptions")
+paramiko = lazy_import("paramiko")
 logger = logging.getLogger(__name__)
 
 class NodeManger(ABC):
@@ -30,14 +32,45 @@ class GCP_Manager(NodeManger):
                  project_id="single-cloud-ylxq",
                  region="australia-southeast1",
                  zone="b",
-                 credential=None):
+                 credential=None,
+                 bootstrap_mode="script",
+                 instance_client=None,
+                 operation_client=None,
+                 operation_timeout=600):
+        """
+        :param bootstrap_mode: worker初始化方式
+            - "script": 通过SFTP上传一次性脚本，在单个SSH会话中执行
+            - "startup-script": 脚本写入实例元数据，由GCE在开机时执行，无需SSH
+            - "commands": 逐条通过SSH执行命令（旧方式）
+        :param instance_client: compute_v1.InstancesClient兼容的客户端，缺省时新建
+        :param operation_client: compute_v1.ZoneOperationsClient兼容的客户端，缺省时新建
+        :param operation_timeout: 等待创建实例操作完成的超时（秒）
+        """
         super().__init__()
         self.project_id = project_id
         self.region = region
         self.zone = f"{self.region}-{zone}"
-        self.instance_client = compute_v1.InstancesClient()
+        self._instance_client = instance_client
+        self._operation_client = operation_client
+        self.operation_timeout = operation_timeout
 
         self.no = 0
+        # 多个线程并发创建节点时保护节点编号的分配
+        self._name_lock = threading.Lock()
+        self.bootstrap_mode = bootstrap_mode
+
+    @property
+    def instance_client(self):
+        """第一次访问GCE时才创建客户端"""
+        if self._instance_client is None:
+            self._instance_client = compute_v1.InstancesClient()
+        return self._instance_client
+
+    @property
+    def operation_client(self):
+        if self._operation_client is None:
+            self._operation_client = compute_v1.ZoneOperationsClient()
+        return self._operation_client
 
     def add_k8s_monitor(self, k8s_monitor):
         self.k8s_monitor = k8s_monitor
@@ -78,41 +111,128 @@ class GCP_Manager(NodeManger):
 
     def parse_node(self, node):
         pattern = re.compile(r'^node-(\d+)$')
-        self.no = 0
         match = pattern.match(node.name)
         if match:
             index = int(match.group(1))
-            self.no = index if index > self.no else self.no
+            with self._name_lock:
+                self.no = index if index > self.no else self.no
+
+    def allocate_name(self):
+        """线程安全地分配一个未被占用的节点名"""
+        with self._name_lock:
+            while True:
+                self.no += 1
+                name = f"node-{self.no}"
+                if name not in self.instances:
+                    return name
 
     def create_node(self, node):
-        name = f"node-{self.no + 1}"
-        node.name = name
-        self.no += 1
-        type = node.type
-        self.instance_client.insert(
-            project=self.project_id,
-            zone=self.zone,
-            instance_resource=self._create_instance(name, type)
-        )
-        logger.info(f"创建实例{name},型号为{type}")
-        if not self.wait_for_instance_ready(name):
-            raise RuntimeError(f"实例 {name} 启动失败")
-        node.internalIP, node.externalIP = self.get_instance_ip(name)
-        time.sleep(5)
+        self.launch_instances([node])
+        self.join_cluster(node)
+
+    def launch_instances(self, nodes):
+        """
+        创建一批同型号的实例，等待其进入RUNNING状态，并填充节点名和IP
+        - 单个实例使用insert，多个实例使用一次bulkInsert请求
+        - 通过zoneOperations.wait在服务端等待操作完成，不轮询实例状态
+        - 所有实例的状态和IP通过一次list调用取回
+        """
+        types = {x.type for x in nodes}
+        if len(types) != 1:
+            raise ValueError(f"一次只能批量创建同一型号的实例: {types}")
+        type = types.pop()
+        names = [self.allocate_name() for _ in nodes]
+        for node, name in zip(nodes, names):
+            node.name = name
+        try:
+            with PHASE_DURATION.time(phase="instance_insert"):
+                if len(names) == 1:
+                    operation = self.instance_client.insert(
+                        project=self.project_id,
+                        zone=self.zone,
+                        instance_resource=self._create_instance(names[0], type)
+                    )
+                else:
+                    operation = self.instance_client.bulk_insert(
+                        project=self.project_id,
+                        zone=self.zone,
+                        bulk_insert_instance_resource_resource=self._create_bulk_instances(names, type)
+                    )
+                logger.info(f"创建实例{names},型号为{type}")
+            with PHASE_DURATION.time(phase="wait_running"):
+                self._wait_operation(operation)
+                described = self._describe_instances(names)
+        except Exception:
+            API_ERRORS.inc(api="gce")
+            raise
+
+        # 操作完成时实例通常已是RUNNING，个别仍在STAGING的实例退化为轮询
+        not_running = [x for x in names if described.get(x, (None,))[0] != "RUNNING"]
+        for name in not_running:
+            if not self.wait_for_instance_ready(name):
+                raise RuntimeError(f"实例 {name} 启动失败")
+        if not_running:
+            described.update(self._describe_instances(not_running))
+        for node in nodes:
+            _, node.internalIP, node.externalIP = described[node.name]
+        return nodes
+
+    def delete_node(self, name):
+        """删除实例并等待删除操作完成"""
+        try:
+            operation = self.instance_client.delete(
+                project=self.project_id,
+                zone=self.zone,
+                instance=name
+            )
+            self._wait_operation(operation)
+        except Exception:
+            API_ERRORS.inc(api="gce")
+            raise
+        self.instances.pop(name, None)
+        logger.info(f"实例{name}已删除")
+
+    def join_cluster(self, node):
+        """把已经RUNNING的实例初始化为worker并等待其在Kubernetes中Ready"""
+        if self.bootstrap_mode == "startup-script":
+            with PHASE_DURATION.time(phase="node_ready"):
+                self._wait_node_ready_api(node.name)
+            logger.info(f"{node.name}加入集群成功")
+            return
+        # _ssh_connect自带重试，无需等待sshd启动
         self._ssh_connect(node)
 
-    def get_instance_ip(self, name):
-        logging.info(f"获取实例{name}的公网ip")
-        instance = self.instance_client.get(
+    def _wait_operation(self, operation):
+        """通过zoneOperations.wait在服务端等待操作完成，每次wait最多阻塞约2分钟"""
+        deadline = time.monotonic() + self.operation_timeout
+        result = operation
+        while result.status != compute_v1.Operation.Status.DONE:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"操作{operation.name}未在{self.operation_timeout}秒内完成")
+            result = self.operation_client.wait(
+                project=self.project_id,
+                zone=self.zone,
+                operation=operation.name
+            )
+        if result.error.errors:
+            raise RuntimeError(f"操作{operation.name}失败: {[x.message for x in result.error.errors]}")
+        return result
+
+    def _describe_instances(self, names):
+        """一次list调用取回多个实例的状态和IP：{name: (status, internal_ip, external_ip)}"""
+        request = compute_v1.ListInstancesRequest(
             project=self.project_id,
             zone=self.zone,
-            instance=name
+            filter=" OR ".join(f'(name = "{x}")' for x in names)
         )
-
-        if instance.status =="RUNNING":
+        described = {}
+        for instance in self.instance_client.list(request):
             network_interface = instance.network_interfaces[0]
-            return (network_interface.network_i_p,network_interface.access_configs[0].nat_i_p)
-        return None
+            access_configs = network_interface.access_configs
+            described[instance.name] = (instance.status,
+                                        network_interface.network_i_p,
+                                        access_configs[0].nat_i_p if access_configs else None)
+        return described
 
     def wait_for_instance_ready(self, instance_name, timeout=600, interval=10):
         """等待实例进入RUNNING状态"""
@@ -137,13 +257,13 @@ class GCP_Manager(NodeManger):
                 logger.debug(f"当前实例状态: {instance.status}，等待 {interval} 秒后重试...")
                 time.sleep(interval)
 
-            except HttpError as e:
-                if e.resp.status == 404:
-                    logger.debug(f"实例 {instance_name} 尚未创建完成，等待重试...")
-                    time.sleep(interval)
-                else:
-                    logger.error(f"查询实例状态失败: {str(e)}")
-                    raise
+            except api_exceptions.NotFound:
+                # compute_v1客户端以google.api_core的异常报告HTTP错误
+                logger.debug(f"实例 {instance_name} 尚未创建完成，等待重试...")
+                time.sleep(interval)
+            except api_exceptions.GoogleAPICallError as e:
+                logger.error(f"查询实例状态失败: {str(e)}")
+                raise
 
         logger.error(f"等待实例 {instance_name} 启动超时（{timeout}秒）")
         return False
@@ -174,12 +294,21 @@ class GCP_Manager(NodeManger):
         )
 
     def _create_meta_data(self):
-        return compute_v1.Metadata(
-            items = [compute_v1.Items(
-                key = "ssh-keys",
-                value = f"root:ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIKlKzCy4htWLghJGtK6W+ojkXEaQCZvxX4Me/sbPlpJG 13160@michael_win"
-            )]
-        )
+        items = [compute_v1.Items(
+            key = "ssh-keys",
+            value = f"root:ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIKlKzCy4htWLghJGtK6W+ojkXEaQCZvxX4Me/sbPlpJG 13160@michael_win"
+        )]
+        if self.bootstrap_mode == "startup-script":
+            items.append(compute_v1.Items(key="startup-script", value=build_worker_script()))
+        return compute_v1.Metadata(items=items)
+
+    def _create_service_accounts(self):
+        return [
+            compute_v1.ServiceAccount(
+                email="883507821345-compute@developer.gserviceaccount.com",
+                scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+        ]
 
     def _create_instance(self, name, type):
         return  compute_v1.Instance(
@@ -188,12 +317,24 @@ class GCP_Manager(NodeManger):
             disks = [self._create_boot_disk()],
             network_interfaces = [self._create_network_interface()],
             metadata = self._create_meta_data(),
-            service_accounts=[
-                compute_v1.ServiceAccount(
-                    email="883507821345-compute@developer.gserviceaccount.com",
-                    scopes=["https://www.googleapis.com/auth/cloud-platform"]
-                )
-            ]
+            service_accounts=self._create_service_accounts()
+        )
+
+    def _create_bulk_instances(self, names, type):
+        """bulkInsert的请求体，所有实例共用一份配置，节点名由per_instance_properties指定"""
+        return compute_v1.BulkInsertInstanceResource(
+            count=len(names),
+            min_count=len(names),
+            per_instance_properties={
+                x: compute_v1.BulkInsertInstanceResourcePerInstanceProperties(name=x) for x in names
+            },
+            instance_properties=compute_v1.InstanceProperties(
+                machine_type=type,
+                disks=[self._create_boot_disk()],
+                network_interfaces=[self._create_network_interface()],
+                metadata=self._create_meta_data(),
+                service_accounts=self._create_service_accounts()
+            )
         )
 
     def _ssh_connect(self, node):
@@ -263,6 +404,16 @@ class GCP_Manager(NodeManger):
         return False
 
     def _initialize_k8s_worker(self, client, node):
+        with PHASE_DURATION.time(phase="ssh_bootstrap"):
+            if self.bootstrap_mode == "commands":
+                self._initialize_k8s_worker_by_commands(client, node)
+            else:
+                run_script_over_ssh(client, build_worker_script(), node.name)
+        with PHASE_DURATION.time(phase="node_ready"):
+            self._wait_node_ready_api(node.name)
+        logger.info(f"{node.name}加入集群成功")
+
+    def _initialize_k8s_worker_by_commands(self, client, node):
         commands = [
             'export DEBIAN_FRONTEND=noninteractive',
             f'hostnamectl set-hostname {node.name}',
@@ -297,41 +448,17 @@ EOF""".replace('"', '\\"'),
             "sudo apt-get update",
             "sudo apt-get install -y kubelet kubeadm kubectl",
             "sudo apt-mark hold kubelet kubeadm kubectl",
-            "kubeadm join 10.152.0.4:6443 --token nfzjac.ip3yptkayzmspjs3 --discovery-token-ca-cert-hash sha256:5204c31dc557d21a76881656acda54c5b9f199e1696ab8776c187d8dbd56029f"
+            JOIN_COMMAND
         ]
         for cmd in commands:
             self._execute_ssh_command(client, cmd)
-        self._wait_node_ready_api(node.name)
-        logger.info(f"{node.name}加入集群成功")
 
-    def _wait_node_ready_api(self, node_name, timeout=600, interval=10):
-        """通过K8s API监控节点状态"""
-        start = time.time()
-        last_observed_state = None
+    def _wait_node_ready_api(self, node_name, timeout=600):
+        """通过按节点名过滤的K8s watch等待节点就绪，等待期间不刷新GCE实例和整个集群"""
         logger.info(f"开始校验节点{node_name}是否加入集群")
-        while time.time() - start < timeout:
-            try:
-                self.refresh()
-                self.k8s_monitor.refresh()
-                if (self.k8s_monitor.node_cache.get(node_name)) is None:
-                    time.sleep(interval)
-                    continue
-                if (self.k8s_monitor.node_cache.get(node_name).status =="Ready"):
-                    logger.info(f"节点 {node_name}就绪")
-                    return
-
-            except ApiException as e:
-                if e.status == 404:
-                    logger.debug(f"节点尚未注册: {node_name}")
-                    time.sleep(interval)
-                else:
-                    logger.error(f"API请求失败: {e}")
-                    raise
-            except Exception as e:
-                logger.error(f"未知错误: {str(e)}")
-                raise
-
-        raise RuntimeError(f"节点 {node_name} 未在{timeout}秒内就绪 | 最后状态: {last_observed_state}")
+        if not self.k8s_monitor.wait_node_ready(node_name, timeout=timeout):
+            raise RuntimeError(f"节点 {node_name} 未在{timeout}秒内就绪")
+        logger.info(f"节点 {node_name}就绪")
 
     def _execute_ssh_command(self, ssh_client, command, error_msg="命令执行失败"):
         """执行SSH命令并处理输出"""
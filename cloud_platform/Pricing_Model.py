@@ -1,14 +1,91 @@
 from abc import ABC, abstractmethod
 from collections import defaultdict
-import logging, json
+from cloud_platform.Flavor_Index import Flavor_Index
+from cloud_platform.Pricing_Store import Pricing_Store, Price_Table
+import logging, json, os, time
 
 logger = logging.getLogger(__name__)
 
 class Pricing_Model(ABC):
+    # 云平台名，写入机型索引，调度方案中的新节点据此选择对应的节点管理器
+    provider = None
+
     def __init__(self):
         self.machine_cache = defaultdict(list)
         self.pricing_cache = defaultdict(dict)
         self.machine2price_cache = defaultdict(dict)
+        self.flavor_index = Flavor_Index()
+        self.version = 0
+        # 每个机型定价的有效期（秒），超期后刷新失败时会告警但仍使用上一次成功的定价
+        self.ttl = 3600
+
+    def _read_snapshot(self, fp, platform):
+        """
+        读取pricing.json中指定平台的定价，返回{type: {CPU, RAM, price, ...}}
+        fp以.bin结尾时按Pricing_Store写出的二进制定价表内存映射读取
+        """
+        if fp.endswith(".bin"):
+            return defaultdict(dict, Price_Table(fp).machine2price(platform))
+        entries = Pricing_Store.at(fp).read().get(platform, [])
+        if isinstance(entries, dict):
+            entries = [entries]
+        machine2price = defaultdict(dict)
+        for entry in entries:
+            for type, spec in entry.items():
+                machine2price[type] = dict(spec)
+        return machine2price
+
+    def load_snapshot(self, fp, platform):
+        """
+        从磁盘上的定价快照热启动，无需等待云平台API
+        :return: 是否成功加载
+        """
+        if not os.path.isfile(fp):
+            return False
+        try:
+            machine2price = self._read_snapshot(fp, platform)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"读取定价快照{fp}失败: {e}")
+            return False
+        if not machine2price:
+            return False
+        version = max(x.get("version", 0) for x in machine2price.values())
+        self._publish(self.machine_cache, self.pricing_cache, machine2price, version)
+        logger.info(f"从快照{fp}加载了{len(machine2price)}个{platform}机型的定价（版本{version}）")
+        return True
+
+    def _publish(self, machine_cache, pricing_cache, machine2price, version):
+        """
+        原子地切换到一份新构建好的定价视图
+        读者（如调度算法）只通过属性读取整张表，不会看到刷新到一半的状态
+        """
+        flavor_index = Flavor_Index(machine2price, provider=self.provider)
+        self.machine_cache = machine_cache
+        self.pricing_cache = pricing_cache
+        self.machine2price_cache = machine2price
+        self.flavor_index = flavor_index
+        self.version = version
+
+    def _stamp(self, machine2price):
+        """给新定价表的每个条目打上版本和过期时间，价格未变化的条目沿用原版本"""
+        version = self.version + 1
+        expires = time.time() + self.ttl
+        for type, spec in machine2price.items():
+            old = self.machine2price_cache.get(type)
+            unchanged = old is not None and all(old.get(k) == spec[k] for k in ("CPU", "RAM", "price"))
+            spec["version"] = old.get("version", version) if unchanged else version
+            spec["expires"] = expires
+        return version
+
+    def _export(self, fp):
+        """把当前定价写入fp中本平台的一节，其余平台的定价不受影响"""
+        Pricing_Store.at(fp).write(self.provider, self.machine2price_cache, self.version)
+
+    @property
+    def stale(self):
+        """当前定价中是否存在超过TTL的条目"""
+        now = time.time()
+        return any(x.get("expires", now) < now for x in self.machine2price_cache.values())
 
     def _read_flavor_pool(self, fp, platform):
         """
@@ -0,0 +1,167 @@
+import numpy as np
+import json, logging, mmap, os, struct, tempfile, threading, time
+
+try:
+    import fcntl
+except ImportError:  # Windows下只有进程内的锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 1
+# 二进制定价表的文件头：魔数、格式版本、机型数、代数、写入时间，共32字节，之后的列按8字节对齐
+_MAGIC = b"KSPRICE1"
+_HEADER = struct.Struct("<8sIIQd")
+_COLUMNS = (("cpu", "<f8"), ("ram", "<f8"), ("price", "<f8"), ("expires", "<f8"), ("version", "<u8"))
+
+
+class Price_Table:
+    """
+    内存映射的列式定价表，列为只读的numpy数组，加载时不解析JSON也不复制数据
+    names[i]为第i行的(provider, type)
+    """
+    def __init__(self, fp):
+        with open(fp, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{fp}不完整")
+        magic, schema, count, self.generation, self.updated_at = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or schema != SCHEMA:
+            raise ValueError(f"{fp}不是格式版本{SCHEMA}的二进制定价表")
+        offset = _HEADER.size
+        for name, dtype in _COLUMNS:
+            setattr(self, name, np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset))
+            offset += 8 * count
+        self._names = bytes(self._mm[offset:])
+        self._decoded = None
+
+    @property
+    def names(self):
+        if self._decoded is None:
+            lines = self._names.decode("utf-8").split("\n") if self._names else []
+            self._decoded = [tuple(x.split("\t", 1)) for x in lines]
+        return self._decoded
+
+    def __len__(self):
+        return self.cpu.shape[0]
+
+    def machine2price(self, provider):
+        """转换成与pricing.json相同的{type: {CPU, RAM, price, version, expires}}"""
+        return {type: {"CPU": float(self.cpu[i]), "RAM": float(self.ram[i]), "price": float(self.price[i]),
+                       "version": int(self.version[i]), "expires": float(self.expires[i])}
+                for i, (p, type) in enumerate(self.names) if p == provider}
+
+
+class Pricing_Store:
+    """
+    各云平台定价的持久化存储（data/pricing.json）
+    - 每个平台一节，写入时只替换本平台的一节，其余平台的数据原样保留
+    - 先写临时文件再rename，崩溃时文件要么是旧版本要么是新版本，不会被截断
+    - 进程内用锁、进程间用flock串行化“读-改-写”，多个平台并发刷新不会互相覆盖
+    - meta中记录格式版本、单调递增的代数以及每个平台的定价版本和更新时间
+    - 可选地在binary_fp写一份列式二进制表，供调度器和离线工具用Price_Table内存映射读取
+    同一路径请通过Pricing_Store.at()取得共享的实例
+    """
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, fp, binary_fp=None):
+        self.fp = fp
+        self.binary_fp = binary_fp
+        self._lock = threading.Lock()
+
+    @classmethod
+    def at(cls, fp, binary_fp=None):
+        """返回fp对应的共享实例，binary_fp不为None时更新其二进制表路径"""
+        key = os.path.realpath(fp)
+        with cls._stores_lock:
+            store = cls._stores.get(key)
+            if store is None:
+                store = cls._stores[key] = cls(fp, binary_fp)
+            elif binary_fp is not None:
+                store.binary_fp = binary_fp
+        return store
+
+    def read(self):
+        """读取整个文件，文件不存在时返回空的定价"""
+        if not os.path.isfile(self.fp):
+            return {"meta": {"schema": SCHEMA, "generation": 0, "providers": {}}}
+        with open(self.fp, 'r') as f:
+            data = json.load(f)
+        data.setdefault("meta", {"schema": SCHEMA, "generation": 0, "providers": {}})
+        return data
+
+    def write(self, provider, machine2price, version):
+        """原子地替换provider一节的定价"""
+        with self._lock, self._file_lock():
+            data = self.read()
+            meta = data["meta"]
+            if meta.get("schema", SCHEMA) > SCHEMA:
+                raise ValueError(f"{self.fp}的格式版本{meta['schema']}高于当前支持的{SCHEMA}")
+            now = time.time()
+            data[provider] = [{k: v} for k, v in machine2price.items()]
+            meta["schema"] = SCHEMA
+            meta["generation"] = meta.get("generation", 0) + 1
+            meta["updated_at"] = now
+            meta.setdefault("providers", {})[provider] = {"version": version, "updated_at": now}
+            self._replace(self.fp, lambda f: json.dump(data, f), "w")
+            if self.binary_fp is not None:
+                self._replace(self.binary_fp, lambda f: self._pack(data, f), "wb")
+        logger.info(f"{provider}定价（版本{version}）已写入{self.fp}，代数{meta['generation']}")
+        return meta["generation"]
+
+    def _file_lock(self):
+        return _Flock(self.fp + ".lock")
+
+    @staticmethod
+    def _replace(fp, dump, mode):
+        directory = os.path.dirname(os.path.abspath(fp))
+        fd, temp = tempfile.mkstemp(prefix=os.path.basename(fp) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, mode) as f:
+                dump(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, fp)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    @staticmethod
+    def _pack(data, f):
+        rows = []
+        for provider in sorted(k for k in data if k != "meta"):
+            entries = data[provider]
+            for entry in [entries] if isinstance(entries, dict) else entries:
+                rows += [(provider, type, spec) for type, spec in entry.items()]
+        meta = data["meta"]
+        f.write(_HEADER.pack(_MAGIC, SCHEMA, len(rows), meta["generation"], meta["updated_at"]))
+        for name, dtype in _COLUMNS:
+            key = {"cpu": "CPU", "ram": "RAM"}.get(name, name)
+            f.write(np.array([x[2].get(key, 0) for x in rows], dtype=dtype).tobytes())
+        f.write("\n".join(f"{p}\t{t}" for p, t, _ in rows).encode("utf-8"))
+
+    def load_table(self):
+        """内存映射二进制定价表，未配置或不存在时返回None"""
+        if self.binary_fp is None or not os.path.isfile(self.binary_fp):
+            return None
+        return Price_Table(self.binary_fp)
+
+
+class _Flock:
+    """锁文件上的进程间排他锁"""
+    def __init__(self, fp):
+        self.fp = fp
+        self._f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._f = open(self.fp, 'a')
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+            self._f = None
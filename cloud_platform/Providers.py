@@ -0,0 +1,65 @@
+import importlib, logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy_Module:
+    """
+    第一次访问属性时才导入的模块代理
+    云平台SDK（google.cloud、kubernetes、paramiko）导入耗时数秒，推迟到第一次真正调用时，
+    不使用某个平台时则完全不导入
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    logger.info(f"导入{self._name}耗时{time.perf_counter() - started:.2f}秒")
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"Lazy_Module({self._name}, loaded={self._module is not None})"
+
+
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+
+
+def lazy_import(name) -> Lazy_Module:
+    """同名模块共用一个代理，只导入一次"""
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            _lazy_modules[name] = Lazy_Module(name)
+        return _lazy_modules[name]
+
+
+# 各云平台的定价模型（pricing）和节点管理器（manager），以"模块:类名"登记，第一次使用时才导入
+PROVIDERS = {
+    "gcp": {"pricing": "cloud_platform.GCP_Pricing:GCP_Pricing",
+            "manager": "cloud_platform.NodeManage:GCP_Manager"},
+    "aws": {"pricing": "cloud_platform.AWS_Pricing:AWS_Pricing"},
+}
+
+
+def load_provider(provider, kind):
+    """返回云平台provider的kind（pricing或manager）实现类"""
+    target = PROVIDERS.get(provider, {}).get(kind)
+    if target is None:
+        raise ValueError(f"未登记{provider}平台的{kind}，可选: "
+                         f"{[p for p, kinds in PROVIDERS.items() if kind in kinds]}")
+    module, name = target.split(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def build_provider(provider, kind, **options):
+    return load_provider(provider, kind)(**options)
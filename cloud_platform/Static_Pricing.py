@@ -0,0 +1,38 @@
+from cloud_platform.Pricing_Model import Pricing_Model
+import logging, os
+
+logger = logging.getLogger(__name__)
+
+class Static_Pricing(Pricing_Model):
+    """
+    从data/pricing.json格式的静态定价表中读取机型和价格，不访问任何云平台API
+    用于离线仿真、基准测试和调度算法的本地调试
+    """
+    def __init__(self, fp, platform="gcp"):
+        super().__init__()
+        self.fp = fp
+        self.platform = platform
+        self.provider = platform
+        self.refresh(fp, None)
+
+    def export(self, fp):
+        """静态定价表只读，不导出"""
+        pass
+
+    def refresh(self, fp, lock):
+        self.fp = fp
+        self._publish(self.machine_cache, self.pricing_cache, self.fetch_pricing_model(), self.version + 1)
+
+    def fetch_pricing_model(self):
+        # 与load_snapshot不同，静态定价表是唯一的数据来源，文件不存在时直接报错而不是返回空表
+        if not os.path.isfile(self.fp):
+            raise FileNotFoundError(f"静态定价表{self.fp}不存在")
+        machine2price = self._read_snapshot(self.fp, self.platform)
+        logger.info(f"从{self.fp}加载了{len(machine2price)}个{self.platform}机型的静态定价")
+        return machine2price
+
+    def fetch_machine_types(self):
+        return self.machine_cache
+
+    def calculate_pricing(self):
+        return self.machine2price_cache
@@ -0,0 +1,226 @@
+from collections import deque
+from cluster.resources import Node
+from telemetry.Metrics import WARM_POOL_SIZE, WARM_POOL_COST, WARM_POOL_CLAIMS
+import json, logging, math, statistics, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+class Warm_Pool:
+    """
+    预热节点池：提前创建并加入集群、但处于封锁（cordon）状态的节点
+    - 池的目标大小由滚动预测决定：按bucket_seconds统计每个时间段需要新建的节点数，
+      取最近history个时间段的均值加一个标准差，限制在[min_size, max_size]内
+    - Scheduler在新建节点前先认领能容纳计划节点上pod的预热节点，解除封锁后直接绑定
+    - 预热节点带有WARM_LABEL标签，系统重启后可以通过recover()找回
+    """
+    WARM_LABEL = "scheduling.custom/warm-pool"
+
+    def __init__(self,
+                 gcp_manager,
+                 k8s_monitor,
+                 gcp_pricing,
+                 flavor_pool,
+                 min_size=0,
+                 max_size=4,
+                 bucket_seconds=300,
+                 history=12):
+        """
+        :param flavor_pool: pre-defined-flavors.json，预热的机型取自其中的"gcp-warm"列表
+        """
+        self.gcp_manager = gcp_manager
+        self.k8s_monitor = k8s_monitor
+        self.gcp_pricing = gcp_pricing
+        self.flavors = self._read_warm_flavors(flavor_pool)
+        # 定价中找不到的预热机型，只告警一次
+        self._unpriced = set()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.bucket_seconds = bucket_seconds
+
+        self._lock = threading.Lock()
+        # 已封锁、可认领的节点
+        self._idle = {}
+        # 池中所有节点的名字，包括正在创建的，调度器不会把pod放到这些节点上
+        self.names = set()
+        self._history = deque(maxlen=history)
+        self._bucket = None
+        self._demand = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _read_warm_flavors(fp):
+        with open(fp, 'r') as f:
+            flavors = json.load(f).get("gcp-warm", [])
+        logger.info(f"加载预热机型{flavors}")
+        return flavors
+
+    def observe_demand(self, count, now=None):
+        """记录一次调度方案需要新建的节点数"""
+        with self._lock:
+            self._roll(time.time() if now is None else now)
+            self._demand += count
+
+    def _roll(self, now):
+        bucket = int(now // self.bucket_seconds)
+        if self._bucket is None:
+            self._bucket = bucket
+        while self._bucket < bucket:
+            self._history.append(self._demand)
+            self._demand = 0
+            self._bucket += 1
+
+    @property
+    def target(self):
+        with self._lock:
+            self._roll(time.time())
+            samples = list(self._history) + [self._demand]
+        forecast = statistics.fmean(samples) + (statistics.pstdev(samples) if len(samples) > 1 else 0)
+        return min(max(math.ceil(forecast), self.min_size), self.max_size)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def idle_cost(self):
+        """池中空闲节点的每小时成本"""
+        with self._lock:
+            return sum(x.price or 0 for x in self._idle.values())
+
+    def claim(self, node):
+        """
+        为调度方案中的新节点认领一个能容纳其pod的预热节点（取最便宜的）
+        认领成功时把预热节点的名字和IP写入node，并返回True；调用方随后需要activate(node)
+        """
+        with self._lock:
+            fits = [x for x in self._idle.values()
+                    if x.cpu >= node.occupied_cpu and x.memory >= node.occupied_memory]
+            if not fits:
+                self.misses += 1
+                WARM_POOL_CLAIMS.inc(result="miss")
+                return False
+            warm = min(fits, key=lambda x: (x.price or 0, x.cpu, x.memory))
+            del self._idle[warm.name]
+            self.names.discard(warm.name)
+            self.hits += 1
+        WARM_POOL_CLAIMS.inc(result="hit")
+        node.name, node.type = warm.name, warm.type
+        node.cpu, node.memory, node.price, node.provider = warm.cpu, warm.memory, warm.price, warm.provider
+        node.internalIP, node.externalIP = warm.internalIP, warm.externalIP
+        self._update_gauges()
+        return True
+
+    def activate(self, node):
+        """解除封锁并去掉预热标签，节点随即可以绑定pod"""
+        self.k8s_monitor.core_v1.patch_node(node.name, {"metadata": {"labels": {self.WARM_LABEL: None}},
+                                                        "spec": {"unschedulable": False}})
+        logger.info(f"预热节点{node.name}({node.type})已投入使用")
+
+    def recover(self):
+        """找回上次运行时留下的预热节点"""
+        nodes = self.k8s_monitor.core_v1.list_node(label_selector=f"{self.WARM_LABEL}=true")
+        for item in nodes.items:
+            instance = self.gcp_manager.instances.get(item.metadata.name)
+            if instance is None:
+                continue
+            warm = self._make_node(instance.type)
+            if warm is None:
+                logger.warning(f"预热节点{instance.name}的机型不在定价中，未纳入预热池，仍处于封锁状态")
+                continue
+            warm.name, warm.internalIP, warm.externalIP = instance.name, instance.internalIP, instance.externalIP
+            with self._lock:
+                self._idle[warm.name] = warm
+                self.names.add(warm.name)
+        if self._idle:
+            logger.info(f"找回{len(self._idle)}个预热节点: {list(self._idle)}")
+        self._update_gauges()
+
+    def reconcile(self):
+        """把池的大小调整到预测的目标值：不足时创建并封锁节点，多余时删除空闲节点"""
+        target = self.target
+        with self._lock:
+            deficit = target - len(self.names)
+            surplus = sorted(self._idle.values(), key=lambda x: -(x.price or 0))[:max(-deficit, 0)]
+        flavors = self._priced_flavors()
+        if deficit > 0 and flavors:
+            self._grow(deficit, flavors)
+        for warm in surplus:
+            self._remove(warm)
+        self._update_gauges()
+        logger.info(f"预热池目标{target}个节点，当前{len(self.names)}个，空闲成本{self.idle_cost:.4f}/h，"
+                    f"命中率{self.hit_rate:.2%}（{self.hits}/{self.hits + self.misses}）")
+
+    def _priced_flavors(self):
+        """
+        当前定价中有规格的预热机型
+        预热机型在构造时读取，定价在启动后才加载，因此每次使用前按当前定价校验
+        """
+        return [x for x in self.flavors if self._spec(x) is not None]
+
+    def _grow(self, count, flavors):
+        groups = {}
+        for i in range(count):
+            type = flavors[i % len(flavors)]
+            groups.setdefault(type, []).append(self._make_node(type))
+        for type, nodes in groups.items():
+            try:
+                self.gcp_manager.launch_instances(nodes)
+            except Exception as e:
+                logger.error(f"创建{type}预热节点失败: {str(e)}")
+                continue
+            with self._lock:
+                self.names.update(x.name for x in nodes)
+            for node in nodes:
+                try:
+                    self.gcp_manager.join_cluster(node)
+                    self.k8s_monitor.core_v1.patch_node(node.name, {"metadata": {"labels": {self.WARM_LABEL: "true"}},
+                                                                    "spec": {"unschedulable": True}})
+                except Exception as e:
+                    logger.error(f"预热节点{node.name}加入集群失败: {str(e)}")
+                    with self._lock:
+                        self.names.discard(node.name)
+                    continue
+                with self._lock:
+                    self._idle[node.name] = node
+                logger.info(f"预热节点{node.name}({type})已就绪")
+
+    def _remove(self, warm):
+        with self._lock:
+            if self._idle.pop(warm.name, None) is None:
+                return  # 已被认领
+            self.names.discard(warm.name)
+        try:
+            self.k8s_monitor.core_v1.delete_node(warm.name)
+            self.gcp_manager.delete_node(warm.name)
+            logger.info(f"预热池缩小，删除节点{warm.name}({warm.type})")
+        except Exception as e:
+            logger.error(f"删除预热节点{warm.name}失败: {str(e)}")
+
+    def _spec(self, type):
+        """机型在当前定价中的规格，缺少CPU或RAM时返回None"""
+        entry = self.gcp_pricing.machine2price_cache.get(type)
+        if entry is None or entry.get("CPU") is None or entry.get("RAM") is None:
+            if type not in self._unpriced:
+                self._unpriced.add(type)
+                logger.warning(f"定价中没有预热机型{type}的规格，跳过该机型")
+            return None
+        self._unpriced.discard(type)
+        return entry
+
+    def _make_node(self, type):
+        """按当前定价构造预热节点，定价中没有该机型时返回None"""
+        entry = self._spec(type)
+        if entry is None:
+            return None
+        return Node("created", {"type": type, "CPU": entry["CPU"], "RAM": entry["RAM"],
+                                "price": entry.get("price"), "provider": self.gcp_pricing.provider})
+
+    def _update_gauges(self):
+        with self._lock:
+            size = len(self.names)
+            cost = sum(x.price or 0 for x in self._idle.values())
+        WARM_POOL_SIZE.set(size)
+        WARM_POOL_COST.set(cost)
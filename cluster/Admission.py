@@ -0,0 +1,110 @@
+from collections import deque
+from telemetry.Metrics import ADMISSION_WINDOW, BATCH_SIZE
+import asyncio, logging, time
+
+logger = logging.getLogger(__name__)
+
+
+class Admission:
+    """
+    待调度pod的自适应微批窗口，把陆续到达的pod攒成一批再交给调度算法
+    - 窗口长度取最近建节点耗时的latency_fraction倍，限制在[min_wait, max_wait]内：
+      建节点越慢，多等一会儿换来的装箱收益越大，而多等的时间占比越小
+    - 按最近horizon秒内的到达率估计下一个pod何时到达，超过该间隔仍无新pod时提前关闭窗口
+    - 攒够max_batch个pod，或这批pod用已有节点的空闲资源就能容纳（不需要建节点）时立即关闭
+    """
+    def __init__(self,
+                 min_wait=0.5,
+                 max_wait=15,
+                 latency_fraction=0.1,
+                 max_batch=500,
+                 horizon=60,
+                 alpha=0.3,
+                 default_latency=90):
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.latency_fraction = latency_fraction
+        self.max_batch = max_batch
+        self.horizon = horizon
+        self.alpha = alpha
+        # 建节点耗时（秒）的指数加权平均
+        self.provision_latency = default_latency
+        self._arrivals = deque()
+        self._seen = set()
+
+    def observe_provision(self, seconds):
+        """记录一次建节点（从发起创建到节点Ready）的耗时"""
+        self.provision_latency = self.alpha * seconds + (1 - self.alpha) * self.provision_latency
+
+    def observe_pending(self, pods, now=None):
+        """记录当前的待调度pod，新出现的pod计为一次到达"""
+        now = time.monotonic() if now is None else now
+        keys = {(x.namespace, x.name) for x in pods}
+        for _ in keys - self._seen:
+            self._arrivals.append(now)
+        self._seen = keys
+        while self._arrivals and self._arrivals[0] < now - self.horizon:
+            self._arrivals.popleft()
+        return self._arrivals[-1] if self._arrivals else None
+
+    @property
+    def arrival_rate(self):
+        """最近horizon秒内每秒到达的pod数"""
+        return len(self._arrivals) / self.horizon
+
+    @property
+    def window(self):
+        return min(max(self.latency_fraction * self.provision_latency, self.min_wait), self.max_wait)
+
+    def remaining(self, opened_at, last_arrival, size, fits_existing, now):
+        """
+        :return: 窗口还需等待的秒数，<=0表示立即关闭
+        """
+        if size == 0:
+            return self.window
+        if size >= self.max_batch or fits_existing:
+            return 0
+        until_deadline = opened_at + self.window - now
+        rate = self.arrival_rate
+        if rate <= 0 or last_arrival is None:
+            return until_deadline
+        # 预计的下一次到达已经过去而仍无新pod，说明这一波到达已结束
+        until_quiet = max(last_arrival + 2 / rate, opened_at + self.min_wait) - now
+        return min(until_deadline, until_quiet)
+
+    async def collect(self, wake: asyncio.Event, pending_pods, fits_existing):
+        """
+        等待一批pod收集完成
+        :param wake: 出现新的待调度pod时置位的事件
+        :param pending_pods: 返回当前待调度pod的函数
+        :param fits_existing: 判断一批pod能否直接放入已有节点的函数
+        :return: 关闭窗口时的待调度pod
+        """
+        opened_at = time.monotonic()
+        while True:
+            pods = pending_pods()
+            now = time.monotonic()
+            last_arrival = self.observe_pending(pods, now)
+            timeout = self.remaining(opened_at, last_arrival, len(pods), bool(pods) and fits_existing(pods), now)
+            if timeout <= 0:
+                break
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+        ADMISSION_WINDOW.set(self.window)
+        BATCH_SIZE.observe(len(pods))
+        logger.info(f"本批收集了{len(pods)}个待调度pod，等待{time.monotonic() - opened_at:.2f}秒，"
+                    f"到达率{self.arrival_rate:.2f}/s，建节点耗时{self.provision_latency:.1f}s")
+        return pods
+
+    @staticmethod
+    def fits_free(pods, nodes):
+        """粗略判断：每个pod都有节点放得下，且总请求不超过空闲资源总和"""
+        free = [(x.available_cpu, x.availbale_memory) for x in nodes]
+        if sum(x.cpu for x in pods) > sum(c for c, _ in free) or \
+                sum(x.memory for x in pods) > sum(r for _, r in free):
+            return False
+        shapes = {(x.cpu, x.memory) for x in pods}
+        return all(any(c >= cpu and r >= ram for c, r in free) for cpu, ram in shapes)
@@ -0,0 +1,112 @@
+from cloud_platform.Providers import lazy_import
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+from telemetry.Metrics import PHASE_DURATION, POD_PENDING_TO_BOUND, PODS_SCHEDULED, PODS_BIND_FAILED, API_ERRORS
+import asyncio, logging, time
+
+client = lazy_import("kubernetes.client")
+logger = logging.getLogger(__name__)
+
+Bind_Result = namedtuple("Bind_Result", ["pod", "node_name", "success", "attempts", "error"])
+
+
+def v1_binding(pod, node_name):
+    """把pod绑定到node_name的V1Binding请求体"""
+    return client.V1Binding(
+        target=client.V1ObjectReference(
+            kind="Node",
+            api_version="v1",
+            name=node_name
+        ),
+        metadata=client.V1ObjectMeta(name=pod.name, namespace=pod.namespace)
+    )
+
+
+class Pod_Binder:
+    """
+    并发地把pod绑定到节点
+    - 同时进行的绑定请求数量受max_workers限制
+    - 限流、服务端错误和连接错误按指数退避重试
+    - 每个pod返回一个Bind_Result，失败的pod由调用方放回下一轮调度
+    """
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, core_v1, max_workers=16, max_retries=3, backoff=0.5, binding_factory=None):
+        """
+        :param binding_factory: (pod, node_name) -> 绑定请求体，缺省为v1_binding；
+                                离线仿真传入不依赖kubernetes SDK的实现
+        """
+        self.core_v1 = core_v1
+        self.binding_factory = binding_factory or v1_binding
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def bind_all(self, assignments):
+        """
+        :param assignments: [(pod, node_name)]
+        :return: 与assignments顺序一致的[Bind_Result]
+        """
+        if not assignments:
+            return []
+        workers = min(self.max_workers, len(assignments))
+        with PHASE_DURATION.time(phase="pod_bind"), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bind") as executor:
+            results = list(executor.map(lambda x: self.bind(*x), assignments))
+        return self._record(results)
+
+    async def bind_all_async(self, assignments, executor=None):
+        """
+        bind_all的asyncio版本，每个绑定请求在executor中执行
+        任务被取消时不再等待尚未返回的请求
+        """
+        if not assignments:
+            return []
+        loop = asyncio.get_running_loop()
+        with PHASE_DURATION.time(phase="pod_bind"):
+            results = await asyncio.gather(*[loop.run_in_executor(executor, self.bind, pod, node_name)
+                                             for pod, node_name in assignments])
+        return self._record(list(results))
+
+    def _record(self, results):
+        failed = [x for x in results if not x.success]
+        PODS_SCHEDULED.inc(len(results) - len(failed))
+        PODS_BIND_FAILED.inc(len(failed))
+        logger.info(f"绑定{len(results)}个Pod，成功{len(results) - len(failed)}个，失败{len(failed)}个")
+        return results
+
+    def bind(self, pod, node_name):
+        body = self.binding_factory(pod, node_name)
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            resp = None
+            try:
+                # 不反序列化返回值：Binding的响应体没有target字段，反序列化会误报ValueError
+                resp = self.core_v1.create_namespaced_pod_binding(
+                    name=pod.name,
+                    namespace=pod.namespace,
+                    body=body,
+                    _preload_content=False
+                )
+                logger.info(f"绑定Pod {pod.name}到节点{node_name}成功")
+                if pod.created_at is not None:
+                    POD_PENDING_TO_BOUND.observe(max(time.time() - pod.created_at, 0))
+                return Bind_Result(pod, node_name, True, attempt, None)
+            except client.ApiException as e:
+                error = e
+                if e.status not in self.RETRYABLE_STATUS:
+                    break
+            except Exception as e:
+                # 连接被重置、超时等网络错误
+                error = e
+            finally:
+                # _preload_content=False时响应体未被读取，需要手动把连接还给连接池
+                if resp is not None:
+                    resp.release_conn()
+            if attempt <= self.max_retries:
+                delay = self.backoff * 2 ** (attempt - 1)
+                logger.warning(f"绑定Pod {pod.name}到节点{node_name}失败（第{attempt}次），{delay}秒后重试: {error}")
+                time.sleep(delay)
+        API_ERRORS.inc(api="k8s_bind")
+        logger.error(f"绑定Pod {pod.name}到节点{node_name}失败: {error}")
+        return Bind_Result(pod, node_name, False, attempt, error)
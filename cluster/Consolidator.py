@@ -0,0 +1,193 @@
+from cloud_platform.Flavor_Index import Flavor_Index
+from cloud_platform.Providers import lazy_import
+from optimizer.Scoring_Engine import Scoring_Engine
+from telemetry.Metrics import PHASE_DURATION, NODES_REMOVED
+import logging, time
+
+client = lazy_import("kubernetes.client")
+logger = logging.getLogger(__name__)
+
+
+class Consolidator:
+    """
+    后台缩容：如果某个节点上运行的pod能全部重新装入其余节点，则封锁、排空并删除该节点
+    - 装箱判断使用与CABFD相同的Scoring_Engine，只是不提供可新建的机型
+    - 每轮的评估受time_budget限制，超时后只处理已经确定的节点
+    - 节点加入集群至少min_lifetime秒才会被考虑；两次删除之间至少间隔cooldown秒，每轮最多删除max_removals个节点
+    - 含裸pod（没有控制器）的节点不会被排空，驱逐被PodDisruptionBudget拒绝时解除封锁并放弃
+    - informer只缓存一个命名空间，决定删除前和驱逐前都从API Server列出节点上所有命名空间的pod，
+      并等待被驱逐的pod真正删除（优雅终止结束）后才删除节点
+    """
+    # DaemonSet的pod随节点删除，不需要重新装箱
+    IGNORED_CONTROLLERS = {"DaemonSet"}
+    # kubelet根据静态清单创建的镜像pod，不能驱逐，随节点删除
+    MIRROR_ANNOTATION = "kubernetes.io/config.mirror"
+
+    def __init__(self,
+                 k8s_monitor,
+                 gcp_manager,
+                 scheduler,
+                 gcp_pricing,
+                 weights=(1, 1, 0.5),
+                 time_budget=1.0,
+                 min_lifetime=1800,
+                 cooldown=600,
+                 max_removals=1,
+                 drain_timeout=300,
+                 poll_interval=2):
+        self.k8s_monitor = k8s_monitor
+        self.gcp_manager = gcp_manager
+        self.scheduler = scheduler
+        self.gcp_pricing = gcp_pricing
+        self.weights = weights
+        self.time_budget = time_budget
+        self.min_lifetime = min_lifetime
+        self.cooldown = cooldown
+        self.max_removals = max_removals
+        self.drain_timeout = drain_timeout
+        self.poll_interval = poll_interval
+        self._no_flavors = Flavor_Index()
+        self._last_removal = None
+
+    def run_once(self):
+        """
+        执行一轮缩容
+        :return: 被删除的节点名
+        """
+        if self._last_removal is not None and time.monotonic() - self._last_removal < self.cooldown:
+            return []
+        with PHASE_DURATION.time(phase="consolidate"):
+            names = self.plan()
+        removed = []
+        for name in names:
+            type = self._type(name)
+            if not self._drain(name):
+                break
+            self.k8s_monitor.core_v1.delete_node(name)
+            self.gcp_manager.delete_node(name)
+            self._last_removal = time.monotonic()
+            NODES_REMOVED.inc(type=type)
+            removed.append(name)
+            logger.info(f"缩容删除节点{name}({type})，每小时节省{self._price(name):.4f}")
+        return removed
+
+    def plan(self):
+        """返回可以删除的节点名，不修改集群"""
+        deadline = time.perf_counter() + self.time_budget
+        snapshot = self.k8s_monitor.snapshot
+        # 与调度器看到的节点一致：已排除被封锁的节点，并计入尚未绑定完成的pod
+        nodes = self.scheduler._get_available_node(snapshot)
+        now = time.time()
+        candidates = [x for x in nodes if self._removable(x, now)]
+        # 利用率越低、价格越高的节点越先考虑
+        candidates.sort(key=lambda x: (x.occupied_cpu / x.cpu + x.occupied_memory / x.memory, -self._price(x.name)))
+
+        chosen, targets = [], set()
+        for candidate in candidates:
+            if len(chosen) >= self.max_removals or time.perf_counter() > deadline:
+                break
+            if candidate.name in targets:
+                continue
+            remaining = [x for x in nodes if x is not candidate and x.name not in chosen]
+            try:
+                pods = self._movable(candidate.name)
+            except Exception as e:
+                logger.error(f"列出节点{candidate.name}上的pod失败: {str(e)}")
+                continue
+            if pods is None:
+                continue
+            placement = self._repack(pods, remaining, deadline)
+            if placement is None:
+                continue
+            # 后续候选节点在装入这些pod之后的副本上判断
+            for pod, node in placement:
+                node.add_pod(pod)
+                targets.add(node.name)
+            chosen.append(candidate.name)
+        if chosen:
+            logger.info(f"缩容评估了{len(candidates)}个候选节点，可以删除{chosen}")
+        return chosen
+
+    def _removable(self, node, now):
+        """按快照做的初筛，快照中只有informer所在命名空间的pod，最终由_movable确认"""
+        if node.name not in self.gcp_manager.instances:
+            return False  # 只删除由本系统管理的GCE实例
+        if node.created_at is None or now - node.created_at < self.min_lifetime:
+            return False
+        return all(x.status == "Running" and x.controller is not None for x in node.pods)
+
+    def _node_pods(self, name):
+        """从API Server列出节点上所有命名空间中的pod，不含DaemonSet pod、镜像pod和已结束的pod"""
+        pods = self.k8s_monitor.core_v1.list_pod_for_all_namespaces(field_selector=f"spec.nodeName={name}")
+        return [x for x in pods.items if not self._ignored(x)]
+
+    def _ignored(self, pod):
+        if pod.status.phase in ("Succeeded", "Failed"):
+            return True
+        if self.MIRROR_ANNOTATION in (pod.metadata.annotations or {}):
+            return True
+        return any(x.controller and x.kind in self.IGNORED_CONTROLLERS for x in pod.metadata.owner_references or [])
+
+    def _movable(self, name):
+        """
+        节点上需要迁移的pod
+        有裸pod、尚未运行或正在终止的pod时返回None，该节点不能删除
+        """
+        pods = []
+        for item in self._node_pods(name):
+            pod = self.k8s_monitor.parse_pod(item)
+            if pod is None or pod.status != "Running" or pod.controller is None:
+                return None
+            pods.append(pod)
+        return pods
+
+    def _repack(self, pods, nodes, deadline):
+        """用CABFD的打分把pods装入nodes，装不下或超出时间预算时返回None"""
+        engine = Scoring_Engine(nodes, self._no_flavors, self.weights)
+        placement = []
+        for pod in sorted(pods, key=lambda x: (-x.memory, -x.cpu)):
+            if time.perf_counter() > deadline:
+                return None
+            try:
+                _, idx = engine.best(pod.cpu, pod.memory)
+            except ValueError:
+                return None
+            engine.occupy(idx, pod.cpu, pod.memory)
+            placement.append((pod, engine.nodes[idx]))
+        return placement
+
+    def _drain(self, name):
+        """封锁节点并驱逐其上的pod，等待pod全部删除；失败时解除封锁"""
+        core_v1 = self.k8s_monitor.core_v1
+        core_v1.patch_node(name, {"spec": {"unschedulable": True}})
+        logger.info(f"已封锁节点{name}，开始驱逐pod")
+        try:
+            # 评估之后、封锁之前可能有新的pod调度到节点上，驱逐前重新确认
+            pods = self._movable(name)
+            if pods is None:
+                raise RuntimeError(f"节点{name}上有不能驱逐的pod")
+            for pod in pods:
+                body = client.V1Eviction(metadata=client.V1ObjectMeta(name=pod.name, namespace=pod.namespace))
+                core_v1.create_namespaced_pod_eviction(name=pod.name, namespace=pod.namespace, body=body)
+            deadline = time.monotonic() + self.drain_timeout
+            while True:
+                # 正在优雅终止的pod仍会被列出，直到kubelet确认其容器已停止
+                if not self._node_pods(name):
+                    return True
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"节点{name}未在{self.drain_timeout}秒内排空")
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            if isinstance(e, client.ApiException) and e.status == 429:
+                logger.warning(f"驱逐节点{name}上的pod被PodDisruptionBudget拒绝，放弃缩容")
+            else:
+                logger.error(f"排空节点{name}失败: {str(e)}")
+            core_v1.patch_node(name, {"spec": {"unschedulable": False}})
+            return False
+
+    def _type(self, name):
+        instance = self.gcp_manager.instances.get(name)
+        return instance.type if instance is not None else None
+
+    def _price(self, name):
+        return self.gcp_pricing.machine2price_cache.get(self._type(name), {}).get("price") or 0
@@ -1,44 +1,326 @@
 import logging
-from kubernetes import config, client
-from collections import defaultdict
+from typing import TYPE_CHECKING
 from cluster.resources import Node, Pod
-from cloud_platform.NodeManage import GCP_Manager
-import os
+from cluster.Snapshot import Cluster_Snapshot
+from cluster.quantity import cpu_cores, memory_gib, pod_requests
+from cloud_platform.Providers import lazy_import
+from telemetry.Metrics import API_ERRORS
+import os, threading, time
+
+if TYPE_CHECKING:
+    from cloud_platform.NodeManage import GCP_Manager
+
+# kubernetes客户端在informer启动（第一次访问core_v1）时才导入
+config = lazy_import("kubernetes.config")
+client = lazy_import("kubernetes.client")
+watch = lazy_import("kubernetes.watch")
 logger = logging.getLogger(__name__)
 
 class K8s_Monitor:
-    def __init__(self, gcp_manager:GCP_Manager, credential=None):
-        if credential is None:
-            config.load_incluster_config()
-        else:
-            config.load_kube_config(credential)
+    """
+    Kubernetes集群状态的informer缓存
+    启动时做一次全量list，之后通过watch长连接按增量维护node_cache和pod_cache，
+    watch过期（410 Gone）时根据resourceVersion重新list
 
-        self.core_v1 = client.CoreV1Api()
+    每次变更都发布一个新的Cluster_Snapshot并整体替换，读者通过snapshot拿到一致的视图，
+    不需要加锁；lock只用于串行化写者
+    """
+    PENDING_SELECTOR = "status.phase=Pending,spec.schedulerName={}"
+    # 已结束或正在删除的pod不再计入节点占用
+    RELEASED_STATUSES = ("Succeeded", "Failed", "Terminating")
+
+    def __init__(self, gcp_manager: "GCP_Manager", credential=None, watch_timeout=300,
+                 namespace="default", scheduler_name="custom-scheduling", page_size=500):
+        self.credential = credential
+        self._core_v1 = None
+        self._client_lock = threading.Lock()
         self.gcp_manager = gcp_manager
-        self.node_cache = defaultdict()
-        self.pod_cache = defaultdict()
+        self._snapshot = Cluster_Snapshot(0, {}, {})
+
+        self.lock = threading.RLock()
+        # 出现待调度pod时置位，供System的调度循环等待
+        self.pending_event = threading.Event()
+        self._pending_listeners = []
+        self.resource_versions = {"nodes": None, "pods": None}
+        self.watch_timeout = watch_timeout
+        self.namespace = namespace
+        self.scheduler_name = scheduler_name
+        self.page_size = page_size
+        self._stop = threading.Event()
+        self._watches = {}
+        self._threads = []
+        # pod uid -> (resourceVersion, (CPU, RAM))，未变化的pod在后续list和watch事件中不重复解析
+        self._requests_cache = {}
+
+    @property
+    def core_v1(self):
+        """第一次访问时加载kubeconfig并创建CoreV1Api"""
+        if self._core_v1 is None:
+            with self._client_lock:
+                if self._core_v1 is None:
+                    if self.credential is None:
+                        config.load_incluster_config()
+                    else:
+                        config.load_kube_config(self.credential)
+                    self._core_v1 = client.CoreV1Api()
+        return self._core_v1
+
+    @property
+    def snapshot(self) -> Cluster_Snapshot:
+        return self._snapshot
+
+    @property
+    def node_cache(self):
+        return self._snapshot.nodes
+
+    @property
+    def pod_cache(self):
+        return self._snapshot.pods
+
+    def _publish(self, nodes, pods):
+        """发布新的快照，调用方需持有lock，且之后不再修改nodes、pods及其中的节点"""
+        for node in nodes.values():
+            node.freeze()
+        self._snapshot = Cluster_Snapshot(self._snapshot.version + 1, nodes, pods)
 
     def refresh(self):
-        self.node_cache.clear()
-        self.pod_cache.clear()
+        with self.lock:
+            nodes = self.fetch_nodes()
+            pods = self.fetch_pods()
+            self.allocate_pods(nodes, pods)
+            self._publish(nodes, pods)
+        if self.pending_pods:
+            self._notify_pending()
+
+    def add_pending_listener(self, callback):
+        """注册出现待调度pod时的回调，回调在watch线程中执行，不能阻塞"""
+        self._pending_listeners.append(callback)
+
+    def _notify_pending(self):
+        self.pending_event.set()
+        for callback in self._pending_listeners:
+            callback()
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """全量list一次，然后启动nodes和pods的watch线程"""
+        self._stop.clear()
+        self.refresh()
+        self._threads = [threading.Thread(target=self._watch_loop, args=(kind,),
+                                          name=f"k8s-watch-{kind}", daemon=True)
+                         for kind in ("nodes", "pods")]
+        for t in self._threads:
+            t.start()
+        logger.info("Kubernetes informer已启动")
+
+    def stop(self):
+        self._stop.set()
+        for w in list(self._watches.values()):
+            w.stop()
+        self._notify_pending()
+        logger.info("Kubernetes informer已停止")
+
+    def _watch_loop(self, kind):
+        list_func, kwargs, handler = {
+            "nodes": (self.core_v1.list_node, {}, self._on_node_event),
+            "pods": (self.core_v1.list_namespaced_pod, {"namespace": self.namespace}, self._on_pod_event),
+        }[kind]
+        backoff = 1
+        while not self._stop.is_set():
+            w = watch.Watch()
+            self._watches[kind] = w
+            try:
+                for event in w.stream(list_func,
+                                      resource_version=self.resource_versions[kind],
+                                      timeout_seconds=self.watch_timeout,
+                                      allow_watch_bookmarks=True,
+                                      **kwargs):
+                    if self._stop.is_set():
+                        break
+                    if event["type"] == "BOOKMARK":
+                        self.resource_versions[kind] = self._bookmark_version(event)
+                        continue
+                    obj = event["object"]
+                    self.resource_versions[kind] = obj.metadata.resource_version
+                    handler(event["type"], obj)
+                backoff = 1
+            except client.ApiException as e:
+                # ERROR事件（包括410 Gone）由客户端转换成ApiException抛出
+                if e.status == 410:
+                    logger.warning(f"{kind}的watch已过期(resourceVersion={self.resource_versions[kind]})，重新list")
+                    self._relist()
+                    backoff = 1
+                else:
+                    API_ERRORS.inc(api="k8s_watch")
+                    logger.error(f"{kind}的watch出现错误: {e}")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, 30)
+            except Exception as e:
+                API_ERRORS.inc(api="k8s_watch")
+                logger.error(f"{kind}的watch连接中断: {str(e)}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                w.stop()
 
-        self.fetch_nodes()
-        self.fetch_pods()
-        self.allocate_pods()
+    @staticmethod
+    def _bookmark_version(event):
+        """客户端不反序列化BOOKMARK事件，其object是原始的dict，只能从raw_object中取resourceVersion"""
+        return event["raw_object"]["metadata"]["resourceVersion"]
+
+    def _relist(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"重新list集群状态失败: {str(e)}")
+            self._stop.wait(5)
+
+    def _on_node_event(self, event_type, obj):
+        name = obj.metadata.name
+        with self.lock:
+            snapshot = self._snapshot
+            nodes = dict(snapshot._nodes)
+            old = nodes.pop(name, None)
+            if event_type == "DELETED":
+                logger.info(f"节点{name}已从集群中删除")
+            else:
+                res = self._parse_node(obj)
+                if res is not None:
+                    node = res[1]
+                    node.add_pods(old.pods if old is not None else
+                                  [x for x in snapshot._pods.values() if self._occupies(x) and x.node == name])
+                    nodes[name] = node
+            self._publish(nodes, snapshot._pods)
+
+    def _on_pod_event(self, event_type, obj):
+        name = obj.metadata.name
+        pod = None
+        with self.lock:
+            snapshot = self._snapshot
+            pods = dict(snapshot._pods)
+            # 只复制pod所在的节点，其余节点与上一个快照共享
+            forked = {}
+
+            def fork(node_name):
+                if node_name not in forked:
+                    forked[node_name] = snapshot._nodes[node_name].fork()
+                return forked[node_name]
+
+            old = pods.pop(name, None)
+            if event_type == "DELETED":
+                self._requests_cache.pop(obj.metadata.uid, None)
+            if old is not None and self._occupies(old) and old.node in snapshot._nodes:
+                if old in snapshot._nodes[old.node].pods:
+                    fork(old.node).remove_pod(old)
+            if event_type != "DELETED":
+                res = self._parse_pod(obj)
+                if res is not None:
+                    pod = res[1]
+                    pods[name] = pod
+                    if self._occupies(pod) and pod.node in snapshot._nodes:
+                        fork(pod.node).add_pod(pod)
+            self._publish({**snapshot._nodes, **forked} if forked else snapshot._nodes, pods)
+        if pod is not None and pod.status == "Pending" and pod.scheduler_name == self.scheduler_name:
+            self._notify_pending()
+
+    def wait_node_ready(self, name, timeout=600):
+        """
+        通过metadata.name字段选择器watch单个节点，Ready条件变为True时立即返回
+        :return: 超时前节点是否就绪
+        """
+        selector = f"metadata.name={name}"
+        deadline = time.monotonic() + timeout
+        resource_version = None
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if resource_version is None:
+                nodes = self.core_v1.list_node(field_selector=selector)
+                resource_version = nodes.metadata.resource_version
+                ready = next((x for x in nodes.items if self._is_node_ready(x)), None)
+                if ready is not None:
+                    self._on_node_ready(ready)
+                    return True
+            w = watch.Watch()
+            try:
+                for event in w.stream(self.core_v1.list_node,
+                                      field_selector=selector,
+                                      resource_version=resource_version,
+                                      timeout_seconds=max(int(remaining), 1),
+                                      allow_watch_bookmarks=True):
+                    if event["type"] == "BOOKMARK":
+                        resource_version = self._bookmark_version(event)
+                        continue
+                    obj = event["object"]
+                    resource_version = obj.metadata.resource_version
+                    if event["type"] in ("ADDED", "MODIFIED") and self._is_node_ready(obj):
+                        self._on_node_ready(obj)
+                        return True
+            except client.ApiException as e:
+                if e.status != 410:
+                    API_ERRORS.inc(api="k8s_watch")
+                    raise
+                resource_version = None
+            finally:
+                w.stop()
+        return False
+
+    @staticmethod
+    def _is_node_ready(node):
+        conditions = node.status.conditions if node.status is not None else None
+        return any(x.type == "Ready" and x.status == "True" for x in conditions or [])
+
+    def _on_node_ready(self, obj):
+        """informer未运行时由等待方把就绪的节点写入缓存"""
+        if self.running:
+            return
+        res = self._parse_node(obj)
+        if res is not None:
+            with self.lock:
+                snapshot = self._snapshot
+                self._publish({**snapshot._nodes, res[0]: res[1]}, snapshot._pods)
+
+    def _paginate(self, list_func, kind=None, **kwargs):
+        """
+        按limit/continue分页流式地获取对象，每次只在内存中保留一页
+        kind不为空时记录最后一页的resourceVersion，供后续watch使用
+        """
+        _continue = None
+        while True:
+            response = list_func(limit=self.page_size, _continue=_continue, **kwargs)
+            yield from response.items
+            _continue = response.metadata._continue
+            if not _continue:
+                if kind is not None:
+                    self.resource_versions[kind] = response.metadata.resource_version
+                return
+
+    def iter_pending_pods(self):
+        """在API Server端按phase和schedulerName过滤，只拉取本调度器的待调度pod"""
+        for pod in self._paginate(self.core_v1.list_namespaced_pod,
+                                  namespace=self.namespace,
+                                  field_selector=self.PENDING_SELECTOR.format(self.scheduler_name)):
+            res = self._parse_pod(pod)
+            if res is not None and res[1].status == "Pending":
+                yield res[1]
 
     def fetch_nodes(self):
+        nodes = {}
         try:
-            nodes = self.core_v1.list_node().items
-            for node in nodes:
+            for node in self._paginate(self.core_v1.list_node, kind="nodes"):
                 res = self._parse_node(node)
                 if res is None:
                     continue
                 k,v = res
-                self.node_cache[k] = v
-            logger.info(f"在Kubernetes集群中或得到了{len(self.node_cache)}个节点")
+                nodes[k] = v
+            logger.info(f"在Kubernetes集群中或得到了{len(nodes)}个节点")
+            return nodes
         except Exception as e:
-            logger.info("错误发生在获取K8S节点时")
-            print(e)
+            logger.error(f"错误发生在获取K8S节点时: {str(e)}")
             raise
 
     def _parse_node(self, node):
@@ -49,42 +331,58 @@ class K8s_Monitor:
                 status = "Ready" if cond.status == "True" else "NotReady"
                 if status == "NotReady":
                     return None
-        e_ip = self.gcp_manager.instances[node.metadata.name].externalIP
+        try:
+            cpu = cpu_cores(node.status.capacity["cpu"])
+            ram = memory_gib(node.status.capacity["memory"])
+        except (KeyError, ValueError) as e:
+            logger.warning(f"无法解析节点{node.metadata.name}的容量，忽略该节点: {e}")
+            return None
+        instance = self.gcp_manager.instances.get(node.metadata.name)
+        e_ip = instance.externalIP if instance is not None else addresses.get("ExternalIP", None)
         node_info = {
             "name": node.metadata.name,
             "InternalIP": addresses.get("InternalIP", None),
             "ExternalIP": e_ip,
             "Hostname": addresses.get("Hostname", None),
-            "CPU": float(node.status.capacity["cpu"]),
-            "RAM": self._parse_node_memory(node.status.capacity["memory"]),
+            "CPU": cpu,
+            "RAM": ram,
             "status": status,
-            "price":0
+            "price":0,
+            "created_at": node.metadata.creation_timestamp.timestamp() if node.metadata.creation_timestamp else None,
+            "unschedulable": bool(node.spec.unschedulable)
         }
         #logger.info(f"解析k8s Node ->\n\t{node_info}")
         return (node.metadata.name, Node(node.metadata.name, node_info))
 
-    def _parse_node_memory(self, mem_str):
-        if mem_str.endswith("Ki"):
-            return float(mem_str[:-len("Ki")])/1024/1024
-        return None
-
     def fetch_pods(self):
+        pods = {}
+        seen = set()
         try:
-            pods = self.core_v1.list_pod_for_all_namespaces().items
-            pods = [x for x in pods if x.metadata.namespace == "default"]
-            for pod in pods:
+            for pod in self._paginate(self.core_v1.list_namespaced_pod, kind="pods",
+                                      namespace=self.namespace):
+                seen.add(pod.metadata.uid)
                 res = self._parse_pod(pod)
                 if res is None:
                     continue
                 k,v = res
-                self.pod_cache[k] =v
-            logger.info(f"在Kubernetes集群中得到了{len(self.pod_cache)}个Pods")
+                pods[k] =v
+            # 丢弃已不存在的pod的缓存
+            self._requests_cache = {k: v for k, v in self._requests_cache.items() if k in seen}
+            logger.info(f"在Kubernetes集群中得到了{len(pods)}个Pods")
+            return pods
         except Exception as e:
-            logger.info("错误发生在获取K8S pods时")
-            print(e)
+            logger.error(f"错误发生在获取K8S pods时: {str(e)}")
             raise
 
-    def _parse_pod(self, pod):
+    def parse_pod(self, pod):
+        """
+        把任意命名空间的V1Pod解析成Pod，无法解析资源请求时返回None
+        不读写informer的请求缓存，供Consolidator等解析不在监控范围内的pod
+        """
+        res = self._parse_pod(pod, cache=False)
+        return res[1] if res is not None else None
+
+    def _parse_pod(self, pod, cache=True):
         name, ns = pod.metadata.name, pod.metadata.namespace
         if pod.metadata.deletion_timestamp is not None:
             status = "Terminating"
@@ -94,46 +392,70 @@ class K8s_Monitor:
             else:
                 status = pod.status.phase  # 保持原始状态
         node = pod.spec.node_name
-        cpu = sum([self._parse_pod_cpu(x.resources.requests["cpu"]) for x in pod.spec.containers])
-        ram = sum([self._parse_pod_ram(x.resources.requests["memory"]) for x in pod.spec.containers])
+        requests = self._pod_requests(pod, cache)
+        if requests is None:
+            return None
+        cpu, ram = requests
         pod_info = {
             "name": name,
             "namespace": ns,
             "status": status,
             "node": node,
             "CPU": cpu, "RAM": ram,
-            "scheduler_name":pod.spec.scheduler_name
+            "scheduler_name":pod.spec.scheduler_name,
+            "created_at": pod.metadata.creation_timestamp.timestamp() if pod.metadata.creation_timestamp else None,
+            "controller": next((x.kind for x in pod.metadata.owner_references or [] if x.controller), None)
         }
         #logger.info(f"解析k8s Pod ->\n\t{pod_info}")
         pod_copy = Pod(pod_info)
         return (name, pod_copy)
 
-    def _parse_pod_cpu(self, cpu):
-        if cpu.endswith("m"):
-            return float(cpu[:-len("m")])/1000
-        else:
-            return float(cpu)
-
-    def _parse_pod_ram(self, ram):
-        if ram.endswith("Gi"):
-            return float(ram[:-len("Gi")])
-        elif ram.endswith("Mi"):
-            return float(ram[:-len("Mi")]) / 1024
+    def _pod_requests(self, pod, cache=True):
+        """
+        pod的有效请求(CPU, RAM)，cache为True时按(uid, resourceVersion)缓存
+        缓存只保存informer所监控命名空间中的pod，由list和DELETED事件清理
+        资源请求无法解析的pod记录告警后返回None，不会中断list或watch
+        """
+        uid, version = pod.metadata.uid, pod.metadata.resource_version
+        if cache:
+            cached = self._requests_cache.get(uid)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        try:
+            requests = pod_requests(pod.spec)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"无法解析pod {pod.metadata.namespace}/{pod.metadata.name}的资源请求，忽略该pod: {e}")
+            requests = None
+        if cache and uid is not None:
+            self._requests_cache[uid] = (version, requests)
+        return requests
 
     @property
     def pending_pods(self):
-        return {k:v for k,v in self.pod_cache.items() if v.status == "Pending"}
+        return self._snapshot.pending_pods
+
+    @classmethod
+    def _occupies(cls, pod):
+        """
+        已绑定到节点且未结束的pod都占用节点资源，
+        包括kubelet尚未启动的pod（Scheduled），否则绑定之后到Running之前节点会被超额分配
+        """
+        return pod.node is not None and pod.status not in cls.RELEASED_STATUSES
 
-    def allocate_pods(self):
+    def allocate_pods(self, nodes, pods):
+        """把占用节点资源的pod挂到尚未发布的nodes上"""
         logger.info("开始将k8s内的节点和pod做匹配")
-        pods = {k:v for k,v in self.pod_cache.items() if v.status=="Running"}
+        pods = {k:v for k,v in pods.items() if self._occupies(v)}
         for k,v in pods.items():
             node_name = v.node
-            node = self.node_cache[node_name]
-            node.pods.append(v)
+            node = nodes.get(node_name)
+            if node is None:
+                continue
+            node.add_pod(v)
             # logger.info(f"成功将{k}匹配到节点{node_name}")
 
 if __name__=="__main__":
+    from cloud_platform.NodeManage import GCP_Manager
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../configurations/single-cloud-ylxq-ed1608c43bb4.json"
     gcp_manager = GCP_Manager()
     a= K8s_Monitor(gcp_manager=gcp_manager,
@@ -1,37 +1,106 @@
-from kubernetes.client import ApiException
+from typing import TYPE_CHECKING
+from cluster.Binder import Pod_Binder, Bind_Result
+from optimizer import build_optimizer
+from telemetry.Metrics import PHASE_DURATION, NODES_CREATED, PLAN_COST
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio, logging, threading, time
 
-from cluster.Monitor import K8s_Monitor
-from cloud_platform.NodeManage import GCP_Manager
-from cloud_platform.GCP_Pricing import GCP_Pricing
-from optimizer.CABFD import CABFD
-from kubernetes import client
-import logging
+if TYPE_CHECKING:
+    from cluster.Monitor import K8s_Monitor
+    from cloud_platform.NodeManage import GCP_Manager
+    from cloud_platform.GCP_Pricing import GCP_Pricing
 
 logger = logging.getLogger(__name__)
 
 class Scheduler:
     def __init__(self,
-                k8s_monitor: K8s_Monitor,
-                gcp_manager:GCP_Manager,
-                gcp_pricing:GCP_Pricing):
+                k8s_monitor: "K8s_Monitor",
+                gcp_manager: "GCP_Manager",
+                gcp_pricing: "GCP_Pricing",
+                max_provision_workers=4,
+                max_bind_workers=16,
+                optimizer="cabfd",
+                optimizer_options=None,
+                warm_pool=None,
+                pricing_models=(),
+                node_managers=None,
+                binding_factory=None):
+        """
+        :param pricing_models: 其他云平台的Pricing_Model，其机型与GCP的机型合并成一个候选池
+        :param node_managers: {provider: 节点管理器}，新节点按其provider路由到对应的管理器创建，
+                              GCP使用gcp_manager；pricing_models中的每个平台都必须有管理器
+        :param binding_factory: 构造绑定请求体的函数，见Pod_Binder
+        """
         self.k8s_monitor = k8s_monitor
         self.gcp_manager = gcp_manager
         self.gcp_pricing = gcp_pricing
-        self.cabfd = CABFD(self.gcp_pricing)
+        self.max_provision_workers = max_provision_workers
+        self.node_managers = {gcp_pricing.provider: gcp_manager, **(node_managers or {})}
+        models = [self.gcp_pricing]
+        for model in pricing_models:
+            # 候选池中的机型必须能被创建，否则方案选中该平台的机型时无法执行
+            if model.provider not in self.node_managers:
+                raise ValueError(f"没有{model.provider}平台的节点管理器，其机型不能加入候选池")
+            models.append(model)
+        self.optimizer = build_optimizer(optimizer, models, **(optimizer_options or {}))
+        self.max_bind_workers = max_bind_workers
+        self.binding_factory = binding_factory
+        self._binder = None
+        # 可选的预热节点池，新建节点前优先认领
+        self.warm_pool = warm_pool
+        # execute_async已分配、但informer尚未看到其绑定结果的pod：(namespace, name) -> (pod, node_name)
+        # 后续调度轮次跳过这些pod，并把它们计入目标节点的占用
+        self._reserved = {}
+        self._reserved_lock = threading.Lock()
+        self._provision_listeners = []
 
-    def _get_available_node(self):
-        all_nodes = self.k8s_monitor.node_cache
+    @property
+    def binder(self):
+        """第一次绑定时才创建，构造调度器时不需要连接API Server"""
+        if self._binder is None:
+            with self._reserved_lock:
+                if self._binder is None:
+                    self._binder = Pod_Binder(self.k8s_monitor.core_v1, max_workers=self.max_bind_workers,
+                                              binding_factory=self.binding_factory)
+        return self._binder
+
+    def add_provision_listener(self, callback):
+        """注册建节点完成时的回调，参数为从发起创建到节点加入集群的秒数"""
+        self._provision_listeners.append(callback)
+
+    def _get_available_node(self, snapshot=None):
         logger.info("调度器正在获取worker nodes")
-        return [v for k,v in all_nodes.items() if v.name != "master" and v.status == "Ready"]
+        snapshot = snapshot or self.k8s_monitor.snapshot
+        self._settle(snapshot)
+        # 在写时复制的副本上规划，不会改动已发布的快照
+        warm = self.warm_pool.names if self.warm_pool is not None else ()
+        nodes = snapshot.fork_nodes(lambda v: v.name != "master" and v.status == "Ready" and not v.unschedulable
+                                    and v.name not in warm)
+        with self._reserved_lock:
+            reserved = list(self._reserved.values())
+        if reserved:
+            by_name = {x.name: x for x in nodes}
+            for pod, node_name in reserved:
+                node = by_name.get(node_name)
+                if node is not None and all(x.name != pod.name for x in node.pods):
+                    node.add_pod(pod)
+        return nodes
 
-    def _get_pending_pod(self):
+    def _get_pending_pod(self, snapshot=None):
         logger.info("调度器正在获取pending pods")
-        return [x for x in self.k8s_monitor.pending_pods.values() if x.scheduler_name=="custom-scheduling"]
+        snapshot = snapshot or self.k8s_monitor.snapshot
+        self._settle(snapshot)
+        with self._reserved_lock:
+            reserved = set(self._reserved)
+        return [x for x in snapshot.pending_pods.values()
+                if x.scheduler_name=="custom-scheduling" and (x.namespace, x.name) not in reserved]
 
     def schedule(self):
         logger.info("调度器开始调度")
-        pendding_pods = self._get_pending_pod()
-        nodes = self._get_available_node()
+        # pod和节点取自同一个快照
+        snapshot = self.k8s_monitor.snapshot
+        pendding_pods = self._get_pending_pod(snapshot)
+        nodes = self._get_available_node(snapshot)
         logger.info("待调度pod如下：")
         _ = [logger.info(x) for x in pendding_pods]
         if nodes == []:
@@ -39,54 +108,207 @@ class Scheduler:
         else:
             logger.info(f"已有工作节点如下：")
             _ = [logger.info(x) for x in nodes]
-        result = self.cabfd.optimize(pendding_pods, nodes.copy())
-        self.cabfd.summary(result)
+        with PHASE_DURATION.time(phase="optimize"):
+            result = self.optimizer.optimize(pendding_pods, nodes.copy())
+        self.optimizer.summary(result)
 
         logger.info("调度算法运行完毕！")
         return result
 
     def execute(self, plan):
+        """
+        执行调度方案
+        :return: 每个待绑定pod的Bind_Result，失败的pod需要在下一轮重新调度
+        """
+        old_nodes = self._get_existing_node(plan)
+        warm_nodes, new_nodes = self._claim_warm(self._get_new_node(plan))
+
+        for node in old_nodes:
+            self.gcp_manager.parse_node(node)
+
+        # 已有节点上的pod无需等待新节点
+        results = self.binder.bind_all([x for node in old_nodes for x in self._pending_assignments(node)])
+        for node in warm_nodes:
+            try:
+                self.warm_pool.activate(node)
+            except Exception as e:
+                results += self._provision_failed(node, e)
+                continue
+            results += self.binder.bind_all(self._pending_assignments(node))
+
+        if new_nodes:
+            results += self._provision(new_nodes)
+            logger.info("调度方案中新节点安装完毕！")
+        return results
+
+    def _provision(self, new_nodes):
+        """
+        在有界线程池中并行创建新节点
+        同型号的节点用一次请求创建，每个节点加入集群后立即绑定其上的pod
+        """
+        results = []
+        started = time.monotonic()
+        workers = min(self.max_provision_workers, len(new_nodes))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision") as executor:
+            futures = {executor.submit(self._manager(group[0]).launch_instances, group): group
+                       for group in self._group_by_type(new_nodes)}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = futures.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        for node in (target if isinstance(target, list) else [target]):
+                            results += self._provision_failed(node, e)
+                        continue
+                    if isinstance(target, list):
+                        # 实例已RUNNING，各节点独立地初始化并加入集群
+                        futures.update({executor.submit(self._manager(node).join_cluster, node): node
+                                        for node in target})
+                    else:
+                        self._provision_succeeded(target, started)
+                        results += self.binder.bind_all(self._pending_assignments(target))
+        return results
+
+    async def execute_async(self, plan, executor=None, provision_executor=None):
+        """
+        execute的asyncio版本，阻塞的SDK调用都在executor中执行
+        - 已有节点上的pod立即绑定
+        - 同型号的新节点用一次请求创建，每个节点在provision_executor中加入集群后立即绑定其上的pod
+          耗时数分钟的建节点调用不会占满绑定和调度使用的executor
+        - 方案中的pod在得到绑定结果之前保留，不会被下一轮调度重复分配
+        :return: 每个待绑定pod的Bind_Result
+        """
         old_nodes = self._get_existing_node(plan)
-        new_nodes = self._get_new_node(plan)
+        warm_nodes, new_nodes = self._claim_warm(self._get_new_node(plan))
 
         for node in old_nodes:
             self.gcp_manager.parse_node(node)
 
-        for node in new_nodes:
-            self.gcp_manager.create_node(node)
-        logger.info("调度方案中新节点安装完毕！")
-        # 创建完新节点，刷新集群状态？
-        for node in plan:
-            pending_pods = [x for x in node.pods if x.status=="Pending"]
-            for pod in pending_pods:
-                if pod.node == None:
-                    self._bind_pod(pod, node.name)
+        # 在第一次await之前保留整个方案
+        assignments = [x for node in old_nodes + warm_nodes for x in self._pending_assignments(node)]
+        self._reserve(assignments + [x for node in new_nodes for x in self._pending_assignments(node)])
+        results = []
+        try:
+            tasks = [self.binder.bind_all_async([x for node in old_nodes for x in self._pending_assignments(node)],
+                                                executor)]
+            tasks += [self._warm_async(node, executor) for node in warm_nodes]
+            tasks += [self._provision_async(group, executor, provision_executor)
+                      for group in self._group_by_type(new_nodes)]
+            results = [x for batch in await asyncio.gather(*tasks) for x in batch]
+        finally:
+            self._release(assignments, results)
+        if new_nodes:
+            logger.info("调度方案中新节点安装完毕！")
+        return results
+
+    async def _provision_async(self, nodes, executor, provision_executor):
+        """创建一组同型号的节点，每个节点加入集群后立即绑定其上的pod"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        assignments = [x for node in nodes for x in self._pending_assignments(node)]
+        results = []
+        try:
+            try:
+                await loop.run_in_executor(provision_executor, self._manager(nodes[0]).launch_instances, nodes)
+            except Exception as e:
+                return [x for node in nodes for x in self._provision_failed(node, e)]
+            batches = await asyncio.gather(*[self._join_async(node, executor, provision_executor, started)
+                                             for node in nodes])
+            results = [x for batch in batches for x in batch]
+            return results
+        finally:
+            self._release(assignments, results)
+
+    async def _join_async(self, node, executor, provision_executor, started):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(provision_executor, self._manager(node).join_cluster, node)
+        except Exception as e:
+            return self._provision_failed(node, e)
+        self._provision_succeeded(node, started)
+        return await self.binder.bind_all_async(self._pending_assignments(node), executor)
+
+    async def _warm_async(self, node, executor):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(executor, self.warm_pool.activate, node)
+        except Exception as e:
+            return self._provision_failed(node, e)
+        return await self.binder.bind_all_async(self._pending_assignments(node), executor)
+
+    def _claim_warm(self, new_nodes):
+        """
+        为方案中的新节点认领预热节点
+        :return: (认领到预热节点的节点, 仍需新建的节点)
+        """
+        if self.warm_pool is None or not new_nodes:
+            return [], new_nodes
+        self.warm_pool.observe_demand(len(new_nodes))
+        warm = [x for x in new_nodes if self.warm_pool.claim(x)]
+        if warm:
+            logger.info(f"{len(warm)}个新节点使用预热节点: {[x.name for x in warm]}")
+        return warm, [x for x in new_nodes if not any(x is y for y in warm)]
+
+    def _manager(self, node):
+        """新节点所属云平台的节点管理器，provider缺省时为GCP"""
+        provider = node.provider or self.gcp_pricing.provider
+        manager = self.node_managers.get(provider)
+        if manager is None:
+            raise LookupError(f"没有{provider}平台的节点管理器")
+        return manager
+
+    def _provision_succeeded(self, node, started):
+        NODES_CREATED.inc(type=node.type)
+        PLAN_COST.inc(node.price or 0)
+        for callback in self._provision_listeners:
+            callback(time.monotonic() - started)
+
+    def _provision_failed(self, node, e):
+        logger.error(f"节点{node.name}({node.type})创建失败，其上的pod将在下一轮重新调度: {str(e)}")
+        return [Bind_Result(pod, None, False, 0, e) for pod, _ in self._pending_assignments(node)]
+
+    @staticmethod
+    def _group_by_type(nodes):
+        """按(平台, 机型)分组，每组用一次请求创建"""
+        groups = {}
+        for node in nodes:
+            groups.setdefault((node.provider, node.type), []).append(node)
+        return list(groups.values())
+
+    def _reserve(self, assignments):
+        with self._reserved_lock:
+            for pod, node_name in assignments:
+                self._reserved[(pod.namespace, pod.name)] = (pod, node_name)
+
+    def _release(self, assignments, results=()):
+        """
+        释放绑定失败或未执行的pod，它们回到pending，由下一轮重新调度
+        绑定成功的pod继续保留到informer看到其nodeName（见_settle），
+        否则在绑定返回到watch事件到达之间，这些pod既不是pending也不计入任何节点的占用
+        """
+        bound = {(x.pod.namespace, x.pod.name) for x in results if x.success}
+        with self._reserved_lock:
+            for pod, _ in assignments:
+                if (pod.namespace, pod.name) not in bound:
+                    self._reserved.pop((pod.namespace, pod.name), None)
+
+    def _settle(self, snapshot):
+        """丢弃快照中已经有nodeName（或已被删除）的pod的保留，此后由快照计入节点占用"""
+        pods = snapshot.pods
+        with self._reserved_lock:
+            for key, (pod, _) in list(self._reserved.items()):
+                current = pods.get(pod.name)
+                if current is None or current.node is not None:
+                    del self._reserved[key]
+
+    def _pending_assignments(self, node):
+        return [(pod, node.name) for pod in node.pods
+                if pod.status == "Pending" and pod.node == None]
 
     def _get_existing_node(self, plan):
         return [x for x in plan if x.status=="Ready"]
 
     def _get_new_node(self,plan):
         return [x for x in plan if x.status == None]
-
-    def _bind_pod(self, pod, node_name):
-        api_instance = self.k8s_monitor.core_v1
-        body = client.V1Binding(
-            target=client.V1ObjectReference(
-                kind="Node",
-                api_version="v1",
-                name=node_name
-            ),
-            metadata=client.V1ObjectMeta(name=pod.name, namespace=pod.namespace)
-        )
-        try:
-            api_instance.create_namespaced_pod_binding(
-                name=pod.name,
-                namespace=pod.namespace,
-                body=body
-            )
-            logger.info(f"绑定Pod {pod.name}到节点{node_name}成功")
-        except ApiException as e:
-            logger.error(f"绑定Pod {pod.name}到节点{node_name}失败")
-            print(e)
-        except Exception as e:
-            logger.info(f"绑定Pod {pod.name}到节点{node_name}成功")
\ No newline at end of file
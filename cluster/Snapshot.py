@@ -0,0 +1,39 @@
+from types import MappingProxyType
+
+
+class Cluster_Snapshot:
+    """
+    某一时刻集群节点和pod的不可变视图
+    - 由K8s_Monitor在每次变更后整体替换发布，读者拿到引用后无需加锁
+    - version单调递增，可用来判断两次读取之间集群是否变化
+    - 其中的Node不允许修改，规划时请使用node.fork()得到写时复制的副本
+    """
+    __slots__ = ("version", "_nodes", "_pods")
+
+    def __init__(self, version, nodes, pods):
+        """
+        :param nodes: {name: Node}，发布后发布方不再修改该字典
+        :param pods: {name: Pod}，同上
+        """
+        self.version = version
+        self._nodes = nodes
+        self._pods = pods
+
+    @property
+    def nodes(self):
+        return MappingProxyType(self._nodes)
+
+    @property
+    def pods(self):
+        return MappingProxyType(self._pods)
+
+    @property
+    def pending_pods(self):
+        return {k: v for k, v in self._pods.items() if v.status == "Pending"}
+
+    def fork_nodes(self, predicate=None):
+        """返回满足条件的节点的写时复制副本"""
+        return [x.fork() for x in self._nodes.values() if predicate is None or predicate(x)]
+
+    def __repr__(self):
+        return f"Cluster_Snapshot(version={self.version}, nodes={len(self._nodes)}, pods={len(self._pods)})"
@@ -0,0 +1,82 @@
+from decimal import Decimal, localcontext
+import re
+
+# Kubernetes resource.Quantity的文本格式：<数字><后缀>，后缀为二进制单位、十进制单位或十进制指数
+_QUANTITY = re.compile(r"^([+-]?(?:\d+\.?\d*|\.\d+))(?:(Ki|Mi|Gi|Ti|Pi|Ei|n|u|m|k|M|G|T|P|E)|[eE]([+-]?\d+))?$")
+_MULTIPLIERS = {
+    None: Decimal(1),
+    "Ki": Decimal(2 ** 10), "Mi": Decimal(2 ** 20), "Gi": Decimal(2 ** 30),
+    "Ti": Decimal(2 ** 40), "Pi": Decimal(2 ** 50), "Ei": Decimal(2 ** 60),
+    "n": Decimal("1e-9"), "u": Decimal("1e-6"), "m": Decimal("1e-3"),
+    "k": Decimal("1e3"), "M": Decimal("1e6"), "G": Decimal("1e9"),
+    "T": Decimal("1e12"), "P": Decimal("1e15"), "E": Decimal("1e18"),
+}
+GIB = Decimal(2 ** 30)
+
+
+def parse_quantity(text) -> Decimal:
+    """
+    把Kubernetes的quantity（如"500m"、"1.5Gi"、"512M"、"1e3"、"128974848"）精确地转换成Decimal
+    格式不合法时抛出ValueError
+    """
+    if isinstance(text, (int, float)):
+        return Decimal(str(text))
+    m = _QUANTITY.match(str(text).strip())
+    if m is None:
+        raise ValueError(f"无法解析的quantity: {text!r}")
+    number, suffix, exponent = m.groups()
+    with localcontext() as ctx:
+        ctx.prec = 60
+        if exponent is not None:
+            return Decimal(number).scaleb(int(exponent))
+        return Decimal(number) * _MULTIPLIERS[suffix]
+
+
+def cpu_cores(text):
+    """CPU quantity转换成核数"""
+    return float(parse_quantity(text))
+
+
+def memory_gib(text):
+    """内存quantity转换成GiB，与Node/Pod中RAM的单位一致"""
+    with localcontext() as ctx:
+        ctx.prec = 60
+        return float(parse_quantity(text) / GIB)
+
+
+def _requests(container):
+    resources = container.resources
+    requests = (resources.requests if resources is not None else None) or {}
+    return parse_quantity(requests.get("cpu", 0)), parse_quantity(requests.get("memory", 0))
+
+
+def pod_requests(spec):
+    """
+    按kube-scheduler的规则计算pod的有效请求，返回(CPU核数, 内存GiB)
+    - 应用容器的请求求和
+    - init容器依次运行，取其中的最大值；restartPolicy为Always的sidecar容器在其后一直运行，计入总和
+    - 有效请求为二者的较大值，再加上RuntimeClass的overhead
+    - 没有写requests的容器按0计
+    """
+    cpu = ram = Decimal(0)
+    for container in spec.containers or []:
+        c, r = _requests(container)
+        cpu, ram = cpu + c, ram + r
+
+    init_cpu = init_ram = Decimal(0)
+    sidecar_cpu = sidecar_ram = Decimal(0)
+    for container in spec.init_containers or []:
+        c, r = _requests(container)
+        if getattr(container, "restart_policy", None) == "Always":
+            sidecar_cpu, sidecar_ram = sidecar_cpu + c, sidecar_ram + r
+            init_cpu, init_ram = max(init_cpu, sidecar_cpu), max(init_ram, sidecar_ram)
+        else:
+            init_cpu, init_ram = max(init_cpu, sidecar_cpu + c), max(init_ram, sidecar_ram + r)
+    cpu, ram = max(cpu + sidecar_cpu, init_cpu), max(ram + sidecar_ram, init_ram)
+
+    overhead = getattr(spec, "overhead", None) or {}
+    cpu += parse_quantity(overhead.get("cpu", 0))
+    ram += parse_quantity(overhead.get("memory", 0))
+    with localcontext() as ctx:
+        ctx.prec = 60
+        return float(cpu), float(ram / GIB)
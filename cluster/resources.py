@@ -1,20 +1,20 @@
 class Pod:
+    __slots__ = ("cpu", "memory", "limit", "status", "namespace", "node", "name", "scheduler_name", "created_at",
+                 "controller")
+
     def __init__(self, request: dict, limit=None, name=None):
-        self.request = request
-        self.limit = limit if limit else request
+        self.cpu = request["CPU"]
+        self.memory = request["RAM"]
+        self.limit = limit
         self.status = request.get("status", None)
         self.namespace = request.get("namespace",None)
         self.node = request.get("node", None)
-        self.name = request.get("name", None)
+        self.name = request.get("name", name)
         self.scheduler_name = request.get("scheduler_name", None)
-
-    @property
-    def cpu(self):
-        return self.request["CPU"]
-
-    @property
-    def memory(self):
-        return self.request["RAM"]
+        # pod的创建时间（epoch秒），用于统计从pending到绑定的延迟
+        self.created_at = request.get("created_at", None)
+        # 管理该pod的控制器类型（如ReplicaSet），裸pod为None，驱逐后不会被重建
+        self.controller = request.get("controller", None)
 
     def __str__(self):
         return (f"Pod is {self.name}"
@@ -25,32 +25,94 @@ class Pod:
 
 
 class Node:
+    __slots__ = ("name", "type", "cpu", "memory", "price", "provider", "status", "internalIP", "externalIP",
+                 "created_at", "unschedulable", "_pods", "occupied_cpu", "occupied_memory")
+
     def __init__(self, name, configuration, pods=None):
         self.name = name
         self.type = configuration.get("type", None)
         self.cpu = configuration.get("CPU", None)
         self.memory = configuration.get("RAM", None)
         self.price = configuration.get("price", None)
-        self.pods = pods if pods else []
+        # 机型所属的云平台，新建节点时据此选择节点管理器，None表示默认平台（GCP）
+        self.provider = configuration.get("provider", None)
         self.status = configuration.get("status", None)
         self.internalIP = configuration.get("InternalIP", None)
         self.externalIP = configuration.get("ExternalIP", None)
+        # 节点加入集群的时间（epoch秒）以及是否已被封锁（cordon）
+        self.created_at = configuration.get("created_at", None)
+        self.unschedulable = configuration.get("unschedulable", False)
+        # 已占用资源随pod的增删增量维护，避免每次访问都重新求和
+        self._pods = []
+        self.occupied_cpu = 0
+        self.occupied_memory = 0
+        for pod in pods or []:
+            self.add_pod(pod)
 
     @property
-    def available_cpu(self):
-        return self.cpu - sum(x.cpu for x in self.pods)
+    def pods(self):
+        """节点上的pod（只读视图，增删请使用add_pod/remove_pod）"""
+        return self._pods
 
-    @property
-    def availbale_memory(self):
-        return self.memory - sum(x.memory for x in self.pods)
+    def _own_pods(self):
+        # pod列表为元组时与其他副本共享，修改前先复制
+        if type(self._pods) is tuple:
+            self._pods = list(self._pods)
+
+    def add_pod(self, pod: Pod):
+        self._own_pods()
+        self._pods.append(pod)
+        self.occupied_cpu += pod.cpu
+        self.occupied_memory += pod.memory
+
+    def add_pods(self, pods):
+        for pod in pods:
+            self.add_pod(pod)
+
+    def remove_pod(self, pod: Pod):
+        self._own_pods()
+        self._pods.remove(pod)
+        self.occupied_cpu -= pod.cpu
+        self.occupied_memory -= pod.memory
+
+    def clear_pods(self):
+        self._pods = []
+        self.occupied_cpu = 0
+        self.occupied_memory = 0
+
+    def copy(self):
+        """复制节点及其pod列表，供调度算法在副本上规划而不改动监控缓存"""
+        node = Node.__new__(Node)
+        for attr in Node.__slots__:
+            setattr(node, attr, getattr(self, attr))
+        node._pods = list(self._pods)
+        return node
+
+    def freeze(self):
+        """把pod列表转为元组，之后的fork()与本节点共享该元组"""
+        if type(self._pods) is not tuple:
+            self._pods = tuple(self._pods)
+        return self
+
+    def fork(self):
+        """写时复制的副本：共享冻结的pod元组，第一次增删pod时才复制"""
+        node = Node.__new__(Node)
+        for attr in Node.__slots__:
+            setattr(node, attr, getattr(self, attr))
+        if type(node._pods) is not tuple:
+            node._pods = tuple(node._pods)
+        return node
 
     @property
-    def occupied_cpu(self):
-        return sum(x.cpu for x in self.pods)
+    def available_cpu(self):
+        return self.cpu - self.occupied_cpu
 
     @property
-    def occupied_memory(self):
-        return sum(x.memory for x in self.pods)
+    def availbale_memory(self):
+        return self.memory - self.occupied_memory
+
+    def fits(self, cpu, memory):
+        return self.available_cpu >= cpu and self.availbale_memory >= memory
 
     def __str__(self):
         return (f"Node is {self.name}"
@@ -58,4 +120,4 @@ class Node:
                 f"\n\t-> status:{self.status}"
                 f"\n\t-> CPU: {self.cpu}"
                 f"\n\t-> Memory: {self.memory}"
-                f"\n\t-> has pods {self.pods}")
\ No newline at end of file
+                f"\n\t-> has pods {self._pods}")
@@ -0,0 +1,158 @@
+from cluster.resources import Node
+from cloud_platform.Pricing_Model import Pricing_Model
+from optimizer.Optimizer import Optimizer
+from optimizer.CABFD import CABFD
+from optimizer.Scoring_Engine import Scoring_Engine
+import logging, time
+
+logger = logging.getLogger(__name__)
+
+
+class _Timeout(Exception):
+    pass
+
+
+class BnB(Optimizer):
+    """
+    在机型目录和已有节点上做分支定界，最小化新建节点的总价
+    - 以CABFD的方案作为初始最优解，超出时间预算时返回当前最优解
+    - 下界：剩余pod超出已开节点空闲资源的部分，按最便宜的每vCPU/每GB单价计价
+    - 相同形状的pod只能放入编号不小于前一个pod的节点，消除对称解
+    """
+    # 与CABFD的打分引擎使用相同的容差，浮点累加误差不会让两者对同一节点的适配判断不同
+    EPS = Scoring_Engine.EPS
+
+    def __init__(self,
+                 pricing,
+                 time_budget=2.0,
+                 max_pods=300,
+                 weights=(1, 1, 0.5)):
+        """
+        :param pricing: 一个或多个云平台的Pricing_Model，见Optimizer
+        :param time_budget: 单次调度的时间预算（秒），包括CABFD初始解的时间
+        :param max_pods: 待调度pod超过该数量时直接使用CABFD的方案
+        """
+        super().__init__(pricing)
+        self.time_budget = time_budget
+        self.max_pods = max_pods
+        self.cabfd = CABFD(pricing, weights)
+
+    def optimize(self, pods, nodes):
+        deadline = time.perf_counter() + self.time_budget
+        flavors = sorted(self.flavor_index, key=lambda f: (f.price, f.cpu, f.ram))
+        order = sorted(pods, key=lambda x: (-x.memory, -x.cpu))
+
+        incumbent = self.cabfd.optimize(order, [x.fork() for x in nodes])
+        if len(order) > self.max_pods or not flavors:
+            return self._replay(incumbent, nodes)
+
+        self._order = order
+        self._flavors = flavors
+        self._deadline = deadline
+        self._expanded = 0
+        self._best_cost = self.plan_cost(incumbent)
+        self._best = None
+        cabfd_cost = self._best_cost
+
+        self._cpu = [x.cpu for x in order]
+        self._ram = [x.memory for x in order]
+        self._suffix_cpu = self._suffix(self._cpu)
+        self._suffix_ram = self._suffix(self._ram)
+        self._cpu_unit = min(f.price / f.cpu for f in flavors)
+        self._ram_unit = min(f.price / f.ram for f in flavors)
+
+        self._free_cpu = [x.available_cpu for x in nodes]
+        self._free_ram = [x.availbale_memory for x in nodes]
+        self._bin_flavor = [None] * len(nodes)
+        self._assign = [None] * len(order)
+
+        finished = True
+        try:
+            self._search(0, 0.0, sum(self._free_cpu), sum(self._free_ram))
+        except _Timeout:
+            finished = False
+
+        logger.info(f"BnB搜索{'完成' if finished else '超时'}，展开{self._expanded}个节点，"
+                    f"CABFD成本{cabfd_cost:.6f}，最优成本{self._best_cost:.6f}")
+        schedule = self._materialize(nodes, *self._best) if self._best is not None else None
+        if schedule is None:
+            return self._replay(incumbent, nodes)
+        return schedule
+
+    @staticmethod
+    def _suffix(values):
+        suffix = [0.0] * (len(values) + 1)
+        for i in range(len(values) - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + values[i]
+        return suffix
+
+    def _lower_bound(self, k, free_cpu, free_ram):
+        extra_cpu = self._suffix_cpu[k] - free_cpu
+        extra_ram = self._suffix_ram[k] - free_ram
+        return max(extra_cpu * self._cpu_unit, extra_ram * self._ram_unit, 0.0)
+
+    def _search(self, k, cost, free_cpu, free_ram):
+        self._expanded += 1
+        if self._expanded & 255 == 0 and time.perf_counter() > self._deadline:
+            raise _Timeout()
+        if k == len(self._order):
+            if cost < self._best_cost - self.EPS:
+                self._best_cost = cost
+                self._best = (list(self._assign), list(self._bin_flavor))
+            return
+        if cost + self._lower_bound(k, free_cpu, free_ram) >= self._best_cost - self.EPS:
+            return
+
+        c, r = self._cpu[k], self._ram[k]
+        same_shape = k > 0 and self._cpu[k - 1] == c and self._ram[k - 1] == r
+        first = self._assign[k - 1] if same_shape else 0
+
+        # 先尝试已开的节点，放入后剩余资源越少越优先（最佳适配）
+        fcpu, fram = self._free_cpu, self._free_ram
+        open_bins = [b for b in range(first, len(fcpu)) if fcpu[b] + self.EPS >= c and fram[b] + self.EPS >= r]
+        open_bins.sort(key=lambda b: (fram[b] - r, fcpu[b] - c))
+        for b in open_bins:
+            old_cpu, old_ram = fcpu[b], fram[b]
+            fcpu[b], fram[b] = old_cpu - c, old_ram - r
+            self._assign[k] = b
+            self._search(k + 1, cost, free_cpu - c, free_ram - r)
+            fcpu[b], fram[b] = old_cpu, old_ram
+
+        # 再尝试新建节点，按价格从低到高
+        for f in self._flavors:
+            if f.cpu < c or f.ram < r:
+                continue
+            if cost + f.price >= self._best_cost - self.EPS:
+                break
+            b = len(fcpu)
+            fcpu.append(f.cpu - c)
+            fram.append(f.ram - r)
+            self._bin_flavor.append(f)
+            self._assign[k] = b
+            self._search(k + 1, cost + f.price, free_cpu + f.cpu - c, free_ram + f.ram - r)
+            fcpu.pop()
+            fram.pop()
+            self._bin_flavor.pop()
+
+    def _materialize(self, nodes, assign, bin_flavor):
+        """
+        在节点副本上按搜索结果放置pod，逐个核对容量后再落到原节点上
+        :return: 方案；有pod放不下时返回None，由调用方退回CABFD的方案
+        """
+        plan = [x.fork() for x in nodes] + [Node("created", f.as_config()) for f in bin_flavor[len(nodes):]]
+        for pod, b in zip(self._order, assign):
+            node = plan[b]
+            if node.available_cpu + self.EPS < pod.cpu or node.availbale_memory + self.EPS < pod.memory:
+                logger.warning(f"BnB方案中节点{b}放不下Pod {pod.name}，使用CABFD的方案")
+                return None
+            node.add_pod(pod)
+        return self._replay(plan, nodes)
+
+    @staticmethod
+    def _replay(plan, nodes):
+        """把在节点副本上得到的方案落到原节点上"""
+        schedule = [] + nodes
+        for node, planned in zip(nodes, plan):
+            for pod in planned.pods[len(node.pods):]:
+                node.add_pod(pod)
+        return schedule + plan[len(nodes):]
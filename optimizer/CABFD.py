@@ -1,91 +1,95 @@
 from cluster.resources import Pod, Node
-from cloud_platform.GCP_Pricing import GCP_Pricing
+from optimizer.Optimizer import Optimizer
+from optimizer.Scoring_Engine import Scoring_Engine
 import logging, os, json
 
 logger = logging.getLogger(__name__)
 
-class CABFD:
+class CABFD(Optimizer):
+    """
+    成本感知的最佳适配递减（Cost-Aware Best Fit Decreasing）启发式算法
+    pod按(RAM, CPU)降序逐个放入得分最高的已有节点或新机型
+    """
     def __init__(self,
-                 gcp_pricing:GCP_Pricing):
-        self.gcp_pricing = gcp_pricing
-        # self.aws_pricing = pricing['aws']
+                 pricing,
+                 weights=(1, 1, 0.5),
+                 aggregate=True):
+        """
+        :param pricing: 一个或多个云平台的Pricing_Model，见Optimizer
+        :param weights: 打分中(RAM利用率, CPU利用率, 价格)三项的权重
+        :param aggregate: 是否把请求相同的pod聚合成(形状, 数量)整组放置
+        """
+        super().__init__(pricing)
+        self.weights = weights
+        self.aggregate = aggregate
 
     def optimize(self, pods, nodes):
+        if self.aggregate:
+            return self._optimize_groups(pods, nodes)
         sorted_pods = sorted(pods, key=lambda x:(-x.memory, -x.cpu))
 
         schedule = []+nodes
+        engine = Scoring_Engine(schedule, self.flavor_index, self.weights)
         for pod in sorted_pods:
-            candidates = []
-            candidates = self._find_in_existing_nodes(schedule, pod)
-            candidates += self._find_possible_types(pod)
-            best = self._find_best(candidates, pod)
-            best.pods.append(pod)
-            if best in schedule:
-                continue
-            schedule.append(best)
-            #best.price = 0
-            best.name="created"
-
-        return schedule
-
-    def summary(self, schedule):
-        cnt = 0
-        tot_price = 0
-        for node in schedule:
-            type = node.type
-            price = node.price
-            tot_price += price
-            vcpu, ram = node.cpu, node.memory
-            pods = [(pod.cpu, pod.memory) for pod in node.pods]
-            if node.name == "created":
-                cnt += 1
-                logger.info(f"创建节点{cnt}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
-                            f"\n\t 部署的pod为 {pods}"
-                            f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
-                            f"\n\t CPU占用率{100 * node.occupied_cpu / vcpu:.2f}%, Memory占用率{100 * node.occupied_memory / ram:.2f}%")
+            kind, idx = engine.best(pod.cpu, pod.memory)
+            if kind == "flavor":
+                best = engine.make_node(idx)
+                best.name = "created"
+                idx = engine.add_node(best)
+                schedule.append(best)
             else:
-                logger.info(f"调度节点{node.name}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
-                         f"\n\t 部署的pod为 {pods}"
-                         f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
-                         f"\n\t CPU占用率{100*node.occupied_cpu/vcpu:.2f}%, Memory占用率{100*node.occupied_memory/ram:.2f}%")
-        logger.info(f"总价为{tot_price}")
-    def _find_in_existing_nodes(self, nodes, pod):
-        request_cpu, request_ram = pod.cpu, pod.memory
+                best = engine.nodes[idx]
+            best.add_pod(pod)
+            engine.occupy(idx, pod.cpu, pod.memory)
 
-        return [n for n in nodes
-                if n.available_cpu >= request_cpu and n.availbale_memory >= request_ram]
+        return schedule
 
-    def _find_possible_types(self, pod:Pod):
-        cnt = 0
-        result= []
-        for name, x in self.gcp_pricing.machine2price_cache.items():
-            if x["CPU"] >= pod.cpu and x["RAM"] >= pod.memory:
-                x.update({"type": name})
-                result.append(Node("not-created", x))
-        return result
+    def _group_by_shape(self, pods):
+        """把pod按(CPU, RAM)请求分组，组间按(RAM, CPU)降序"""
+        groups = {}
+        for pod in pods:
+            groups.setdefault((pod.cpu, pod.memory), []).append(pod)
+        return sorted(groups.items(), key=lambda x: (-x[0][1], -x[0][0]))
 
-    def _find_best(self, nodes, pod):
-        best = max(nodes, key=lambda x: self._score(x, pod, nodes))
-        #print("+"*10)
-        #for node in nodes:
-        #    logging.info(f"当前 {node.name}={node.type} 得分 {self._score(node, pod, nodes)}")
-        return best
+    def _optimize_groups(self, pods, nodes):
+        """
+        按形状整组放置：每次为该形状选出得分最高的节点或机型，
+        再按剩余资源算出能放下的副本数一次性放入，调度耗时只与形状数和节点数有关
+        """
+        schedule = []+nodes
+        engine = Scoring_Engine(schedule, self.flavor_index, self.weights)
+        for (cpu, ram), members in self._group_by_shape(pods):
+            placed = 0
+            while placed < len(members):
+                kind, idx = engine.best(cpu, ram)
+                if kind == "node":
+                    k = engine.capacity(idx, cpu, ram, len(members) - placed)
+                    engine.nodes[idx].add_pods(members[placed:placed + k])
+                    engine.occupy(idx, k * cpu, k * ram)
+                    placed += k
+                    continue
+                # 新机型胜出时，装满后的节点不再是候选，其余候选的得分不变，
+                # 因此剩余的同形状pod都会落到同一机型上，可以一次性开出所有节点
+                flavor = idx
+                while placed < len(members):
+                    best = engine.make_node(flavor)
+                    best.name = "created"
+                    idx = engine.add_node(best)
+                    schedule.append(best)
+                    k = engine.capacity(idx, cpu, ram, len(members) - placed)
+                    best.add_pods(members[placed:placed + k])
+                    engine.occupy(idx, k * cpu, k * ram)
+                    placed += k
 
-    def _score(self, node:Node, pod:Pod, candidates):
-        avai_cpu, avai_ram = node.available_cpu, node.availbale_memory
-        ram_util = 1-(avai_cpu - pod.cpu)/node.cpu
-        cpu_util = 1-(avai_ram - pod.memory)/node.memory
-        if node.name == "created" or node.status=="Ready":
-            price = 1 - (0)
-        else:
-            price = 1 - (node.price / max(x.price for x in candidates))
-        return 1*ram_util + 1*cpu_util + 0.5 * price
+        return schedule
 
 
 if __name__=="__main__":
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../configurations/single-cloud-ylxq-ed1608c43bb4.json"
-    os.environ["GCP_PROJECT"] = "single-cloud-ylxq"  # 可选自定义项目变量
-    cabfd = CABFD()
+    from cloud_platform.Static_Pricing import Static_Pricing
+    logging.basicConfig(level=logging.INFO)
+    # 相对于本文件定位定价表，需在仓库根目录以python -m optimizer.CABFD运行
+    fp = os.path.join(os.path.dirname(__file__), "..", "data", "sample-pricing.json")
+    cabfd = CABFD([Static_Pricing(fp, "gcp"), Static_Pricing(fp, "aws")])
     request1 = {"CPU": 0.7, "RAM": 0.2}
     request2 = {"CPU": 1, "RAM": 0.7}
     request3 = {"CPU":0.1, "RAM": 1}
@@ -96,5 +100,5 @@ if __name__=="__main__":
     for i, s in zip(setup, requests):
         for _ in range(i):
             pods.append(Pod(s))
-    result = cabfd.optimize(pods)
-    cabfd.summary(result)
\ No newline at end of file
+    result = cabfd.optimize(pods, [])
+    cabfd.summary(result)
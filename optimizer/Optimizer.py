@@ -0,0 +1,66 @@
+from abc import ABC, abstractmethod
+from cloud_platform.Pricing_Model import Pricing_Model
+from cloud_platform.Flavor_Index import Flavor_Index
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Optimizer(ABC):
+    """
+    调度算法接口
+    optimize接收待调度pod和已有节点，返回调度方案：
+        已有节点（按传入顺序）在前，需要新建的节点（name为"created"、status为None）在后，
+        每个节点的pods中包含分配给它的pod
+    新建节点的provider记录了机型所属的云平台
+    """
+    def __init__(self, pricing):
+        """
+        :param pricing: 一个Pricing_Model，或多个云平台的Pricing_Model列表，其机型合并成一个候选池
+        """
+        self.pricing_models = list(pricing) if isinstance(pricing, (list, tuple)) else [pricing]
+        # (合并时各平台的机型索引, 合并结果)，任一平台发布新定价后重建
+        self._merged = ((), Flavor_Index())
+
+    @property
+    def flavor_index(self):
+        """所有平台的机型合成的候选池"""
+        indexes = tuple(x.flavor_index for x in self.pricing_models)
+        if len(indexes) == 1:
+            return indexes[0]
+        sources, merged = self._merged
+        if len(sources) != len(indexes) or any(a is not b for a, b in zip(sources, indexes)):
+            merged = Flavor_Index.merge(indexes)
+            self._merged = (indexes, merged)
+            logger.info(f"合并了{[x.provider for x in self.pricing_models]}的机型，候选池共{len(merged)}个机型")
+        return merged
+
+    @abstractmethod
+    def optimize(self, pods, nodes):
+        pass
+
+    @staticmethod
+    def plan_cost(schedule):
+        """方案中新建节点的每小时总价，已有节点不计入"""
+        return sum(x.price or 0 for x in schedule if x.name == "created")
+
+    def summary(self, schedule):
+        cnt = 0
+        tot_price = 0
+        for node in schedule:
+            type = node.type
+            price = node.price
+            tot_price += price
+            vcpu, ram = node.cpu, node.memory
+            pods = [(pod.cpu, pod.memory) for pod in node.pods]
+            if node.name == "created":
+                cnt += 1
+                logger.info(f"创建节点{cnt}, 类型为{type}({node.provider}), 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
+                            f"\n\t 部署的pod为 {pods}"
+                            f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
+                            f"\n\t CPU占用率{100 * node.occupied_cpu / vcpu:.2f}%, Memory占用率{100 * node.occupied_memory / ram:.2f}%")
+            else:
+                logger.info(f"调度节点{node.name}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
+                         f"\n\t 部署的pod为 {pods}"
+                         f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
+                         f"\n\t CPU占用率{100*node.occupied_cpu/vcpu:.2f}%, Memory占用率{100*node.occupied_memory/ram:.2f}%")
+        logger.info(f"总价为{tot_price}")
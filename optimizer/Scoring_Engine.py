@@ -0,0 +1,127 @@
+from cluster.resources import Node
+from cloud_platform.Flavor_Index import Flavor_Index
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Scoring_Engine:
+    """
+    CABFD候选节点的批量打分引擎
+    已调度节点与可选机型分别保存在数组中，每个pod只需一次向量化的适配判断和打分
+    """
+    W_RAM, W_CPU, W_PRICE = 1, 1, 0.5
+    EPS = 1e-9
+
+    def __init__(self, nodes, flavors: Flavor_Index, weights=None):
+        """
+        :param nodes: 已有节点（Node）列表，顺序即为候选顺序
+        :param flavors: 可选机型索引
+        :param weights: (RAM利用率, CPU利用率, 价格)的权重，缺省为(1, 1, 0.5)
+        """
+        if weights is not None:
+            self.W_RAM, self.W_CPU, self.W_PRICE = weights
+        self.nodes = []
+        size = max(16, 2 * len(nodes))
+        self.node_cpu = np.zeros(size)
+        self.node_ram = np.zeros(size)
+        self.node_occ_cpu = np.zeros(size)
+        self.node_occ_ram = np.zeros(size)
+        self.node_price = np.zeros(size)
+        # 新建节点或Ready节点不计价格，打分中价格项恒为1
+        self.node_free_price = np.zeros(size, dtype=bool)
+        for node in nodes:
+            self.add_node(node)
+
+        self.flavors = flavors
+        self.flavor_cpu = flavors.cpu
+        self.flavor_ram = flavors.ram
+        self.flavor_price = flavors.price
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add_node(self, node: Node):
+        """加入一个节点并返回其下标"""
+        idx = len(self.nodes)
+        if idx == self.node_cpu.shape[0]:
+            self._grow()
+        self.nodes.append(node)
+        self.node_cpu[idx] = node.cpu
+        self.node_ram[idx] = node.memory
+        self.node_occ_cpu[idx] = node.occupied_cpu
+        self.node_occ_ram[idx] = node.occupied_memory
+        self.node_price[idx] = node.price or 0
+        self.node_free_price[idx] = node.name == "created" or node.status == "Ready"
+        return idx
+
+    def _grow(self):
+        size = 2 * self.node_cpu.shape[0]
+        for attr in ("node_cpu", "node_ram", "node_occ_cpu", "node_occ_ram", "node_price", "node_free_price"):
+            old = getattr(self, attr)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, attr, new)
+
+    def occupy(self, idx, cpu, ram):
+        """在下标为idx的节点上记账（与Node中逐个累加的顺序一致）"""
+        self.node_occ_cpu[idx] += cpu
+        self.node_occ_ram[idx] += ram
+
+    def capacity(self, idx, cpu, ram, limit):
+        """下标为idx的节点还能再放下多少个(cpu, ram)形状的pod，最多limit个"""
+        free_cpu = self.node_cpu[idx] - self.node_occ_cpu[idx]
+        free_ram = self.node_ram[idx] - self.node_occ_ram[idx]
+        k = limit
+        if cpu > 0:
+            k = min(k, int((free_cpu + self.EPS) // cpu))
+        if ram > 0:
+            k = min(k, int((free_ram + self.EPS) // ram))
+        return max(k, 1)
+
+    def best(self, cpu, ram):
+        """
+        对所有候选（已有节点在前，可选机型在后）批量打分
+        :return: (kind, idx) kind为"node"或"flavor"
+        """
+        n = len(self.nodes)
+        cap_cpu, cap_ram = self.node_cpu[:n], self.node_ram[:n]
+        avai_cpu = cap_cpu - self.node_occ_cpu[:n]
+        avai_ram = cap_ram - self.node_occ_ram[:n]
+        # 与capacity()使用相同的容差，逐个放置与整组放置对同一节点的判断一致
+        node_fit = (avai_cpu + self.EPS >= cpu) & (avai_ram + self.EPS >= ram)
+
+        node_idx = np.flatnonzero(node_fit)
+        flavor_idx = self.flavors.fit_indices(cpu, ram)
+        if node_idx.size == 0 and flavor_idx.size == 0:
+            raise ValueError(f"没有可以容纳({cpu} vCPU, {ram}G RAM)的节点或机型")
+
+        max_price = max(self.node_price[node_idx].max(initial=0),
+                        self.flavor_price[flavor_idx].max(initial=0))
+
+        node_score = self._score(avai_cpu[node_idx], avai_ram[node_idx],
+                                 cap_cpu[node_idx], cap_ram[node_idx],
+                                 self.node_price[node_idx], self.node_free_price[:n][node_idx],
+                                 cpu, ram, max_price)
+        flavor_score = self._score(self.flavor_cpu[flavor_idx], self.flavor_ram[flavor_idx],
+                                   self.flavor_cpu[flavor_idx], self.flavor_ram[flavor_idx],
+                                   self.flavor_price[flavor_idx], np.zeros(flavor_idx.size, dtype=bool),
+                                   cpu, ram, max_price)
+
+        # 与max()一致：得分相同时取最先出现的候选
+        best_node = node_score.argmax() if node_idx.size else None
+        best_flavor = flavor_score.argmax() if flavor_idx.size else None
+        if best_flavor is None or (best_node is not None and node_score[best_node] >= flavor_score[best_flavor]):
+            return "node", int(node_idx[best_node])
+        return "flavor", int(flavor_idx[best_flavor])
+
+    def _score(self, avai_cpu, avai_ram, cap_cpu, cap_ram, price, free_price, cpu, ram, max_price):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ram_util = 1 - (avai_cpu - cpu) / cap_cpu
+            cpu_util = 1 - (avai_ram - ram) / cap_ram
+            price_score = np.where(free_price, 1.0, 1 - price / max_price)
+        return self.W_RAM * ram_util + self.W_CPU * cpu_util + self.W_PRICE * price_score
+
+    def make_node(self, flavor_idx):
+        """按机型下标构造一个未创建的节点"""
+        return Node("not-created", self.flavors[flavor_idx].as_config())
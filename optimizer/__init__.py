@@ -0,0 +1,14 @@
+from optimizer.Optimizer import Optimizer
+from optimizer.CABFD import CABFD
+from optimizer.BnB import BnB
+
+# 可通过配置选择的调度算法
+OPTIMIZERS = {
+    "cabfd": CABFD,
+    "bnb": BnB,
+}
+
+def build_optimizer(name, pricing, **options) -> Optimizer:
+    if name not in OPTIMIZERS:
+        raise ValueError(f"未知的调度算法{name}，可选: {list(OPTIMIZERS)}")
+    return OPTIMIZERS[name](pricing, **options)
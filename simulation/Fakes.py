@@ -0,0 +1,106 @@
+from collections import defaultdict
+from cluster.resources import Node
+from cluster.Snapshot import Cluster_Snapshot
+from types import SimpleNamespace
+import threading, logging
+
+logger = logging.getLogger(__name__)
+
+
+def plain_binding(pod, node_name):
+    """Fake_CoreV1接受的绑定请求体，只有target.name，不需要kubernetes SDK"""
+    return SimpleNamespace(target=SimpleNamespace(kind="Node", name=node_name),
+                           metadata=SimpleNamespace(name=pod.name, namespace=pod.namespace))
+
+class Fake_CoreV1:
+    """只实现调度器用到的CoreV1Api接口，绑定即把pod标记为Running"""
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.bind_calls = 0
+
+    def create_namespaced_pod_binding(self, name, namespace, body, **kwargs):
+        self.bind_calls += 1
+        self.monitor.bind(name, body.target.name)
+
+
+class Fake_Monitor:
+    """离线版K8s_Monitor：集群状态完全保存在内存中"""
+    def __init__(self):
+        self.node_cache = defaultdict()
+        self.pod_cache = defaultdict()
+        self.lock = threading.RLock()
+        self.pending_event = threading.Event()
+        self.core_v1 = Fake_CoreV1(self)
+        self.running = True
+
+    @property
+    def snapshot(self):
+        """每次读取时复制一份，仿真中的节点仍可原地修改"""
+        with self.lock:
+            return Cluster_Snapshot(0, dict(self.node_cache), dict(self.pod_cache))
+
+    @property
+    def pending_pods(self):
+        with self.lock:
+            return {k:v for k,v in self.pod_cache.items() if v.status == "Pending"}
+
+    def submit(self, pods):
+        with self.lock:
+            for pod in pods:
+                self.pod_cache[pod.name] = pod
+        self.pending_event.set()
+
+    def add_node(self, node):
+        with self.lock:
+            self.node_cache[node.name] = node
+
+    def bind(self, pod_name, node_name):
+        with self.lock:
+            pod = self.pod_cache[pod_name]
+            pod.status = "Running"
+            pod.node = node_name
+            self.node_cache[node_name].add_pod(pod)
+
+    def refresh(self):
+        pass
+
+
+class Fake_Manager:
+    """离线版GCP_Manager：创建节点立即完成并以Ready状态加入Fake_Monitor"""
+    def __init__(self, monitor: Fake_Monitor, prefix="node"):
+        """
+        :param prefix: 节点名前缀，仿真多个云平台时用来区分各平台创建的节点
+        """
+        self.monitor = monitor
+        self.prefix = prefix
+        self.instances = defaultdict()
+        self.created = []
+        self.no = 0
+        self._name_lock = threading.Lock()
+
+    def refresh(self):
+        pass
+
+    def parse_node(self, node):
+        pass
+
+    def allocate_name(self):
+        with self._name_lock:
+            self.no += 1
+            return f"{self.prefix}-{self.no}"
+
+    def create_node(self, node):
+        self.launch_instances([node])
+        self.join_cluster(node)
+
+    def launch_instances(self, nodes):
+        for node in nodes:
+            node.name = self.allocate_name()
+        return nodes
+
+    def join_cluster(self, node):
+        joined = Node(node.name, {"type": node.type, "CPU": node.cpu, "RAM": node.memory,
+                                  "price": node.price, "provider": node.provider, "status": "Ready"})
+        self.instances[node.name] = joined
+        self.created.append(joined)
+        self.monitor.add_node(joined)
@@ -0,0 +1,145 @@
+from cloud_platform.Static_Pricing import Static_Pricing
+from cluster.Scheduler import Scheduler
+from cluster.resources import Pod, Node
+from simulation.Fakes import Fake_Monitor, Fake_Manager, plain_binding
+import argparse, json, logging, random, time, tracemalloc
+
+logger = logging.getLogger(__name__)
+
+def load_trace(fp):
+    """
+    读取jsonl格式的pod到达轨迹，每行一个pod，例如
+        {"name": "web-1", "CPU": 0.5, "RAM": 1, "arrival": 12.5}
+    name缺省时自动编号，arrival缺省为0（同一时刻到达）
+    """
+    pods = []
+    with open(fp, 'r') as f:
+        for no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            pods.append((float(entry.get("arrival", 0)), entry.get("name", f"pod-{no}"),
+                         float(entry["CPU"]), float(entry["RAM"])))
+    return pods
+
+def synthetic_trace(size, seed=0, duration=0):
+    """生成size个pod的合成轨迹，形状取自若干常见的(CPU, RAM)请求"""
+    rnd = random.Random(seed)
+    shapes = [(0.1, 0.128), (0.25, 0.5), (0.5, 1), (0.5, 2), (1, 1), (1, 4), (2, 4), (0.2, 0.9)]
+    return [(rnd.uniform(0, duration), f"pod-{i}", *rnd.choice(shapes)) for i in range(size)]
+
+
+class Simulator:
+    """
+    离线驱动Scheduler.schedule/execute，统计方案成本、节点数、资源利用率以及调度算法耗时和内存
+    """
+    def __init__(self, pricing, cycle=10, measure_memory=True, optimizer="cabfd", optimizer_options=None,
+                 pricing_models=()):
+        """
+        :param pricing_models: 其他云平台的定价，每个平台使用一个独立的Fake_Manager
+        """
+        self.pricing = pricing
+        self.pricing_models = pricing_models
+        self.optimizer = optimizer
+        self.optimizer_options = optimizer_options
+        self.cycle = cycle
+        self.measure_memory = measure_memory
+
+    def run(self, trace, initial_nodes=()):
+        monitor = Fake_Monitor()
+        manager = Fake_Manager(monitor)
+        managers = {x.provider: Fake_Manager(monitor, prefix=x.provider) for x in self.pricing_models}
+        for node in initial_nodes:
+            monitor.add_node(node)
+        scheduler = Scheduler(k8s_monitor=monitor, gcp_manager=manager, gcp_pricing=self.pricing,
+                              optimizer=self.optimizer, optimizer_options=self.optimizer_options,
+                              pricing_models=self.pricing_models, node_managers=managers,
+                              binding_factory=plain_binding)
+
+        trace = sorted(trace)
+        optimize_time, peak_memory, cycles = 0.0, 0, 0
+        i = 0
+        while i < len(trace):
+            window_end = trace[i][0] + self.cycle
+            batch = []
+            while i < len(trace) and trace[i][0] < window_end:
+                _, name, cpu, ram = trace[i]
+                batch.append(Pod({"name": name, "namespace": "default", "status": "Pending",
+                                  "CPU": cpu, "RAM": ram, "scheduler_name": "custom-scheduling"}))
+                i += 1
+            monitor.submit(batch)
+
+            if self.measure_memory:
+                peak_memory = max(peak_memory, self._optimize_peak_memory(scheduler))
+            start = time.perf_counter()
+            plan = scheduler.schedule()
+            optimize_time += time.perf_counter() - start
+            scheduler.execute(plan)
+            cycles += 1
+
+        return self._report(monitor, [manager, *managers.values()], len(trace), cycles, optimize_time, peak_memory)
+
+    def _optimize_peak_memory(self, scheduler):
+        """在节点副本上单独跑一次调度算法，用tracemalloc记录峰值内存"""
+        pods = scheduler._get_pending_pod()
+        nodes = scheduler._get_available_node()
+        tracemalloc.start()
+        try:
+            scheduler.optimizer.optimize(pods, nodes)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def _report(self, monitor, managers, n_pods, cycles, optimize_time, peak_memory):
+        nodes = [x for x in monitor.node_cache.values() if x.status == "Ready"]
+        created = [x for manager in managers for x in manager.created]
+        cpu = sum(x.cpu for x in nodes)
+        ram = sum(x.memory for x in nodes)
+        return {
+            "pods": n_pods,
+            "cycles": cycles,
+            "nodes": len(nodes),
+            "created_nodes": len(created),
+            "cost_per_hour": sum(x.price or 0 for x in created),
+            "providers": {p: sum(1 for x in created if (x.provider or "gcp") == p)
+                          for p in sorted({x.provider or "gcp" for x in created})},
+            "cpu_utilization": sum(x.occupied_cpu for x in nodes) / cpu if cpu else 0,
+            "ram_utilization": sum(x.occupied_memory for x in nodes) / ram if ram else 0,
+            "unscheduled": len(monitor.pending_pods),
+            "optimize_seconds": optimize_time,
+            "optimize_peak_mb": peak_memory / 1024 / 1024,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="调度流程的离线仿真与基准测试")
+    parser.add_argument("--pricing", default="data/sample-pricing.json", help="data/pricing.json格式的静态定价表")
+    parser.add_argument("--trace", default=None, help="jsonl格式的pod到达轨迹，缺省时使用合成轨迹")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--cycle", type=float, default=10, help="调度周期（秒），同一周期内到达的pod一起调度")
+    parser.add_argument("--duration", type=float, default=0, help="合成轨迹的到达时间跨度（秒）")
+    parser.add_argument("--no-memory", action="store_true", help="不统计调度算法的峰值内存")
+    parser.add_argument("--optimizer", default="cabfd", help="调度算法，见optimizer.OPTIMIZERS")
+    parser.add_argument("--providers", nargs="+", default=[],
+                        help="除GCP外参与调度的云平台（定价表中的平台名），如aws")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    simulator = Simulator(Static_Pricing(args.pricing), cycle=args.cycle, measure_memory=not args.no_memory,
+                          optimizer=args.optimizer,
+                          pricing_models=[Static_Pricing(args.pricing, x) for x in args.providers])
+    traces = [(args.trace, load_trace(args.trace))] if args.trace else \
+        [(f"synthetic-{n}", synthetic_trace(n, duration=args.duration)) for n in args.sizes]
+
+    header = f"{'trace':<20}{'pods':>8}{'nodes':>8}{'cost/h':>10}{'cpu%':>8}{'ram%':>8}{'opt(s)':>10}{'peak(MB)':>10}"
+    print(header)
+    for name, trace in traces:
+        r = simulator.run(trace)
+        print(f"{name:<20}{r['pods']:>8}{r['nodes']:>8}{r['cost_per_hour']:>10.4f}"
+              f"{100 * r['cpu_utilization']:>8.2f}{100 * r['ram_utilization']:>8.2f}"
+              f"{r['optimize_seconds']:>10.3f}{r['optimize_peak_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+import bisect, logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+# 覆盖从毫秒级的API调用到十几分钟的节点初始化
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+
+def _escape(text, quote=True):
+    """按Prometheus文本格式转义：反斜杠、换行，以及标签值中的双引号"""
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(x, "") for x in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation, quote=False)}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            lines += self._samples()
+        return lines
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # 最后一个计数对应+Inf桶
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """进程内的指标注册表，以Prometheus文本格式导出"""
+    def __init__(self):
+        self._metrics = []
+        self._server = None
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        在本地端口上通过HTTP提供/metrics
+        :param host: 监听地址，缺省只监听本机；需要被集群内的Prometheus抓取时显式指定
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"指标服务已启动: http://{host}:{port}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+METRICS = Registry()
+
+PHASE_DURATION = METRICS.histogram(
+    "scheduler_phase_duration_seconds",
+    "调度周期中各阶段的耗时",
+    ["phase"])
+POD_PENDING_TO_BOUND = METRICS.histogram(
+    "scheduler_pod_pending_to_bound_seconds",
+    "pod从创建到被绑定到节点的时间")
+PODS_SCHEDULED = METRICS.counter(
+    "scheduler_pods_scheduled_total",
+    "成功绑定的pod数量")
+PODS_BIND_FAILED = METRICS.counter(
+    "scheduler_pods_bind_failed_total",
+    "绑定失败、需要重新调度的pod数量")
+NODES_CREATED = METRICS.counter(
+    "scheduler_nodes_created_total",
+    "新建并加入集群的节点数量",
+    ["type"])
+NODES_REMOVED = METRICS.counter(
+    "scheduler_nodes_removed_total",
+    "缩容时排空并删除的节点数量",
+    ["type"])
+PLAN_COST = METRICS.counter(
+    "scheduler_plan_cost_per_hour_total",
+    "调度方案中新建节点的每小时价格累计")
+ADMISSION_WINDOW = METRICS.gauge(
+    "scheduler_admission_window_seconds",
+    "当前自适应微批窗口的长度")
+BATCH_SIZE = METRICS.histogram(
+    "scheduler_batch_size_pods",
+    "每个调度批次包含的pod数量",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000))
+WARM_POOL_SIZE = METRICS.gauge(
+    "scheduler_warm_pool_nodes",
+    "预热池中的节点数量（包括正在创建的）")
+WARM_POOL_COST = METRICS.gauge(
+    "scheduler_warm_pool_idle_cost_per_hour",
+    "预热池中空闲节点的每小时成本")
+WARM_POOL_CLAIMS = METRICS.counter(
+    "scheduler_warm_pool_claims_total",
+    "新建节点时认领预热节点的结果，result为hit或miss",
+    ["result"])
+API_ERRORS = METRICS.counter(
+    "scheduler_api_errors_total",
+    "调用Kubernetes和云平台API时出现的错误",
+    ["api"])
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from telemetry.Metrics import PHASE_DURATION
+import logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+class Startup_Profile:
+    """
+    记录系统启动各阶段的开始时间和耗时，阶段之间可以并发（如后台的定价刷新）
+    每个阶段同时记入PHASE_DURATION（phase="startup_<阶段名>"）
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.ready_at = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        begin = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append((name, begin - self.started, end - begin, ok))
+            PHASE_DURATION.observe(end - begin, phase=f"startup_{name}")
+
+    def ready(self):
+        """标记可以开始调度的时刻"""
+        self.ready_at = time.perf_counter() - self.started
+        logger.info(f"启动{self.ready_at:.2f}秒后开始调度")
+
+    def report(self):
+        """按开始时间输出各阶段的时间线"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda x: x[1])
+        lines = [f"\t{name:<20}开始{begin:>8.2f}s  耗时{duration:>8.2f}s{'' if ok else '  失败'}"
+                 for name, begin, duration, ok in phases]
+        ready = f"{self.ready_at:.2f}s" if self.ready_at is not None else "未就绪"
+        logger.info("启动各阶段耗时（开始调度于" + ready + "）：\n" + "\n".join(lines))
+        return phases
@@ -0,0 +1,4 @@
+import os, sys
+
+# 模块按仓库根目录导入（与python app.py、python -m simulation.Simulator相同）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+"""
+测试用的Kubernetes对象和客户端替身，只包含被测代码读取的字段
+kubernetes SDK不需要安装：被测模块中的watch、client代理由测试替换成这里的实现
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+class ApiException(Exception):
+    def __init__(self, status=None, reason=None):
+        super().__init__(f"({status}) {reason}")
+        self.status = status
+        self.reason = reason
+
+
+def make_pod(name, cpu="500m", memory="512Mi", phase="Pending", node=None, rv="1", namespace="default",
+             scheduler="custom-scheduling", controller="ReplicaSet", deleting=False, annotations=None):
+    owners = [SimpleNamespace(kind=controller, controller=True)] if controller else None
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name, namespace=namespace, uid=f"uid-{namespace}-{name}",
+                                 resource_version=rv, creation_timestamp=None,
+                                 deletion_timestamp="now" if deleting else None,
+                                 owner_references=owners, annotations=annotations),
+        spec=SimpleNamespace(node_name=node, scheduler_name=scheduler, init_containers=None, overhead=None,
+                             containers=[SimpleNamespace(resources=SimpleNamespace(
+                                 requests={"cpu": cpu, "memory": memory}))]),
+        status=SimpleNamespace(phase=phase))
+
+
+def make_node(name, cpu="2", memory="8Gi", ready=True, rv="1", created_at=None):
+    created = datetime.fromtimestamp(created_at, timezone.utc) if created_at is not None else None
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name, resource_version=rv, creation_timestamp=created),
+        spec=SimpleNamespace(unschedulable=None),
+        status=SimpleNamespace(addresses=[SimpleNamespace(type="InternalIP", address="10.0.0.2")],
+                               conditions=[SimpleNamespace(type="Ready", status="True" if ready else "False")],
+                               capacity={"cpu": cpu, "memory": memory}))
+
+
+def bookmark(rv):
+    """与客户端产生的BOOKMARK事件一致：object和raw_object都是未反序列化的dict"""
+    raw = {"kind": "Pod", "apiVersion": "v1", "metadata": {"resourceVersion": rv}}
+    return {"type": "BOOKMARK", "object": raw, "raw_object": raw}
+
+
+def event(type, obj):
+    return {"type": type, "object": obj, "raw_object": {}}
+
+
+def object_list(items, rv="1"):
+    return SimpleNamespace(items=list(items), metadata=SimpleNamespace(resource_version=rv, _continue=None))
+
+
+class Fake_Watch_Module:
+    """
+    kubernetes.watch的替身，每次stream()依次取出streams中的一项：
+    事件列表按顺序产出，异常实例直接抛出；取完后调用on_exhausted
+    """
+    def __init__(self, streams, on_exhausted=None):
+        self.streams = list(streams)
+        self.calls = []
+        self.on_exhausted = on_exhausted
+        module = self
+
+        class Watch:
+            def stream(self, func, **kwargs):
+                module.calls.append(kwargs)
+                if not module.streams:
+                    if module.on_exhausted is not None:
+                        module.on_exhausted()
+                    return
+                item = module.streams.pop(0)
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+
+            def stop(self):
+                pass
+
+        self.Watch = Watch
+
+
+class Fake_Gcp_Manager:
+    def __init__(self, instances=None):
+        self.instances = instances or {}
@@ -0,0 +1,162 @@
+from cluster.Admission import Admission
+from cluster.resources import Node, Pod
+import asyncio, random, time
+import pytest
+
+
+def pods(names, cpu=0.5, ram=0.5):
+    return [Pod({"name": x, "namespace": "default", "CPU": cpu, "RAM": ram, "status": "Pending"}) for x in names]
+
+
+def arrive(admission, times, prefix="p"):
+    """按times依次到达，每次到达后待调度pod为此前到达的全部pod"""
+    names = []
+    for i, t in enumerate(times):
+        names.append(f"{prefix}{i}")
+        last = admission.observe_pending(pods(names), now=t)
+    return last
+
+
+@pytest.mark.parametrize("latency, window", [(1, 0.5), (90, 9.0), (120, 12.0), (1000, 15)])
+def test_window_follows_provision_latency_within_bounds(latency, window):
+    admission = Admission(default_latency=latency)
+    assert admission.window == pytest.approx(window)
+
+
+def test_window_widens_and_shrinks_with_observed_provisioning():
+    admission = Admission(alpha=0.5, default_latency=40)
+    assert admission.window == pytest.approx(4)
+    admission.observe_provision(120)
+    assert admission.window == pytest.approx(8)
+    admission.observe_provision(20)
+    assert admission.window == pytest.approx(5)
+
+
+def test_arrival_rate_counts_new_pods_within_horizon():
+    admission = Admission(horizon=10)
+    arrive(admission, [0, 1, 2, 3])
+    assert admission.arrival_rate == pytest.approx(0.4)
+
+    # 仍在等待的pod不重复计为到达
+    admission.observe_pending(pods(["p0", "p1", "p2", "p3"]), now=5)
+    assert admission.arrival_rate == pytest.approx(0.4)
+
+    # 超出horizon的到达被淘汰
+    admission.observe_pending(pods(["p0", "p1", "p2", "p3"]), now=12.5)
+    assert admission.arrival_rate == pytest.approx(0.1)
+
+
+def test_faster_arrivals_close_the_window_sooner():
+    slow, fast = Admission(horizon=10, max_wait=30, default_latency=200), Admission(horizon=10, max_wait=30, default_latency=200)
+    last_slow = arrive(slow, [0, 0])
+    last_fast = arrive(fast, [i / 20 for i in range(20)])
+
+    # 窗口上限为20秒；0.2个/秒时约10秒无新pod才关闭，2个/秒时约1秒
+    wait_slow = slow.remaining(0, last_slow, 2, False, now=last_slow)
+    wait_fast = fast.remaining(0, last_fast, 20, False, now=last_fast)
+    assert wait_slow == pytest.approx(10)
+    assert wait_fast == pytest.approx(1)
+    assert wait_fast < wait_slow <= slow.window
+
+
+def test_new_arrival_extends_the_window_up_to_the_deadline():
+    admission = Admission(horizon=10, max_wait=30, default_latency=200)
+    last = arrive(admission, [0, 0.5, 1])
+    before = admission.remaining(0, last, 3, False, now=5)
+
+    names = ["p0", "p1", "p2", "p3"]
+    last = admission.observe_pending(pods(names), now=5)
+    after = admission.remaining(0, last, 4, False, now=5)
+    assert after > before
+
+    # 持续到达也不会超过窗口长度
+    for i, t in enumerate(range(6, 20), start=4):
+        names.append(f"p{i}")
+        last = admission.observe_pending(pods(names), now=t)
+    assert admission.remaining(0, last, len(names), False, now=19) == pytest.approx(1)
+    assert admission.remaining(0, last, len(names), False, now=21) <= 0
+
+
+def test_closes_at_max_batch_or_when_existing_nodes_fit():
+    admission = Admission(max_batch=10, default_latency=200)
+    last = arrive(admission, range(3))
+    assert admission.remaining(0, last, 9, False, now=3) > 0
+    assert admission.remaining(0, last, 10, False, now=3) == 0
+    assert admission.remaining(0, last, 3, True, now=3) == 0
+    # 没有待调度pod时等待一个完整窗口
+    assert admission.remaining(0, None, 0, False, now=3) == admission.window
+
+
+def test_collect_flushes_at_max_batch():
+    admission = Admission(max_batch=5, max_wait=10, default_latency=1000)
+    batch = pods([f"p{i}" for i in range(7)])
+
+    async def run():
+        start = time.monotonic()
+        got = await admission.collect(asyncio.Event(), lambda: batch, lambda x: False)
+        return got, time.monotonic() - start
+
+    got, elapsed = asyncio.run(run())
+    assert got == batch
+    assert elapsed < 0.5
+
+
+def test_collect_flushes_at_max_wait():
+    admission = Admission(min_wait=0.01, max_wait=0.1, default_latency=1000)
+    batch = pods(["p0", "p1"])
+
+    async def run():
+        start = time.monotonic()
+        got = await admission.collect(asyncio.Event(), lambda: batch, lambda x: False)
+        return got, time.monotonic() - start
+
+    got, elapsed = asyncio.run(run())
+    assert got == batch
+    assert 0.1 <= elapsed < 1
+
+
+def test_no_pod_is_dropped_or_duplicated_across_flushes():
+    admission = Admission(min_wait=0.005, max_wait=0.03, max_batch=25, default_latency=1000)
+    rnd = random.Random(7)
+    pending, produced, batches = {}, [], []
+
+    async def producer(wake):
+        for i in range(300):
+            name = f"pod-{i}"
+            pending[name] = pods([name])[0]
+            produced.append(name)
+            wake.set()
+            if rnd.random() < 0.3:
+                await asyncio.sleep(rnd.choice([0, 0.001, 0.01, 0.04]))
+
+    async def consumer(wake, done):
+        while not (done.is_set() and not pending):
+            batch = await admission.collect(wake, lambda: list(pending.values()), lambda x: False)
+            if batch:
+                batches.append([x.name for x in batch])
+            # 模拟绑定成功：本批pod不再待调度
+            for pod in batch:
+                pending.pop(pod.name, None)
+
+    async def run():
+        wake, done = asyncio.Event(), asyncio.Event()
+        task = asyncio.create_task(consumer(wake, done))
+        await producer(wake)
+        done.set()
+        wake.set()
+        await asyncio.wait_for(task, timeout=30)
+
+    asyncio.run(run())
+
+    flushed = [x for batch in batches for x in batch]
+    assert sorted(flushed) == sorted(produced)
+    assert len(flushed) == len(set(flushed))
+    assert len(batches) > 1
+
+
+def test_fits_free():
+    node = Node("worker-1", {"type": "e2-medium", "CPU": 2, "RAM": 4, "status": "Ready"})
+    other = Node("worker-2", {"type": "e2-medium", "CPU": 1, "RAM": 1, "status": "Ready"})
+    assert Admission.fits_free(pods(["a", "b"]), [node])
+    assert not Admission.fits_free(pods(["a"], cpu=3), [node, other])
+    assert not Admission.fits_free(pods([f"p{i}" for i in range(7)]), [node])
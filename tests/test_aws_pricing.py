@@ -0,0 +1,92 @@
+from cloud_platform.AWS_Pricing import AWS_Pricing
+from cloud_platform.Json_Stream import Truncated_Json
+import json, os, threading
+import pytest
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "aws-offer.json")
+EXPECTED = {"m5.large": (2, 8, 0.12), "m5.xlarge": (4, 16, 0.24), "c5.large": (2, 4, 0.111),
+            "t3.medium": (2, 4, 0.0528), "r5.large": (2, 16, 0.151), "r5.xlarge": (4, 32, 0.302)}
+# 1个字符时每个token都跨块；1 << 20为缺省值，整个fixture在一块内
+CHUNK_SIZES = [1, 7, 64, 1 << 20]
+
+
+@pytest.fixture
+def flavors(tmp_path):
+    fp = tmp_path / "flavors.json"
+    fp.write_text(json.dumps({"aws": list(EXPECTED) + ["m5.2xlarge"]}))
+    return str(fp)
+
+
+def make_model(flavors, offer_file, chunk_size=1 << 20):
+    model = AWS_Pricing(offer_file=offer_file, chunk_size=chunk_size)
+    model.setup(flavors)
+    return model
+
+
+def table(model):
+    return {k: (v["CPU"], v["RAM"], v["price"]) for k, v in model.machine2price_cache.items()}
+
+
+def write_prefix(tmp_path, fraction):
+    with open(FIXTURE, "r") as f:
+        text = f.read()
+    fp = tmp_path / f"offer-{fraction}.json"
+    fp.write_text(text[:int(len(text) * fraction)])
+    return str(fp)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_fixture_is_parsed(flavors, tmp_path, chunk_size):
+    model = make_model(flavors, FIXTURE, chunk_size)
+    model.refresh(str(tmp_path / "pricing.json"), threading.Lock())
+
+    assert table(model) == EXPECTED
+    assert model.version == 1
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("fraction", [0.3, 0.6, 0.9, 0.999])
+def test_truncated_offer_file_keeps_previous_pricing(flavors, tmp_path, fraction, chunk_size):
+    pricing_json = str(tmp_path / "pricing.json")
+    model = make_model(flavors, FIXTURE, chunk_size)
+    model.refresh(pricing_json, threading.Lock())
+    with open(pricing_json) as f:
+        exported = f.read()
+
+    model.offer_file = write_prefix(tmp_path, fraction)
+    with pytest.raises(Truncated_Json):
+        model.refresh(pricing_json, threading.Lock())
+
+    assert table(model) == EXPECTED
+    assert model.version == 1
+    with open(pricing_json) as f:
+        assert f.read() == exported
+
+
+def test_empty_or_much_smaller_table_is_rejected(flavors, tmp_path):
+    pricing_json = str(tmp_path / "pricing.json")
+    model = make_model(flavors, FIXTURE)
+    model.refresh(pricing_json, threading.Lock())
+
+    with open(FIXTURE) as f:
+        offer = json.load(f)
+    kept = {k: v for k, v in offer["products"].items() if v["attributes"].get("instanceType") == "t3.medium"}
+    smaller = tmp_path / "smaller.json"
+    smaller.write_text(json.dumps({**offer, "products": kept}))
+    empty = tmp_path / "empty.json"
+    empty.write_text(json.dumps({**offer, "products": {}}))
+
+    for fp in (smaller, empty):
+        model.offer_file = str(fp)
+        with pytest.raises(ValueError):
+            model.refresh(pricing_json, threading.Lock())
+        assert table(model) == EXPECTED
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_first_refresh_rejects_truncated_file(flavors, tmp_path, chunk_size):
+    model = make_model(flavors, write_prefix(tmp_path, 0.5), chunk_size)
+    with pytest.raises(Truncated_Json):
+        model.refresh(str(tmp_path / "pricing.json"), threading.Lock())
+    assert table(model) == {}
+    assert not os.path.exists(tmp_path / "pricing.json")
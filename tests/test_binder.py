@@ -0,0 +1,149 @@
+from types import SimpleNamespace
+from cluster import Binder
+from cluster.Binder import Pod_Binder
+from cluster.resources import Pod
+from k8s_objects import ApiException
+import asyncio, threading
+import pytest
+
+
+class Fake_Response:
+    def __init__(self):
+        self.released = False
+
+    def release_conn(self):
+        self.released = True
+
+
+class Fake_Core:
+    """
+    create_namespaced_pod_binding按pod名依次取出预设的结果：异常实例直接抛出，否则成功
+    没有预设结果的pod一次成功
+    """
+    def __init__(self, outcomes=None):
+        self.outcomes = {k: list(v) for k, v in (outcomes or {}).items()}
+        self.calls = []
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def create_namespaced_pod_binding(self, name, namespace, body, _preload_content=True):
+        with self.lock:
+            self.calls.append((name, namespace, body.target.name, _preload_content))
+            pending = self.outcomes.get(name)
+            outcome = pending.pop(0) if pending else None
+            if isinstance(outcome, Exception):
+                raise outcome
+            resp = Fake_Response()
+            self.responses.append(resp)
+            return resp
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    monkeypatch.setattr(Binder, "client", SimpleNamespace(ApiException=ApiException))
+    delays = []
+    monkeypatch.setattr(Binder.time, "sleep", delays.append)
+    return delays
+
+
+def plain_binding(pod, node_name):
+    return SimpleNamespace(target=SimpleNamespace(name=node_name))
+
+
+def make_binder(core, **kwargs):
+    return Pod_Binder(core, binding_factory=plain_binding, **kwargs)
+
+
+def pod(name):
+    return Pod({"name": name, "namespace": "default", "CPU": 0.5, "RAM": 0.5, "status": "Pending"})
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_throttling_and_server_errors_with_backoff(sleeps, status):
+    core = Fake_Core({"web-1": [ApiException(status), ApiException(status)]})
+    result = make_binder(core, backoff=0.5).bind(pod("web-1"), "worker-1")
+
+    assert result.success and result.attempts == 3 and result.error is None
+    assert sleeps == [0.5, 1.0]
+    assert len(core.calls) == 3
+    assert all(x[3] is False for x in core.calls)
+
+
+@pytest.mark.parametrize("status", [400, 403, 404, 409, 422])
+def test_does_not_retry_other_client_errors(sleeps, status):
+    core = Fake_Core({"web-1": [ApiException(status)]})
+    result = make_binder(core).bind(pod("web-1"), "worker-1")
+
+    assert not result.success
+    assert result.attempts == 1
+    assert result.error.status == status
+    assert sleeps == []
+    assert len(core.calls) == 1
+
+
+def test_retries_network_errors(sleeps):
+    core = Fake_Core({"web-1": [ConnectionResetError("reset"), TimeoutError("timed out")]})
+    result = make_binder(core, backoff=0.1).bind(pod("web-1"), "worker-1")
+
+    assert result.success and result.attempts == 3
+    assert sleeps == [0.1, 0.2]
+
+
+def test_gives_up_after_max_retries(sleeps):
+    core = Fake_Core({"web-1": [ApiException(503)] * 10})
+    result = make_binder(core, max_retries=2, backoff=1).bind(pod("web-1"), "worker-1")
+
+    assert not result.success
+    assert result.attempts == 3
+    assert result.error.status == 503
+    assert sleeps == [1, 2]
+
+
+def test_releases_every_response(sleeps):
+    core = Fake_Core()
+    make_binder(core).bind_all([(pod(f"web-{i}"), "worker-1") for i in range(5)])
+
+    assert len(core.responses) == 5
+    assert all(x.released for x in core.responses)
+
+
+def test_default_binding_body_targets_node(sleeps, monkeypatch):
+    built = {}
+    monkeypatch.setattr(Binder, "client", SimpleNamespace(
+        ApiException=ApiException,
+        V1Binding=lambda **kwargs: SimpleNamespace(**kwargs),
+        V1ObjectReference=lambda **kwargs: SimpleNamespace(**kwargs),
+        V1ObjectMeta=lambda **kwargs: built.setdefault("meta", SimpleNamespace(**kwargs))))
+    core = Fake_Core()
+    assert Pod_Binder(core).bind(pod("web-1"), "worker-1").success
+
+    assert core.calls == [("web-1", "default", "worker-1", False)]
+    assert (built["meta"].name, built["meta"].namespace) == ("web-1", "default")
+
+
+def assignments_and_core():
+    assignments = [(pod(f"web-{i}"), f"worker-{i % 3}") for i in range(20)]
+    core = Fake_Core({"web-3": [ApiException(404)], "web-7": [ApiException(429)], "web-11": [OSError("eof")]})
+    return assignments, core
+
+
+def check_results(assignments, results):
+    assert [(x.pod, x.node_name) for x in results] == assignments
+    assert [x.pod.name for x in results if not x.success] == ["web-3"]
+    assert {x.pod.name: x.attempts for x in results if x.attempts > 1} == {"web-7": 2, "web-11": 2}
+
+
+def test_bind_all_returns_one_result_per_pod_in_order(sleeps):
+    assignments, core = assignments_and_core()
+    results = make_binder(core, max_workers=4).bind_all(assignments)
+
+    check_results(assignments, results)
+    assert make_binder(core).bind_all([]) == []
+
+
+def test_bind_all_async_returns_one_result_per_pod_in_order(sleeps):
+    assignments, core = assignments_and_core()
+    results = asyncio.run(make_binder(core).bind_all_async(assignments))
+
+    check_results(assignments, results)
+    assert asyncio.run(make_binder(core).bind_all_async([])) == []
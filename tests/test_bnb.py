@@ -0,0 +1,87 @@
+from collections import Counter
+from cluster.resources import Node, Pod
+from cloud_platform.Static_Pricing import Static_Pricing
+from optimizer.BnB import BnB
+from optimizer.CABFD import CABFD
+import os, random
+import pytest
+
+SAMPLE_PRICING = os.path.join(os.path.dirname(__file__), os.pardir, "data", "sample-pricing.json")
+
+
+@pytest.fixture(scope="module")
+def pricing():
+    return Static_Pricing(SAMPLE_PRICING, "gcp")
+
+
+def random_trace(seed, size=(1, 40)):
+    rnd = random.Random(seed)
+    shapes = [(rnd.choice([0.1, 0.25, 0.5, 0.7, 1, 1.5]), rnd.choice([0.2, 0.5, 0.9, 1, 2, 3.3]))
+              for _ in range(rnd.randint(1, 4))]
+    pods = [Pod({"CPU": cpu, "RAM": ram, "status": "Pending"}, name=f"p{i}")
+            for i, (cpu, ram) in enumerate(rnd.choice(shapes) for _ in range(rnd.randint(*size)))]
+    nodes = []
+    for i in range(rnd.randint(0, 3)):
+        cpu = rnd.choice([2, 4])
+        node = Node(f"worker-{i}", {"type": "existing", "CPU": cpu, "RAM": 4.0 * cpu, "price": 0.05 * cpu,
+                                    "status": "Ready"})
+        node.add_pod(Pod({"CPU": rnd.choice([0, 0.5, 1]), "RAM": rnd.choice([0, 1, 2])}, name=f"running-{i}"))
+        nodes.append(node)
+    return pods, nodes
+
+
+def signature(schedule):
+    return [(x.name, x.type, sorted(p.name for p in x.pods)) for x in schedule]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_plan_is_valid_and_never_worse_than_cabfd(pricing, seed):
+    pods, nodes = random_trace(seed)
+    running = {id(p) for x in nodes for p in x.pods}
+    cabfd = CABFD(pricing).optimize(pods, [x.copy() for x in nodes])
+
+    schedule = BnB(pricing, time_budget=0.2).optimize(pods, [x.copy() for x in nodes])
+
+    assert BnB.plan_cost(schedule) <= CABFD.plan_cost(cabfd) + BnB.EPS
+    # 已有节点保持原顺序在前
+    assert [x.name for x in schedule[:len(nodes)]] == [x.name for x in nodes]
+    for node in schedule:
+        assert node.occupied_cpu <= node.cpu + 1e-6
+        assert node.occupied_memory <= node.memory + 1e-6
+    placed = Counter(id(p) for x in schedule for p in x.pods if id(p) not in running)
+    assert placed == Counter(id(p) for p in pods)
+
+
+def test_tolerates_accumulated_rounding(pricing):
+    # 5 * 0.7 + 5 * 0.1累加后略大于4.0，容差内仍应放进一台4核机型，比CABFD的方案便宜
+    pods = [Pod({"CPU": cpu, "RAM": 0.1}, name=f"p{i}") for i, cpu in enumerate([0.7] * 5 + [0.1] * 5)]
+    cabfd = CABFD(pricing).optimize(pods, [])
+
+    schedule = BnB(pricing).optimize(pods, [])
+
+    assert [(x.name, x.type, len(x.pods)) for x in schedule] == [("created", "e2-standard-4", 10)]
+    assert BnB.plan_cost(schedule) < CABFD.plan_cost(cabfd)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_falls_back_to_cabfd_above_max_pods(pricing, seed):
+    pods, nodes = random_trace(seed)
+    expected = CABFD(pricing).optimize(pods, [x.copy() for x in nodes])
+
+    schedule = BnB(pricing, max_pods=0).optimize(pods, [x.copy() for x in nodes])
+
+    assert signature(schedule) == signature(expected)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_falls_back_to_cabfd_when_time_budget_is_spent(pricing, seed, caplog):
+    # 超过255个pod时第一个完整解之前就会检查截止时间，预算为0时搜索不产生任何解
+    pods, nodes = random_trace(seed, size=(300, 400))
+    expected = CABFD(pricing).optimize(pods, [x.copy() for x in nodes])
+
+    with caplog.at_level("INFO", logger="optimizer.BnB"):
+        schedule = BnB(pricing, time_budget=0, max_pods=1000).optimize(pods, [x.copy() for x in nodes])
+
+    assert "BnB搜索超时" in caplog.text
+    assert signature(schedule) == signature(expected)
+
@@ -0,0 +1,131 @@
+from cloud_platform import Bootstrap
+from cloud_platform.Bootstrap import build_worker_script, run_script_over_ssh
+import io, os, shutil, subprocess
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which("bash") is None, reason="需要bash")
+
+
+class Local_Sftp:
+    """paramiko.SFTPClient的本地替身，上传的文件写入本机"""
+    def __init__(self, uploads):
+        self.uploads = uploads
+
+    def putfo(self, fo, remote_path):
+        with open(remote_path, "wb") as f:
+            f.write(fo.read())
+        self.uploads.append(remote_path)
+
+    def chmod(self, remote_path, mode):
+        os.chmod(remote_path, mode)
+
+    def close(self):
+        pass
+
+
+class Local_Channel:
+    def __init__(self, process):
+        self.process = process
+
+    def recv_exit_status(self):
+        return self.process.wait()
+
+
+class Local_Stdout(io.TextIOWrapper):
+    channel = None
+
+
+class Local_Ssh:
+    """
+    paramiko.SSHClient的本地替身：命令在本机的bash中执行
+    PATH中的sudo是一个直接执行其参数的脚本
+    """
+    def __init__(self, bin_dir):
+        self.bin_dir = bin_dir
+        self.uploads = []
+        self.commands = []
+
+    def open_sftp(self):
+        return Local_Sftp(self.uploads)
+
+    def exec_command(self, command):
+        self.commands.append(command)
+        env = dict(os.environ, PATH=f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        process = subprocess.Popen(["bash", "-c", command], stdout=subprocess.PIPE, env=env)
+        stdout = Local_Stdout(process.stdout, encoding="utf-8")
+        stdout.channel = Local_Channel(process)
+        return None, stdout, None
+
+
+@pytest.fixture
+def ssh(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    sudo = bin_dir / "sudo"
+    sudo.write_text('#!/bin/sh\nexec "$@"\n')
+    sudo.chmod(0o755)
+    return Local_Ssh(bin_dir)
+
+
+@pytest.fixture
+def steps(monkeypatch, tmp_path):
+    """与WORKER_STEPS结构相同、只在tmp_path中操作的步骤"""
+    root = tmp_path / "node"
+    root.mkdir()
+    worker_steps = [
+        ("hostname", f'echo "$NODE_NAME" > {root}/hostname'),
+        ("config", f'''
+mkdir -p {root}/etc
+[ -f {root}/etc/config.toml ] || echo "SystemdCgroup = false" > {root}/etc/config.toml
+sed -i 's/SystemdCgroup = false/SystemdCgroup = true/' {root}/etc/config.toml
+'''),
+        ("kubeadm-join", f'''
+if [ -f {root}/kubelet.conf ]; then
+  echo "节点已加入集群，跳过kubeadm join"
+else
+  $JOIN_COMMAND
+fi
+'''),
+    ]
+    monkeypatch.setattr(Bootstrap, "WORKER_STEPS", worker_steps)
+    return root
+
+
+def fake_kubeadm(ssh, body):
+    """PATH中的kubeadm替身，JOIN_COMMAND按单词展开执行，与真实的kubeadm join命令一样不含引号"""
+    kubeadm = ssh.bin_dir / "kubeadm"
+    kubeadm.write_text("#!/bin/sh\n" + body)
+    kubeadm.chmod(0o755)
+    return "kubeadm join 10.0.0.1:6443 --token abc"
+
+
+def test_script_is_uploaded_and_rerun_idempotently(ssh, steps, tmp_path):
+    remote = str(tmp_path / "bootstrap.sh")
+    join = fake_kubeadm(ssh, f"echo joined >> {steps}/joins\ntouch {steps}/kubelet.conf\n")
+    script = build_worker_script(join_command=join)
+
+    run_script_over_ssh(ssh, script, "worker-1", remote_path=remote)
+    run_script_over_ssh(ssh, script, "worker-1", remote_path=remote)
+
+    assert ssh.uploads == [remote, remote]
+    assert os.access(remote, os.X_OK)
+    assert len(ssh.commands) == 2 and all(c.startswith("sudo env NODE_NAME=worker-1 ") for c in ssh.commands)
+    assert (steps / "hostname").read_text() == "worker-1\n"
+    assert (steps / "etc" / "config.toml").read_text() == "SystemdCgroup = true\n"
+    # 第二次执行跳过kubeadm join
+    assert (steps / "joins").read_text() == "joined\n"
+
+
+def test_failed_step_is_reported(ssh, steps, tmp_path):
+    script = build_worker_script(join_command=fake_kubeadm(ssh, "echo token expired\nexit 3\n"))
+
+    with pytest.raises(RuntimeError) as e:
+        run_script_over_ssh(ssh, script, "worker-2", remote_path=str(tmp_path / "bootstrap.sh"))
+
+    message = str(e.value)
+    assert "3 kubeadm-join" in message
+    assert "Exit code 3" in message
+    assert "token expired" in message
+    # 失败之前的步骤已经完成，失败标记不会混入输出
+    assert (steps / "hostname").read_text() == "worker-2\n"
+    assert "##FAILED" not in message
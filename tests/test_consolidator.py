@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+from cluster import Consolidator as consolidator_module, Monitor
+from cluster.Consolidator import Consolidator
+from cluster.Monitor import K8s_Monitor
+from k8s_objects import ApiException, Fake_Gcp_Manager, make_node, make_pod, object_list
+import time
+import pytest
+
+
+class Fake_Core:
+    """
+    被驱逐的pod先进入Terminating，经过grace_polls次列出后才真正删除
+    list_namespaced_pod只返回default命名空间，与informer看到的一致
+    """
+    def __init__(self, nodes, pods, grace_polls=2):
+        self.nodes = nodes
+        self.pods = pods
+        self.grace_polls = grace_polls
+        self.calls = []
+        self._terminating = {}
+
+    def list_node(self, **kwargs):
+        return object_list(self.nodes)
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        return object_list([x for x in self.pods if x.metadata.namespace == namespace])
+
+    def list_pod_for_all_namespaces(self, field_selector):
+        node = field_selector.split("=", 1)[1]
+        self.calls.append(("list", node))
+        for key in list(self._terminating):
+            self._terminating[key] -= 1
+            if self._terminating[key] < 0:
+                del self._terminating[key]
+                self.pods = [x for x in self.pods if (x.metadata.namespace, x.metadata.name) != key]
+        return object_list([x for x in self.pods if x.spec.node_name == node])
+
+    def create_namespaced_pod_eviction(self, name, namespace, body):
+        self.calls.append(("evict", namespace, name))
+        pod = next(x for x in self.pods if (x.metadata.namespace, x.metadata.name) == (namespace, name))
+        pod.metadata.deletion_timestamp = "now"
+        self._terminating[(namespace, name)] = self.grace_polls
+
+    def patch_node(self, name, body):
+        self.calls.append(("patch", name, body["spec"]["unschedulable"]))
+
+    def delete_node(self, name):
+        self.calls.append(("delete", name))
+
+
+class Fake_Manager(Fake_Gcp_Manager):
+    def delete_node(self, name):
+        self.instances.pop(name)
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    fake = SimpleNamespace(ApiException=ApiException, V1Eviction=SimpleNamespace, V1ObjectMeta=SimpleNamespace)
+    monkeypatch.setattr(Monitor, "client", fake)
+    monkeypatch.setattr(consolidator_module, "client", fake)
+
+
+def build(pods):
+    created = time.time() - 7200
+    core = Fake_Core([make_node("worker-1", created_at=created), make_node("worker-2", created_at=created)], pods)
+    manager = Fake_Manager({x: SimpleNamespace(type="e2-medium", externalIP=None) for x in ("worker-1", "worker-2")})
+    monitor = K8s_Monitor(gcp_manager=manager)
+    monitor._core_v1 = core
+    monitor.refresh()
+    scheduler = SimpleNamespace(_get_available_node=lambda snapshot: snapshot.fork_nodes())
+    pricing = SimpleNamespace(machine2price_cache={"e2-medium": {"price": 0.03}})
+    return core, Consolidator(monitor, manager, scheduler, pricing, poll_interval=0)
+
+
+def running(name, namespace="default", node="worker-1", **kwargs):
+    return make_pod(name, cpu="250m", phase="Running", node=node, namespace=namespace, **kwargs)
+
+
+def test_drain_covers_all_namespaces_and_waits_for_termination():
+    core, consolidator = build([
+        running("web"),
+        running("coredns", namespace="kube-system"),
+        running("fluentd", namespace="kube-system", controller="DaemonSet"),
+        running("kube-proxy", namespace="kube-system", controller="Node",
+                annotations={Consolidator.MIRROR_ANNOTATION: "hash"}),
+        running("db", node="worker-2"),
+    ])
+
+    assert consolidator.run_once() == ["worker-1"]
+
+    evictions = [x for x in core.calls if x[0] == "evict"]
+    assert sorted(evictions) == [("evict", "default", "web"), ("evict", "kube-system", "coredns")]
+    delete = core.calls.index(("delete", "worker-1"))
+    # 删除节点之前至少列出了grace_polls + 1次，直到被驱逐的pod都已删除
+    lists_after_evict = [x for x in core.calls[core.calls.index(evictions[-1]):delete] if x[0] == "list"]
+    assert len(lists_after_evict) == core.grace_polls + 1
+    assert not any(x.metadata.name in ("web", "coredns") for x in core.pods)
+
+
+def test_bare_pod_in_another_namespace_blocks_removal():
+    core, consolidator = build([
+        running("web"),
+        running("debug", namespace="kube-system", controller=None),
+        running("pinned", node="worker-2", controller=None),
+    ])
+
+    assert consolidator.plan() == []
+    assert consolidator.run_once() == []
+    assert not any(x[0] in ("evict", "delete", "patch") for x in core.calls)
+
+
+def test_pod_scheduled_after_planning_aborts_drain():
+    core, consolidator = build([running("web"), running("pinned", node="worker-2", controller=None)])
+    assert consolidator.plan() == ["worker-1"]
+
+    core.pods.append(running("late", namespace="batch", controller=None))
+    assert consolidator._drain("worker-1") is False
+    assert ("patch", "worker-1", False) in core.calls
+    assert not any(x[0] == "evict" for x in core.calls)
+
+
+def test_planning_does_not_cache_pods_outside_the_watched_namespace():
+    core, consolidator = build([
+        running("web"),
+        running("coredns", namespace="kube-system"),
+        running("pinned", node="worker-2", controller=None),
+    ])
+    watched = set(consolidator.k8s_monitor._requests_cache)
+
+    assert consolidator.plan() == ["worker-1"]
+
+    assert set(consolidator.k8s_monitor._requests_cache) == watched
+    assert "uid-kube-system-coredns" not in watched
@@ -0,0 +1,54 @@
+from cloud_platform.Flavor_Index import Flavor_Index
+import pytest
+
+
+def spec(cpu, ram, price):
+    return {"CPU": cpu, "RAM": ram, "price": price}
+
+
+@pytest.fixture
+def index():
+    return Flavor_Index({
+        "small": spec(2, 8, 0.10),
+        "small-premium": spec(2, 8, 0.12),    # 同规格更贵
+        "small-twin": spec(2, 8, 0.10),       # 同规格同价，按机型名保留small
+        "tiny-expensive": spec(1, 4, 0.11),   # 更小且更贵
+        "highmem": spec(2, 16, 0.13),
+        "large": spec(4, 16, 0.20),
+        "large-lowmem": spec(4, 8, 0.20),     # 同价但RAM更少
+        "xlarge": spec(8, 32, 0.40),
+    })
+
+
+def test_dominated_and_duplicate_flavors_are_pruned(index):
+    assert [f.type for f in index] == ["small", "highmem", "large", "xlarge"]
+    assert index.get("small").price == 0.10
+    assert index.get("small-premium") is None
+
+
+def test_no_pruning_keeps_everything_sorted():
+    index = Flavor_Index({"b": spec(2, 8, 0.2), "a": spec(2, 8, 0.1), "c": spec(1, 4, 0.3)}, prune=False)
+    assert [(f.type, f.cpu) for f in index] == [("c", 1), ("a", 2), ("b", 2)]
+
+
+def test_merge_keeps_cheapest_provider_for_same_shape():
+    gcp = Flavor_Index({"e2-standard-2": spec(2, 8, 0.067)}, provider="gcp")
+    aws = Flavor_Index({"m5.large": spec(2, 8, 0.12), "t3.medium": spec(2, 4, 0.0528)}, provider="aws")
+    merged = Flavor_Index.merge([gcp, aws])
+    assert [(f.type, f.provider) for f in merged] == [("t3.medium", "aws"), ("e2-standard-2", "gcp")]
+    assert merged.providers == ["aws", "gcp"]
+
+
+@pytest.mark.parametrize("cpu, ram, expected", [
+    (2, 8, ["small", "highmem", "large", "xlarge"]),     # 恰好等于容量
+    (2, 16, ["highmem", "large", "xlarge"]),
+    (2, 16.000001, ["xlarge"]),
+    (2.000001, 8, ["large", "xlarge"]),
+    (4, 16, ["large", "xlarge"]),
+    (8, 32, ["xlarge"]),
+    (8, 32.5, []),
+    (0, 0, ["small", "highmem", "large", "xlarge"]),
+])
+def test_fit_indices_at_capacity_boundaries(index, cpu, ram, expected):
+    assert [index[i].type for i in index.fit_indices(cpu, ram)] == expected
+    assert [f.type for f in index.fits(cpu, ram)] == expected
@@ -0,0 +1,81 @@
+from telemetry.Metrics import Registry
+import urllib.request
+import pytest
+
+
+@pytest.fixture
+def registry():
+    registry = Registry()
+    yield registry
+    registry.shutdown()
+
+
+def test_histogram_buckets_sum_and_count(registry):
+    latency = registry.histogram("phase_seconds", "各阶段耗时", ["phase"], buckets=(0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 3, 20):
+        latency.observe(value, phase="bind")
+
+    assert registry.render().splitlines() == [
+        "# HELP phase_seconds 各阶段耗时",
+        "# TYPE phase_seconds histogram",
+        # le为上界（含），计数逐桶累加，+Inf桶等于总数
+        'phase_seconds_bucket{phase="bind",le="0.1"} 2',
+        'phase_seconds_bucket{phase="bind",le="1"} 3',
+        'phase_seconds_bucket{phase="bind",le="10"} 4',
+        'phase_seconds_bucket{phase="bind",le="+Inf"} 5',
+        'phase_seconds_sum{phase="bind"} 23.65',
+        'phase_seconds_count{phase="bind"} 5',
+    ]
+
+
+def test_histogram_without_labels_and_empty_metrics(registry):
+    registry.counter("nodes_total", "新建节点数", ["type"])
+    size = registry.histogram("batch_size", "批大小", buckets=(1, 5))
+    size.observe(3)
+
+    assert registry.render() == "\n".join([
+        "# HELP nodes_total 新建节点数",
+        "# TYPE nodes_total counter",
+        "# HELP batch_size 批大小",
+        "# TYPE batch_size histogram",
+        'batch_size_bucket{le="1"} 0',
+        'batch_size_bucket{le="5"} 1',
+        'batch_size_bucket{le="+Inf"} 1',
+        "batch_size_sum 3.0",
+        "batch_size_count 1",
+    ]) + "\n"
+
+
+def test_counter_and_gauge_samples(registry):
+    errors = registry.counter("api_errors_total", "API错误", ["api"])
+    window = registry.gauge("window_seconds", "窗口长度")
+    errors.inc(api="gce")
+    errors.inc(2, api="gce")
+    errors.inc(api="k8s_bind")
+    window.set(4.5)
+
+    lines = registry.render().splitlines()
+    assert 'api_errors_total{api="gce"} 3' in lines
+    assert 'api_errors_total{api="k8s_bind"} 1' in lines
+    assert "window_seconds 4.5" in lines
+
+
+def test_label_values_and_help_are_escaped(registry):
+    errors = registry.counter("errors_total", 'line one\nsays "C:\\path"', ["reason"])
+    errors.inc(reason='quote " backslash \\ newline \n end')
+
+    lines = registry.render().splitlines()
+    # HELP只转义反斜杠和换行，标签值还要转义双引号
+    assert lines[0] == '# HELP errors_total line one\\nsays "C:\\\\path"'
+    assert lines[2] == 'errors_total{reason="quote \\" backslash \\\\ newline \\n end"} 1'
+
+
+def test_serve_binds_localhost_by_default(registry):
+    registry.counter("up_total", "存活").inc()
+    server = registry.serve(0)
+    host, port = server.server_address[:2]
+    assert host == "127.0.0.1"
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "up_total 1" in resp.read().decode().splitlines()
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+from cluster import Monitor
+from cluster.Monitor import K8s_Monitor
+from k8s_objects import (ApiException, Fake_Gcp_Manager, Fake_Watch_Module, bookmark, event, make_node,
+                         make_pod, object_list)
+import pytest
+
+
+class Fake_Core:
+    def __init__(self, nodes=(), pods=()):
+        self.nodes = list(nodes)
+        self.pods = list(pods)
+        self.lists = 0
+
+    def list_node(self, **kwargs):
+        self.lists += 1
+        return object_list(self.nodes, rv="100")
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        self.lists += 1
+        return object_list(self.pods, rv="100")
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(Monitor, "client", SimpleNamespace(ApiException=ApiException))
+    m = K8s_Monitor(gcp_manager=Fake_Gcp_Manager())
+    m._core_v1 = Fake_Core(nodes=[make_node("worker-1")])
+    m.refresh()
+    return m
+
+
+def use_watch(monkeypatch, monitor, streams):
+    fake = Fake_Watch_Module(streams, on_exhausted=monitor._stop.set)
+    monkeypatch.setattr(Monitor, "watch", fake)
+    return fake
+
+
+def test_watch_loop_keeps_stream_open_across_bookmarks(monkeypatch, monitor):
+    fake = use_watch(monkeypatch, monitor, [[
+        bookmark("7"),
+        event("ADDED", make_pod("web-1", phase="Running", node="worker-1", rv="8")),
+        bookmark("9"),
+    ]])
+    monitor._watch_loop("pods")
+
+    # 只在事件耗尽后重连了一次，没有因为BOOKMARK中断
+    assert len(fake.calls) == 2
+    assert fake.calls[1]["resource_version"] == "9"
+    assert "web-1" in monitor.pod_cache
+    assert monitor.node_cache["worker-1"].occupied_cpu == 0.5
+
+
+def test_watch_loop_relists_on_410(monkeypatch, monitor):
+    fake = use_watch(monkeypatch, monitor, [ApiException(status=410, reason="Expired")])
+    monitor._core_v1.pods = [make_pod("web-1", phase="Running", node="worker-1")]
+    lists = monitor._core_v1.lists
+    monitor._watch_loop("pods")
+
+    assert monitor._core_v1.lists == lists + 2
+    assert "web-1" in monitor.pod_cache
+    assert fake.calls[1]["resource_version"] == "100"
+
+
+def test_bound_pods_occupy_their_node_before_running(monitor):
+    monitor._core_v1.pods = [
+        make_pod("bound", cpu="1500m", phase="Pending", node="worker-1"),
+        make_pod("done", cpu="1", phase="Succeeded", node="worker-1"),
+        make_pod("leaving", cpu="1", phase="Running", node="worker-1", deleting=True),
+    ]
+    monitor.refresh()
+    assert monitor.pod_cache["bound"].status == "Scheduled"
+    assert monitor.node_cache["worker-1"].occupied_cpu == 1.5
+
+    monitor._on_pod_event("ADDED", make_pod("next", cpu="250m", phase="Pending", node="worker-1", rv="2"))
+    monitor._on_pod_event("MODIFIED", make_pod("next", cpu="250m", phase="Running", node="worker-1", rv="3"))
+    assert monitor.node_cache["worker-1"].occupied_cpu == 1.75
+
+    monitor._on_pod_event("MODIFIED", make_pod("next", cpu="250m", phase="Succeeded", node="worker-1", rv="4"))
+    assert monitor.node_cache["worker-1"].occupied_cpu == 1.5
+
+
+def test_wait_node_ready_skips_bookmarks(monkeypatch, monitor):
+    monitor._core_v1.nodes = []
+    fake = use_watch(monkeypatch, monitor, [[
+        bookmark("101"),
+        event("ADDED", make_node("worker-2", ready=False, rv="102")),
+        bookmark("103"),
+        event("MODIFIED", make_node("worker-2", rv="104")),
+    ]])
+
+    assert monitor.wait_node_ready("worker-2", timeout=5)
+    assert len(fake.calls) == 1
+    assert fake.calls[0]["field_selector"] == "metadata.name=worker-2"
+    assert fake.calls[0]["resource_version"] == "100"
+    assert "worker-2" in monitor.node_cache
+
+
+def test_wait_node_ready_resumes_from_bookmark(monkeypatch, monitor):
+    monitor._core_v1.nodes = []
+    fake = use_watch(monkeypatch, monitor, [
+        [bookmark("150")],
+        [event("MODIFIED", make_node("worker-2", rv="151"))],
+    ])
+
+    assert monitor.wait_node_ready("worker-2", timeout=5)
+    assert [x["resource_version"] for x in fake.calls] == ["100", "150"]
@@ -0,0 +1,203 @@
+from types import SimpleNamespace
+from cloud_platform import NodeManage
+from cloud_platform.NodeManage import GCP_Manager
+from cluster.resources import Node
+import threading
+import pytest
+
+DONE, RUNNING = "DONE", "RUNNING"
+
+
+class GoogleAPICallError(Exception):
+    pass
+
+
+class NotFound(GoogleAPICallError):
+    pass
+
+
+class Forbidden(GoogleAPICallError):
+    pass
+
+
+def record(**kwargs):
+    return SimpleNamespace(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def fake_sdk(monkeypatch):
+    """compute_v1和google.api_core.exceptions的替身，请求对象只记录构造参数"""
+    compute = SimpleNamespace(
+        Operation=SimpleNamespace(Status=SimpleNamespace(DONE=DONE)),
+        **{name: record for name in ("ListInstancesRequest", "Instance", "AttachedDisk", "AttachedDiskInitializeParams",
+                                     "NetworkInterface", "AccessConfig", "Items", "Metadata", "ServiceAccount",
+                                     "BulkInsertInstanceResource", "BulkInsertInstanceResourcePerInstanceProperties",
+                                     "InstanceProperties")})
+    monkeypatch.setattr(NodeManage, "compute_v1", compute)
+    monkeypatch.setattr(NodeManage, "api_exceptions",
+                        SimpleNamespace(NotFound=NotFound, GoogleAPICallError=GoogleAPICallError))
+    monkeypatch.setattr(NodeManage.time, "sleep", lambda x: None)
+
+
+def make_operation(name, status="RUNNING", errors=()):
+    return SimpleNamespace(name=name, status=status,
+                           error=SimpleNamespace(errors=[SimpleNamespace(message=x) for x in errors]))
+
+
+def instance(name, status=RUNNING, no=0):
+    return SimpleNamespace(name=name, status=status, network_interfaces=[SimpleNamespace(
+        network_i_p=f"10.0.0.{no}", access_configs=[SimpleNamespace(nat_i_p=f"34.0.0.{no}")])])
+
+
+class Fake_Instances_Client:
+    """InstancesClient的替身：插入的实例立即存在，list按filter中的名字返回"""
+    def __init__(self, staging=(), get_errors=()):
+        self.calls = []
+        self.created = {}
+        self.staging = set(staging)
+        self.get_errors = list(get_errors)
+        self.lock = threading.Lock()
+
+    def _create(self, names):
+        with self.lock:
+            for name in names:
+                self.created[name] = len(self.created) + 1
+
+    def insert(self, project, zone, instance_resource):
+        self.calls.append(("insert", instance_resource.name))
+        self._create([instance_resource.name])
+        return make_operation(f"op-{instance_resource.name}")
+
+    def bulk_insert(self, project, zone, bulk_insert_instance_resource_resource):
+        resource = bulk_insert_instance_resource_resource
+        names = list(resource.per_instance_properties)
+        self.calls.append(("bulk_insert", resource.count, resource.instance_properties.machine_type, names))
+        self._create(names)
+        return make_operation(f"op-bulk-{names[0]}")
+
+    def list(self, request):
+        self.calls.append(("list", request.filter))
+        return [instance(name, "STAGING" if name in self.staging else RUNNING, no)
+                for name, no in self.created.items() if f'(name = "{name}")' in request.filter]
+
+    def get(self, project, zone, instance):
+        self.calls.append(("get", instance))
+        if self.get_errors:
+            raise self.get_errors.pop(0)
+        self.staging.discard(instance)
+        return SimpleNamespace(name=instance, status=RUNNING)
+
+
+class Fake_Operations_Client:
+    def __init__(self, errors=(), pending=1):
+        self.calls = []
+        self.errors = errors
+        self.pending = pending
+
+    def wait(self, project, zone, operation):
+        self.calls.append(operation)
+        done = len([x for x in self.calls if x == operation]) > self.pending
+        return make_operation(operation, DONE if done else "RUNNING", self.errors if done else ())
+
+
+def manager(instances=None, operations=None):
+    return GCP_Manager(instance_client=instances or Fake_Instances_Client(),
+                       operation_client=operations or Fake_Operations_Client())
+
+
+def nodes(n, type="e2-standard-2"):
+    return [Node("not-created", {"type": type, "CPU": 2, "RAM": 8}) for _ in range(n)]
+
+
+def test_launch_uses_one_bulk_insert_and_one_list():
+    m = manager()
+    launched = m.launch_instances(nodes(3))
+
+    assert [x.name for x in launched] == ["node-1", "node-2", "node-3"]
+    assert [(x.internalIP, x.externalIP) for x in launched] == \
+        [("10.0.0.1", "34.0.0.1"), ("10.0.0.2", "34.0.0.2"), ("10.0.0.3", "34.0.0.3")]
+    calls = m.instance_client.calls
+    assert calls[0] == ("bulk_insert", 3, "e2-standard-2", ["node-1", "node-2", "node-3"])
+    assert [x[0] for x in calls] == ["bulk_insert", "list"]
+    assert calls[1][1] == '(name = "node-1") OR (name = "node-2") OR (name = "node-3")'
+    # 服务端等待直到操作完成，不轮询实例
+    assert m.operation_client.calls == ["op-bulk-node-1", "op-bulk-node-1"]
+
+
+def test_launch_single_instance_uses_insert():
+    m = manager()
+    (node,) = m.launch_instances(nodes(1))
+
+    assert node.name == "node-1" and node.externalIP == "34.0.0.1"
+    assert [x[0] for x in m.instance_client.calls] == ["insert", "list"]
+
+
+def test_launch_rejects_mixed_types():
+    with pytest.raises(ValueError):
+        manager().launch_instances(nodes(1) + nodes(1, type="e2-standard-4"))
+
+
+def test_failed_operation_raises():
+    m = manager(operations=Fake_Operations_Client(errors=["QUOTA_EXCEEDED"]))
+    with pytest.raises(RuntimeError, match="QUOTA_EXCEEDED"):
+        m.launch_instances(nodes(2))
+
+
+def test_operation_wait_times_out(monkeypatch):
+    m = manager(operations=Fake_Operations_Client(pending=10 ** 9))
+    m.operation_timeout = 0
+    clock = iter(range(0, 10 ** 6, 5))
+    monkeypatch.setattr(NodeManage.time, "monotonic", lambda: next(clock))
+    with pytest.raises(TimeoutError):
+        m.launch_instances(nodes(1))
+
+
+def test_staging_instances_are_polled_then_described_once_more():
+    instances = Fake_Instances_Client(staging={"node-2"}, get_errors=[NotFound("not yet")])
+    m = manager(instances)
+    launched = m.launch_instances(nodes(2))
+
+    assert [x[0] for x in instances.calls] == ["bulk_insert", "list", "get", "get", "list"]
+    assert instances.calls[-1] == ("list", '(name = "node-2")')
+    assert launched[1].internalIP == "10.0.0.2"
+
+
+def test_wait_for_instance_ready_raises_other_api_errors():
+    m = manager(Fake_Instances_Client(get_errors=[Forbidden("denied")]))
+    with pytest.raises(Forbidden):
+        m.wait_for_instance_ready("node-1")
+
+
+def test_allocate_name_is_unique_under_concurrency():
+    m = manager()
+    m.instances["node-3"] = object()
+    names, lock = [], threading.Lock()
+
+    def allocate():
+        for _ in range(200):
+            name = m.allocate_name()
+            with lock:
+                names.append(name)
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(names) == len(set(names)) == 1600
+    assert "node-3" not in names
+
+
+def test_concurrent_launches_get_distinct_names():
+    m = manager()
+    batches = [nodes(2) for _ in range(6)]
+    threads = [threading.Thread(target=m.launch_instances, args=(x,)) for x in batches]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    names = [x.name for batch in batches for x in batch]
+    assert len(set(names)) == 12
+    assert all(x.externalIP is not None for batch in batches for x in batch)
@@ -0,0 +1,192 @@
+from types import SimpleNamespace
+from cloud_platform import GCP_Pricing as gcp_module
+from cloud_platform import Pricing_Model as model_module
+from cloud_platform.GCP_Pricing import GCP_Pricing
+import json, threading, time
+import pytest
+
+REGION = "australia-southeast1"
+MACHINES = [("e2-standard-2", 2, 8192), ("e2-standard-4", 4, 16384), ("n2-standard-2", 2, 8192)]
+
+
+def make_sku(sku_id, family, resource, price, effective="2026-01-01T00:00:00Z"):
+    word = "Core" if resource == "CPU" else "Ram"
+    return SimpleNamespace(
+        sku_id=sku_id, description=f"{family} Instance {word} running in Sydney",
+        category=SimpleNamespace(usage_type="OnDemand", resource_group=resource),
+        service_regions=[REGION],
+        pricing_info=[SimpleNamespace(effective_time=effective, pricing_expression=SimpleNamespace(
+            tiered_rates=[SimpleNamespace(unit_price=SimpleNamespace(nanos=int(price * 1e9)))]))])
+
+
+class Fake_Billing:
+    """CloudCatalogClient的替身，skus可随时替换，error不为None时list_skus抛出"""
+    def __init__(self):
+        self.skus = [make_sku("1", "E2", "CPU", 0.02), make_sku("2", "E2", "RAM", 0.003),
+                     make_sku("3", "N2", "CPU", 0.03), make_sku("4", "N2", "RAM", 0.004),
+                     make_sku("5", "C3", "CPU", 0.04)]
+        self.error = None
+
+    def list_services(self):
+        return [SimpleNamespace(display_name="Compute Engine", name="services/6F81-5844-456A")]
+
+    def list_skus(self, parent):
+        if self.error is not None:
+            raise self.error
+        return list(self.skus)
+
+
+class Fake_Compute:
+    def list(self, request):
+        return [SimpleNamespace(name=n, guest_cpus=c, memory_mb=m) for n, c, m in MACHINES]
+
+
+@pytest.fixture(autouse=True)
+def fake_sdk(monkeypatch):
+    monkeypatch.setattr(gcp_module, "compute_v1", SimpleNamespace(ListMachineTypesRequest=lambda **kwargs: kwargs))
+
+
+@pytest.fixture
+def pricing_json(tmp_path):
+    return str(tmp_path / "pricing.json")
+
+
+def make_model(billing=None):
+    model = GCP_Pricing()
+    model.pre_defined_vm = [x[0] for x in MACHINES]
+    model._compute_client = Fake_Compute()
+    model._billing_client = billing or Fake_Billing()
+    return model
+
+
+def prices(model):
+    return {k: round(v["price"], 9) for k, v in model.machine2price_cache.items()}
+
+
+def test_refresh_builds_table_and_exports(pricing_json):
+    model = make_model()
+    model.refresh(pricing_json, threading.Lock())
+
+    assert prices(model) == {"e2-standard-2": 0.064, "e2-standard-4": 0.128, "n2-standard-2": 0.092}
+    assert model.version == 1
+    # n2-standard-2与e2-standard-2规格相同但更贵，不进入机型索引
+    assert sorted(x.type for x in model.flavor_index) == ["e2-standard-2", "e2-standard-4"]
+    with open(pricing_json) as f:
+        assert json.load(f)["meta"]["providers"]["gcp"]["version"] == 1
+
+
+def test_warm_start_from_snapshot_without_sdk(pricing_json, monkeypatch):
+    make_model().refresh(pricing_json, threading.Lock())
+    monkeypatch.setattr(gcp_module, "compute_v1", None)
+    monkeypatch.setattr(gcp_module, "billing_v1", None)
+
+    model = GCP_Pricing()
+    assert model.load_snapshot(pricing_json, "gcp")
+
+    assert prices(model) == {"e2-standard-2": 0.064, "e2-standard-4": 0.128, "n2-standard-2": 0.092}
+    assert model.version == 1
+    assert sorted(x.type for x in model.flavor_index) == ["e2-standard-2", "e2-standard-4"]
+    assert model._compute_client is None and model._billing_client is None
+
+
+def test_load_snapshot_rejects_missing_corrupt_or_other_provider(tmp_path, pricing_json):
+    model = GCP_Pricing()
+    assert not model.load_snapshot(str(tmp_path / "missing.json"), "gcp")
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text('{"gcp": [')
+    assert not model.load_snapshot(str(corrupt), "gcp")
+
+    make_model().refresh(pricing_json, threading.Lock())
+    assert not model.load_snapshot(pricing_json, "aws")
+    assert model.version == 0 and len(model.flavor_index) == 0
+
+
+def test_failed_refresh_keeps_last_known_good(pricing_json):
+    billing = Fake_Billing()
+    model = make_model(billing)
+    model.refresh(pricing_json, threading.Lock())
+    table, index = model.machine2price_cache, model.flavor_index
+    with open(pricing_json) as f:
+        exported = f.read()
+
+    billing.error = ConnectionError("billing API unavailable")
+    with pytest.raises(ConnectionError):
+        model.refresh(pricing_json, threading.Lock())
+
+    assert model.machine2price_cache is table
+    assert model.flavor_index is index
+    assert model.version == 1
+    with open(pricing_json) as f:
+        assert f.read() == exported
+
+
+def test_failed_calculation_keeps_last_known_good(pricing_json):
+    billing = Fake_Billing()
+    model = make_model(billing)
+    model.refresh(pricing_json, threading.Lock())
+
+    # N2的RAM报价缺失，计算价格时出错
+    billing.skus = [x for x in billing.skus if x.sku_id != "4"]
+    with pytest.raises(KeyError):
+        model.refresh(pricing_json, threading.Lock())
+    assert prices(model)["n2-standard-2"] == 0.092
+    assert model.version == 1
+
+
+def test_ttl_marks_table_stale(pricing_json, monkeypatch, caplog):
+    billing = Fake_Billing()
+    model = make_model(billing)
+    model.ttl = 600
+    model.refresh(pricing_json, threading.Lock())
+    assert not model.stale
+    assert all(x["expires"] > time.time() for x in model.machine2price_cache.values())
+
+    now = time.time()
+    monkeypatch.setattr(model_module.time, "time", lambda: now + 601)
+    assert model.stale
+
+    billing.error = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        model.refresh(pricing_json, threading.Lock())
+    assert "已超过TTL" in caplog.text
+    # 超期的定价仍然可用
+    assert len(model.machine2price_cache) == 3 and len(model.flavor_index) == 2
+
+
+def test_unchanged_entries_keep_their_version(pricing_json):
+    billing = Fake_Billing()
+    model = make_model(billing)
+    model.refresh(pricing_json, threading.Lock())
+
+    billing.skus[2] = make_sku("3", "N2", "CPU", 0.035, effective="2026-06-01T00:00:00Z")
+    model.refresh(pricing_json, threading.Lock())
+
+    assert model.version == 2
+    assert {k: v["version"] for k, v in model.machine2price_cache.items()} == \
+        {"e2-standard-2": 1, "e2-standard-4": 1, "n2-standard-2": 2}
+
+
+def test_unchanged_skus_are_not_parsed_again(pricing_json, monkeypatch):
+    billing = Fake_Billing()
+    model = make_model(billing)
+    parsed = []
+    parse = model._parse_sku
+    monkeypatch.setattr(model, "_parse_sku", lambda sku: parsed.append(sku.sku_id) or parse(sku))
+
+    model.refresh(pricing_json, threading.Lock())
+    assert sorted(parsed) == ["1", "2", "3", "4", "5"]
+
+    parsed.clear()
+    model.refresh(pricing_json, threading.Lock())
+    assert parsed == []
+
+    # 生效时间变化的SKU重新解析，其报价进入新表
+    billing.skus[0] = make_sku("1", "E2", "CPU", 0.025, effective="2026-06-01T00:00:00Z")
+    model.refresh(pricing_json, threading.Lock())
+    assert parsed == ["1"]
+    assert prices(model)["e2-standard-2"] == 0.074
+
+    # 已下架的SKU从缓存中移除
+    billing.skus = billing.skus[:4]
+    model.refresh(pricing_json, threading.Lock())
+    assert sorted(model._sku_cache) == ["1", "2", "3", "4"]
@@ -0,0 +1,149 @@
+from cloud_platform import Pricing_Store as store_module
+from cloud_platform.Pricing_Store import Pricing_Store, Price_Table
+import json, multiprocessing, os, threading
+import pytest
+
+GCP = {"e2-standard-2": {"CPU": 2, "RAM": 8.0, "price": 0.092808, "version": 3, "expires": 1000.0},
+       "e2-standard-4": {"CPU": 4, "RAM": 16.0, "price": 0.185616, "version": 3, "expires": 1000.0}}
+AWS = {"t3.medium": {"CPU": 2, "RAM": 4.0, "price": 0.0528, "version": 1, "expires": 2000.0}}
+
+
+def section(data, provider):
+    return {k: v for entry in data[provider] for k, v in entry.items()}
+
+
+def test_write_keeps_other_providers_and_bumps_generation(tmp_path):
+    store = Pricing_Store(str(tmp_path / "pricing.json"))
+    assert store.read()["meta"]["generation"] == 0
+
+    assert store.write("gcp", GCP, 3) == 1
+    assert store.write("aws", AWS, 1) == 2
+    changed = {**GCP, "e2-standard-2": {**GCP["e2-standard-2"], "price": 0.1, "version": 4}}
+    assert store.write("gcp", changed, 4) == 3
+
+    data = store.read()
+    assert section(data, "gcp") == changed
+    assert section(data, "aws") == AWS
+    assert data["meta"]["generation"] == 3
+    assert data["meta"]["providers"]["gcp"]["version"] == 4
+    assert data["meta"]["providers"]["aws"]["version"] == 1
+
+
+def test_rejects_newer_schema(tmp_path):
+    fp = tmp_path / "pricing.json"
+    fp.write_text(json.dumps({"meta": {"schema": store_module.SCHEMA + 1, "generation": 5}}))
+    with pytest.raises(ValueError):
+        Pricing_Store(str(fp)).write("gcp", GCP, 1)
+    assert json.loads(fp.read_text())["meta"]["generation"] == 5
+
+
+def test_failed_write_leaves_old_file_intact(tmp_path, monkeypatch):
+    fp = tmp_path / "pricing.json"
+    store = Pricing_Store(str(fp))
+    store.write("gcp", GCP, 3)
+    before = fp.read_text()
+
+    def broken_dump(data, f):
+        f.write('{"meta": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store_module.json, "dump", broken_dump)
+    with pytest.raises(OSError):
+        store.write("aws", AWS, 1)
+
+    assert fp.read_text() == before
+    # 临时文件已被删除
+    assert sorted(os.listdir(tmp_path)) == ["pricing.json", "pricing.json.lock"]
+
+
+def _write_many(fp, provider, n):
+    store = Pricing_Store(fp)
+    for i in range(n):
+        store.write(provider, {f"{provider}-type": {"CPU": 1, "RAM": 1.0, "price": i, "version": i + 1}}, i + 1)
+
+
+def check_concurrent_result(fp, providers, n):
+    data = Pricing_Store(fp).read()
+    assert sorted(k for k in data if k != "meta") == sorted(providers)
+    assert data["meta"]["generation"] == len(providers) * n
+    for provider in providers:
+        assert section(data, provider)[f"{provider}-type"]["version"] == n
+        assert data["meta"]["providers"][provider]["version"] == n
+
+
+@pytest.mark.skipif(store_module.fcntl is None, reason="需要flock")
+def test_concurrent_writers_through_flock_lose_no_section(tmp_path):
+    # 每个线程使用独立的实例，只靠文件锁串行化
+    fp = str(tmp_path / "pricing.json")
+    providers = [f"p{i}" for i in range(6)]
+    threads = [threading.Thread(target=_write_many, args=(fp, x, 20)) for x in providers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    check_concurrent_result(fp, providers, 20)
+
+
+@pytest.mark.skipif(store_module.fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+                    reason="需要flock和fork")
+def test_concurrent_processes_lose_no_section(tmp_path):
+    fp = str(tmp_path / "pricing.json")
+    providers = ["gcp", "aws", "azure", "oci"]
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_write_many, args=(fp, x, 15)) for x in providers]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+
+    check_concurrent_result(fp, providers, 15)
+
+
+def test_price_table_round_trip(tmp_path):
+    fp, bin_fp = str(tmp_path / "pricing.json"), str(tmp_path / "pricing.bin")
+    store = Pricing_Store(fp, binary_fp=bin_fp)
+    store.write("gcp", GCP, 3)
+    generation = store.write("aws", AWS, 1)
+
+    table = store.load_table()
+    assert len(table) == 3
+    assert table.generation == generation
+    assert sorted(table.names) == [("aws", "t3.medium"), ("gcp", "e2-standard-2"), ("gcp", "e2-standard-4")]
+    assert table.machine2price("gcp") == {k: {**v, "CPU": float(v["CPU"])} for k, v in GCP.items()}
+    assert table.machine2price("aws") == {k: {**v, "CPU": float(v["CPU"])} for k, v in AWS.items()}
+    assert table.machine2price("azure") == {}
+    assert not table.cpu.flags.writeable
+
+
+def test_price_table_with_empty_provider(tmp_path):
+    fp, bin_fp = str(tmp_path / "pricing.json"), str(tmp_path / "pricing.bin")
+    store = Pricing_Store(fp, binary_fp=bin_fp)
+    store.write("aws", {}, 1)
+
+    table = Price_Table(bin_fp)
+    assert len(table) == 0
+    assert table.names == []
+    assert table.machine2price("aws") == {}
+    assert table.price.shape == (0,)
+
+    store.write("gcp", GCP, 3)
+    table = Price_Table(bin_fp)
+    assert len(table) == 2
+    assert table.machine2price("aws") == {}
+    assert set(table.machine2price("gcp")) == set(GCP)
+
+
+def test_truncated_price_table_is_rejected(tmp_path):
+    fp = tmp_path / "pricing.bin"
+    fp.write_bytes(b"KSPRICE1")
+    with pytest.raises(ValueError):
+        Price_Table(str(fp))
+    fp.write_bytes(b"NOTPRICE" + bytes(24))
+    with pytest.raises(ValueError):
+        Price_Table(str(fp))
+    # 文件头声明了2行，列数据却缺失
+    fp.write_bytes(store_module._HEADER.pack(store_module._MAGIC, store_module.SCHEMA, 2, 1, 0.0))
+    with pytest.raises(ValueError):
+        Price_Table(str(fp))
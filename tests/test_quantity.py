@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from cluster.quantity import cpu_cores, memory_gib, parse_quantity, pod_requests
+from decimal import Decimal
+import pytest
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500m", Decimal("0.5")),
+    ("100m", Decimal("0.1")),
+    ("1.5Gi", Decimal(3 * 2 ** 29)),
+    ("512Mi", Decimal(2 ** 29)),
+    ("512M", Decimal("512e6")),
+    ("1G", Decimal("1e9")),
+    ("128974848", Decimal(128974848)),
+    ("1e3", Decimal(1000)),
+    ("1E3", Decimal(1000)),
+    ("12e-3", Decimal("0.012")),
+    (".5", Decimal("0.5")),
+    ("3Ti", Decimal(3 * 2 ** 40)),
+    ("2", Decimal(2)),
+    ("1.", Decimal(1)),
+    ("+1k", Decimal(1000)),
+    ("250u", Decimal("0.00025")),
+    ("7n", Decimal("7e-9")),
+    (" 1Ki ", Decimal(1024)),
+    (2, Decimal(2)),
+    (0.25, Decimal("0.25")),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "abc", "1.5.5", "1Gb", "1gi", "1 Gi", "Gi", "1e", "e3", "--1", "1KiB", ".", "1e3Mi"])
+def test_parse_quantity_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_quantity(text)
+
+
+@pytest.mark.parametrize("text, expected", [("500m", 0.5), ("2", 2.0), ("1500m", 1.5), ("0.1", 0.1)])
+def test_cpu_cores(text, expected):
+    assert cpu_cores(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [("1Gi", 1.0), ("512Mi", 0.5), ("1.5Gi", 1.5), ("1G", 1e9 / 2 ** 30),
+                                            (str(2 ** 30), 1.0)])
+def test_memory_gib(text, expected):
+    assert memory_gib(text) == expected
+
+
+def container(cpu=None, memory=None, restart_policy=None):
+    requests = {k: v for k, v in (("cpu", cpu), ("memory", memory)) if v is not None}
+    return SimpleNamespace(resources=SimpleNamespace(requests=requests or None), restart_policy=restart_policy)
+
+
+def spec(containers, init_containers=None, overhead=None):
+    return SimpleNamespace(containers=containers, init_containers=init_containers, overhead=overhead)
+
+
+@pytest.mark.parametrize("pod, expected", [
+    # 应用容器求和，没有requests的容器按0计
+    (spec([container("250m", "256Mi"), container("750m", "768Mi"), container()]), (1.0, 1.0)),
+    (spec([SimpleNamespace(resources=None)]), (0.0, 0.0)),
+    # 普通init容器依次运行，取最大值，与应用容器之和比较取较大者
+    (spec([container("500m", "512Mi")], [container("2", "256Mi"), container("1", "1Gi")]), (2.0, 1.0)),
+    (spec([container("3", "4Gi")], [container("2", "1Gi"), container("1", "2Gi")]), (3.0, 4.0)),
+    # sidecar（restartPolicy为Always）在其后的init容器和应用容器运行期间一直存在
+    (spec([container("1", "1Gi")], [container("500m", "512Mi", "Always")]), (1.5, 1.5)),
+    (spec([container("1", "1Gi")], [container("500m", "512Mi", "Always"), container("2", "2Gi")]), (2.5, 2.5)),
+    (spec([container("1", "1Gi")], [container("2", "2Gi"), container("500m", "512Mi", "Always")]), (2.0, 2.0)),
+    (spec([container("100m", "128Mi")],
+          [container("250m", "256Mi", "Always"), container("250m", "256Mi", "Always"), container("1", "1Gi")]),
+     (1.5, 1.5)),
+    # RuntimeClass的overhead加在有效请求之上
+    (spec([container("1", "1Gi")], [container("2", "256Mi")], overhead={"cpu": "250m", "memory": "512Mi"}),
+     (2.25, 1.5)),
+    (spec([container("1", "1Gi")], overhead={"memory": "1Gi"}), (1.0, 2.0)),
+])
+def test_pod_requests(pod, expected):
+    assert pod_requests(pod) == expected
+
+
+def test_pod_requests_rejects_invalid_quantity():
+    with pytest.raises(ValueError):
+        pod_requests(spec([container("one", "1Gi")]))
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from cluster import Monitor
+from cluster.Binder import Bind_Result
+from cluster.Monitor import K8s_Monitor
+from cluster.Scheduler import Scheduler
+from cloud_platform.Static_Pricing import Static_Pricing
+from k8s_objects import ApiException, Fake_Gcp_Manager, make_node, make_pod, object_list
+import os
+import pytest
+
+SAMPLE_PRICING = os.path.join(os.path.dirname(__file__), os.pardir, "data", "sample-pricing.json")
+
+
+class Fake_Core:
+    def __init__(self, nodes=(), pods=()):
+        self.nodes = list(nodes)
+        self.pods = list(pods)
+
+    def list_node(self, **kwargs):
+        return object_list(self.nodes)
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        return object_list(self.pods)
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(Monitor, "client", SimpleNamespace(ApiException=ApiException))
+    m = K8s_Monitor(gcp_manager=Fake_Gcp_Manager())
+    m._core_v1 = Fake_Core(nodes=[make_node("worker-1")], pods=[make_pod("web-1", cpu="1500m")])
+    m.refresh()
+    return m
+
+
+@pytest.fixture
+def scheduler(monitor):
+    return Scheduler(k8s_monitor=monitor, gcp_manager=Fake_Gcp_Manager(),
+                     gcp_pricing=Static_Pricing(SAMPLE_PRICING, "gcp"))
+
+
+def worker(scheduler):
+    return next(x for x in scheduler._get_available_node() if x.name == "worker-1")
+
+
+def test_bound_pod_stays_reserved_until_informer_sees_it(monitor, scheduler):
+    pod = monitor.pod_cache["web-1"]
+    scheduler._reserve([(pod, "worker-1")])
+    scheduler._release([(pod, "worker-1")], [Bind_Result(pod, "worker-1", True, 1, None)])
+
+    # 绑定已返回，watch事件尚未到达
+    assert worker(scheduler).occupied_cpu == 1.5
+    assert scheduler._get_pending_pod() == []
+
+    monitor._on_pod_event("MODIFIED", make_pod("web-1", cpu="1500m", node="worker-1", rv="2"))
+    assert worker(scheduler).occupied_cpu == 1.5
+    assert scheduler._reserved == {}
+
+
+def test_failed_bind_is_released(monitor, scheduler):
+    pod = monitor.pod_cache["web-1"]
+    scheduler._reserve([(pod, "worker-1")])
+    scheduler._release([(pod, "worker-1")], [Bind_Result(pod, "worker-1", False, 3, RuntimeError("409"))])
+
+    assert worker(scheduler).occupied_cpu == 0
+    assert [x.name for x in scheduler._get_pending_pod()] == ["web-1"]
+
+
+def test_pricing_without_node_manager_fails_fast(monitor):
+    gcp = Static_Pricing(SAMPLE_PRICING, "gcp")
+    aws = Static_Pricing(SAMPLE_PRICING, "aws")
+    with pytest.raises(ValueError):
+        Scheduler(k8s_monitor=monitor, gcp_manager=Fake_Gcp_Manager(), gcp_pricing=gcp, pricing_models=[aws])
+
+    scheduler = Scheduler(k8s_monitor=monitor, gcp_manager=Fake_Gcp_Manager(), gcp_pricing=gcp,
+                          pricing_models=[aws], node_managers={"aws": Fake_Gcp_Manager()})
+    assert scheduler.optimizer.flavor_index.providers == ["aws", "gcp"]
@@ -0,0 +1,80 @@
+from cluster.resources import Node, Pod
+from cloud_platform.Static_Pricing import Static_Pricing
+from optimizer.CABFD import CABFD
+from optimizer.Scoring_Engine import Scoring_Engine
+import os, random
+import pytest
+
+SAMPLE_PRICING = os.path.join(os.path.dirname(__file__), os.pardir, "data", "sample-pricing.json")
+
+
+@pytest.mark.parametrize("aggregate", [False, True])
+def test_per_pod_and_grouped_packing_agree_on_tolerance(aggregate):
+    # 20 * 0.1累加后不等于2.0，两条路径都应把20个pod放进2核的节点
+    node = Node("worker-1", {"type": "e2-medium", "CPU": 2, "RAM": 8, "status": "Ready"})
+    pods = [Pod({"CPU": 0.1, "RAM": 0.1}, name=f"p{i}") for i in range(20)]
+
+    schedule = CABFD(Static_Pricing(SAMPLE_PRICING, "gcp"), aggregate=aggregate).optimize(pods, [node])
+
+    assert [x.name for x in schedule] == ["worker-1"]
+    assert len(node.pods) == 20
+
+
+def reference_score(node, pod, candidates, weights=(1, 1, 0.5)):
+    """最初的逐个候选打分实现（对象属性逐个计算），作为向量化引擎的参照"""
+    avai_cpu, avai_ram = node.available_cpu, node.availbale_memory
+    ram_util = 1 - (avai_cpu - pod.cpu) / node.cpu
+    cpu_util = 1 - (avai_ram - pod.memory) / node.memory
+    if node.name == "created" or node.status == "Ready":
+        price = 1
+    else:
+        price = 1 - node.price / max(x.price for x in candidates)
+    return weights[0] * ram_util + weights[1] * cpu_util + weights[2] * price
+
+
+def reference_plan(pods, nodes, flavors):
+    schedule = list(nodes)
+    for pod in sorted(pods, key=lambda x: (-x.memory, -x.cpu)):
+        candidates = [x for x in schedule if x.available_cpu + Scoring_Engine.EPS >= pod.cpu
+                      and x.availbale_memory + Scoring_Engine.EPS >= pod.memory]
+        candidates += [Node("not-created", f.as_config()) for f in flavors if f.cpu >= pod.cpu and f.ram >= pod.memory]
+        best = max(candidates, key=lambda x: reference_score(x, pod, candidates))
+        if not any(best is x for x in schedule):
+            best.name = "created"
+            schedule.append(best)
+        best.add_pod(pod)
+    return schedule
+
+
+def random_trace(seed):
+    rnd = random.Random(seed)
+    shapes = [(rnd.choice([0.1, 0.25, 0.5, 0.7, 1, 1.5, 3]), rnd.choice([0.2, 0.5, 0.9, 1, 2, 3.3, 7]))
+              for _ in range(rnd.randint(1, 6))]
+    pods = [Pod({"CPU": cpu, "RAM": ram, "status": "Pending"}, name=f"p{i}")
+            for i, (cpu, ram) in enumerate(rnd.choice(shapes) for _ in range(rnd.randint(1, 200)))]
+    nodes = []
+    for i in range(rnd.randint(0, 4)):
+        cpu = rnd.choice([2, 4, 8])
+        node = Node(f"worker-{i}", {"type": "existing", "CPU": cpu, "RAM": 4.0 * cpu, "price": 0.05 * cpu,
+                                    "status": rnd.choice(["Ready", None])})
+        node.add_pod(Pod({"CPU": rnd.choice([0, 0.5, 1]), "RAM": rnd.choice([0, 1, 2])}, name=f"running-{i}"))
+        nodes.append(node)
+    return pods, nodes
+
+
+def signature(schedule, by_shape=False):
+    # 整组放置时同形状的pod可以互换，只比较每个节点上pod的形状
+    pods = (lambda x: sorted((p.cpu, p.memory) for p in x.pods)) if by_shape else (lambda x: [p.name for p in x.pods])
+    return [(x.name, x.type, x.price, pods(x)) for x in schedule]
+
+
+@pytest.mark.parametrize("aggregate", [False, True])
+@pytest.mark.parametrize("seed", range(100))
+def test_engine_matches_reference_scorer(seed, aggregate):
+    pricing = Static_Pricing(SAMPLE_PRICING, "gcp")
+    pods, nodes = random_trace(seed)
+    expected = reference_plan(pods, [x.copy() for x in nodes], pricing.flavor_index)
+
+    actual = CABFD(pricing, aggregate=aggregate).optimize(pods, [x.copy() for x in nodes])
+
+    assert signature(actual, aggregate) == signature(expected, aggregate)
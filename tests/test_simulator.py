@@ -0,0 +1,42 @@
+from cloud_platform.Providers import Lazy_Module
+from cloud_platform.Static_Pricing import Static_Pricing
+from cluster import Binder
+from simulation.Simulator import Simulator, synthetic_trace
+import os, sys
+import pytest
+
+SAMPLE_PRICING = os.path.join(os.path.dirname(__file__), os.pardir, "data", "sample-pricing.json")
+
+
+@pytest.fixture
+def no_kubernetes(monkeypatch):
+    """即使环境中装有kubernetes SDK，也让它不可导入"""
+    for name in list(sys.modules):
+        if name == "kubernetes" or name.startswith("kubernetes."):
+            monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setitem(sys.modules, "kubernetes", None)
+    monkeypatch.setattr(Binder, "client", Lazy_Module("kubernetes.client"))
+
+
+def test_simulator_runs_without_kubernetes(no_kubernetes):
+    with pytest.raises(ImportError):
+        Binder.client.V1Binding
+
+    report = Simulator(Static_Pricing(SAMPLE_PRICING, "gcp"), measure_memory=False).run(
+        synthetic_trace(200, seed=1, duration=30))
+
+    assert report["pods"] == 200
+    assert report["unscheduled"] == 0
+    assert report["created_nodes"] > 0
+    assert report["cycles"] >= 1
+
+
+def test_static_pricing_requires_existing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Static_Pricing(str(tmp_path / "missing.json"), "gcp")
+
+
+def test_load_snapshot_tolerates_missing_file(tmp_path):
+    pricing = Static_Pricing(SAMPLE_PRICING, "gcp")
+    assert not pricing.load_snapshot(str(tmp_path / "missing.json"), "gcp")
+    assert len(pricing.machine2price_cache) > 0
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+from cloud_platform.Warm_Pool import Warm_Pool
+from cluster.resources import Node
+import json
+import pytest
+
+
+class Fake_Manager:
+    def __init__(self):
+        self.instances = {}
+        self.launched = []
+
+    def launch_instances(self, nodes):
+        for node in nodes:
+            node.name = f"warm-{len(self.launched) + 1}"
+            self.launched.append(node)
+
+    def join_cluster(self, node):
+        pass
+
+
+@pytest.fixture
+def pool(tmp_path):
+    flavors = tmp_path / "flavors.json"
+    flavors.write_text(json.dumps({"gcp-warm": ["e2-unknown", "e2-standard-4"]}))
+    pricing = SimpleNamespace(provider="gcp",
+                              machine2price_cache={"e2-standard-4": {"CPU": 4, "RAM": 16, "price": 0.13}})
+    core_v1 = SimpleNamespace(patch_node=lambda name, body: None)
+    warm = Warm_Pool(gcp_manager=Fake_Manager(), k8s_monitor=SimpleNamespace(core_v1=core_v1),
+                     gcp_pricing=pricing, flavor_pool=str(flavors), min_size=2)
+    return warm
+
+
+def test_unpriced_warm_flavor_is_skipped(pool, caplog):
+    pool.reconcile()
+
+    assert [(x.type, x.cpu, x.memory) for x in pool.gcp_manager.launched] == [("e2-standard-4", 4, 16)] * 2
+    assert sum("e2-unknown" in x.message for x in caplog.records) == 1
+
+    node = Node("created", {"CPU": 2, "RAM": 4})
+    node.add_pod(SimpleNamespace(cpu=1, memory=2))
+    assert pool.claim(node)
+    assert node.type == "e2-standard-4"
+
+
+def test_no_priced_warm_flavor_grows_nothing(pool):
+    pool.gcp_pricing.machine2price_cache = {}
+    pool.reconcile()
+    assert pool.gcp_manager.launched == []